@@ -0,0 +1,99 @@
+"""
+So sánh XiangqiNet fp32 với bản int8 (BatchNorm gộp + lượng tử hóa động Linear) trên CPU.
+
+Cách dùng:
+    python -m ai.bench_quantize
+    python -m ai.bench_quantize --model ai/weights/xiangqi_model.pth --positions 2000 --batch 32
+    python -m ai.bench_quantize --threads 4 --interop 1
+
+In ra: sai lệch đầu ra so với fp32 (trung bình / lớn nhất / tỉ lệ cùng dấu) và số thế cờ / giây.
+Thế cờ lấy từ các ván đi ngẫu nhiên (seed cố định) để giống đầu vào thật của bot.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import torch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai.model import XiangqiNet, configure_threads, fold_batchnorm, quantize_model
+from ai.preprocess import BoardEncoder
+from core.board import Board
+
+
+def sample_positions(n, seed=0):
+    """n thế cờ tướng từ các ván đi ngẫu nhiên, trả về tensor (n, 14, 10, 9)."""
+    rng = random.Random(seed)
+    encoder = BoardEncoder(n)
+    count = 0
+    while count < n:
+        board = Board('chinese_chess')
+        for _ in range(rng.randint(10, 120)):
+            moves = board.validator.generate_legal_moves(board, board.current_turn, packed=True)
+            if not moves: break
+            board.push(rng.choice(moves))
+            if rng.random() < 0.2 and count < n:
+                encoder.write(count, board)
+                count += 1
+    return encoder.batch(n).clone()
+
+
+def throughput(model, inputs, batch):
+    """Số thế cờ / giây khi chấm theo lô kích thước batch."""
+    with torch.inference_mode():
+        model(inputs[:batch])  # Làm nóng
+        t0 = time.perf_counter()
+        for i in range(0, len(inputs), batch):
+            model(inputs[i:i + batch])
+        elapsed = time.perf_counter() - t0
+    return len(inputs) / elapsed if elapsed > 0 else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XiangqiNet: fp32 vs int8 trên CPU")
+    parser.add_argument('--model', default="ai/weights/xiangqi_model.pth")
+    parser.add_argument('--positions', type=int, default=1000)
+    parser.add_argument('--batch', type=int, default=32, help="Kích thước lô khi đo tốc độ (luôn đo thêm lô 1)")
+    parser.add_argument('--threads', type=int, default=None, help="Số luồng intra-op")
+    parser.add_argument('--interop', type=int, default=None, help="Số luồng inter-op")
+    args = parser.parse_args()
+
+    configure_threads(args.threads, args.interop)
+    model = XiangqiNet()
+    if os.path.exists(args.model):
+        model.load_state_dict(torch.load(args.model, map_location="cpu"))
+    else:
+        print(f"⚠️ Không thấy {args.model}, dùng trọng số ngẫu nhiên (chỉ so tốc độ)")
+    model.eval()
+
+    fp32 = model
+    folded = fold_batchnorm(model)
+    int8 = quantize_model(model)
+
+    inputs = sample_positions(args.positions)
+    with torch.inference_mode():
+        ref = fp32(inputs).view(-1)
+        out_folded = folded(inputs).view(-1)
+        out_int8 = int8(inputs).view(-1)
+
+    print(f"{args.positions} thế cờ, {torch.get_num_threads()} luồng intra-op, "
+          f"{torch.get_num_interop_threads()} luồng inter-op")
+    for name, out in (("fp32 + gộp BN", out_folded), ("int8", out_int8)):
+        delta = (out - ref).abs()
+        same_sign = (torch.sign(out) == torch.sign(ref)).float().mean().item()
+        print(f"  {name:14s} sai lệch TB {delta.mean().item():.5f}  max {delta.max().item():.5f}  "
+              f"cùng dấu {same_sign:.1%}")
+
+    for batch in sorted({1, args.batch}):
+        base = throughput(fp32, inputs, batch)
+        print(f"[lô {batch}]")
+        for name, m in (("fp32", fp32), ("fp32 + gộp BN", folded), ("int8", int8)):
+            rate = base if m is fp32 else throughput(m, inputs, batch)
+            print(f"  {name:14s} {rate:10,.0f} thế/giây  x{rate / base:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Đo số nút / thời gian của CustomXiangqiBot khi bật / tắt từng kỹ thuật tìm kiếm
+(PVS, nước trống, LMR, gia hạn chiếu, cửa sổ kỳ vọng, tìm kiếm tĩnh).
+
+Cách dùng:
+    python -m ai.bench_search
+    python -m ai.bench_search --depth 4 --model ai/weights/xiangqi_model.pth
+    python -m ai.bench_search --only use_null_move use_lmr
+    python -m ai.bench_search --depth 5 --smp 1 2 4 8
+    python -m ai.bench_search --depth 4 --batch
+
+Mỗi cấu hình tìm cùng bộ thế cờ (bộ chuẩn của utils/perft.py) ở độ sâu cố định, bảng TT / eval cache
+xóa trước mỗi thế cờ. In ra: tổng số nút, thời gian, số nút so với khi bật tất cả và nước đi ở gốc.
+--smp: đường tăng tốc Lazy SMP (thời gian tới độ sâu cố định) theo số process.
+--batch: chấm lá theo lô (batch_leaves) tắt / bật: số thế cờ đã chấm, thế / giây, thời gian tới độ sâu cố định.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai.custom_bot import CustomXiangqiBot, SEARCH_SWITCHES as SWITCHES
+from ai.transposition import EvalCache
+from core.board import Board
+from utils.perft import REFERENCE_POSITIONS
+
+
+def run_config(bot, fens, depth, settings):
+    """Tìm từng thế cờ với cấu hình settings, trả về (tổng số nút, số giây, list nước đi)."""
+    for name in SWITCHES:
+        setattr(bot, name, settings.get(name, True))
+    bot.base_depth = depth
+    nodes = 0
+    moves = []
+    t0 = time.perf_counter()
+    for fen in fens:
+        # Mỗi thế cờ như một ván mới: xóa TT, eval cache, history
+        bot.last_root_ply = None
+        bot.eval_cache = EvalCache()
+        bot.history = [0] * len(bot.history)
+        board = Board.from_fen(fen, 'chinese_chess')
+        with contextlib.redirect_stdout(io.StringIO()):
+            move = bot.get_best_move(board, time_limit=float('inf'))
+        nodes += bot.nodes
+        moves.append(move)
+    return nodes, time.perf_counter() - t0, moves
+
+
+def run_smp(model_path, fens, depth, worker_counts):
+    """Thời gian tìm bộ thế cờ ở độ sâu cố định với từng số process, so với số process đầu tiên."""
+    print(f"Lazy SMP: {len(fens)} thế cờ, depth {depth}")
+    base = None
+    for n in worker_counts:
+        with contextlib.redirect_stdout(io.StringIO()):
+            bot = CustomXiangqiBot(model_path=model_path, depth=1, workers=n)
+            # Làm nóng: khởi động pool, nạp model ở mọi process
+            bot.get_best_move(Board.from_fen(fens[0], 'chinese_chess'), time_limit=float('inf'))
+        nodes, elapsed, _ = run_config(bot, fens, depth, {})
+        bot.close()
+        base = base or elapsed
+        rate = nodes / elapsed if elapsed > 0 else 0
+        print(f"  {n:2d} process  {elapsed:8.2f}s  tăng tốc x{base / elapsed:.2f}  {nodes:10,} nút  "
+              f"{rate:10,.0f} nút/giây")
+
+
+def run_batch(bot, fens, depth):
+    """So sánh batch_leaves tắt / bật trên cùng bộ thế cờ, độ sâu cố định."""
+    print(f"Chấm lá theo lô: {len(fens)} thế cờ, depth {depth}")
+    base = None
+    for batch_leaves in (False, True):
+        bot.batch_leaves = batch_leaves
+        leaves = batches = batched = 0
+        elapsed = 0.0
+        for fen in fens:
+            _, seconds, _ = run_config(bot, [fen], depth, {})
+            elapsed += seconds
+            leaves += bot.stats['leaves']
+            batches += bot.stats['batches']
+            batched += bot.stats['batched']
+        rate = leaves / elapsed if elapsed > 0 else 0
+        base = base or (rate, elapsed)
+        avg = batched / batches if batches else 0
+        print(f"  batch {'bật' if batch_leaves else 'tắt'}  {leaves:8,} thế  {elapsed:7.2f}s  {rate:10,.0f} thế/giây "
+              f"(x{rate / base[0]:.2f})  thời gian x{elapsed / base[1]:.2f}  {batches} lô, TB {avg:.1f} thế/lô")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CustomXiangqiBot: số nút khi bật / tắt từng kỹ thuật")
+    parser.add_argument('--model', default="ai/weights/xiangqi_model.pth")
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--only', nargs='*', choices=SWITCHES, default=None,
+                        help="Chỉ đo các kỹ thuật này (mặc định: tất cả)")
+    parser.add_argument('--batch', action='store_true',
+                        help="So sánh chấm lá theo lô tắt / bật (thế / giây, thời gian tới độ sâu)")
+    parser.add_argument('--smp', type=int, nargs='+', default=None,
+                        help="Đo tăng tốc Lazy SMP với các số process này (vd: 1 2 4 8)")
+    args = parser.parse_args()
+
+    fens = [fen for _, fen, _ in REFERENCE_POSITIONS['chinese_chess']]
+    if args.smp:
+        run_smp(args.model, fens, args.depth, args.smp)
+        return
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        bot = CustomXiangqiBot(model_path=args.model, depth=args.depth)
+    if args.batch:
+        run_batch(bot, fens, args.depth)
+        return
+
+    configs = [("tất cả bật", {})]
+    configs += [(f"tắt {name[4:]}", {name: False}) for name in (args.only or SWITCHES)]
+    configs.append(("tất cả tắt", {name: False for name in SWITCHES}))
+
+    print(f"{len(fens)} thế cờ, depth {args.depth}")
+    base_nodes = base_moves = None
+    for label, settings in configs:
+        nodes, elapsed, moves = run_config(bot, fens, args.depth, settings)
+        if base_nodes is None:
+            base_nodes, base_moves = nodes, moves
+        same = sum(1 for a, b in zip(moves, base_moves) if a == b)
+        print(f"  {label:24s} {nodes:10,} nút  {elapsed:7.2f}s  x{nodes / base_nodes:.2f} nút  "
+              f"cùng nước {same}/{len(fens)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,45 +1,169 @@
+import ctypes
+import threading
+import time
 import torch
-import random
-from ai.model import XiangqiNet
-from ai.preprocess import fen_to_tensor
+from ai.model import XiangqiNet, configure_threads, load_for_inference
+from ai.preprocess import BoardEncoder
+from ai.transposition import TranspositionTable, EvalCache, EXACT, LOWER, UPPER
+from core.move import Move, CAPTURE
+from core.xiangqi_bitboard import COLOR_INDEX, in_check, see, CHARIOT, CANNON, HORSE
+
+
+class SearchTimeout(Exception):
+    """Hết ngân sách thời gian / số nút giữa chừng một lần lặp sâu dần."""
+
+
+INF = 1000000
+MATE = 100000
+MATE_BOUND = MATE - 1000  # |điểm| từ đây trở lên là điểm chiếu hết / ăn Tướng
+
+
+def score_to_tt(score, ply):
+    """Điểm chiếu hết tính theo ply từ gốc (MATE - ply) -> tính từ nút đang lưu, để dùng lại được ở ply khác."""
+    if score >= MATE_BOUND: return score + ply
+    if score <= -MATE_BOUND: return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    """Ngược lại score_to_tt: điểm chiếu hết đọc từ bảng TT -> tính lại theo ply từ gốc của nút hiện tại."""
+    if score >= MATE_BOUND: return score - ply
+    if score <= -MATE_BOUND: return score + ply
+    return score
+
+
+# Các công tắc kỹ thuật tìm kiếm (tham số cùng tên của CustomXiangqiBot)
+SEARCH_SWITCHES = ('use_pvs', 'use_null_move', 'use_lmr', 'use_check_extension', 'use_aspiration', 'use_quiescence')
+
 
 class CustomXiangqiBot:
-    def __init__(self, model_path="ai/weights/xiangqi_model.pth", depth=5):
+    MAX_PLY = 64
+    MAX_QPLY = 8              # Số tầng tối đa của tìm kiếm tĩnh
+    DELTA_MARGIN = 0.5        # Biên delta pruning (đơn vị điểm: 1.0 = 1000 centipawn vật chất)
+    NULL_WINDOW = 1e-4        # Độ rộng cửa sổ "rỗng" (điểm là số thực)
+    NULL_MIN_DEPTH = 3        # Nước trống chỉ thử từ độ sâu này
+    NULL_VERIFY_PIECES = 2    # Bên đi có <= số quân tấn công này -> kiểm chứng lại khi nước trống cắt
+    LMR_MIN_DEPTH = 3         # Giảm độ sâu nước muộn từ độ sâu này
+    LMR_MIN_MOVES = 3         # ... và từ nước thứ mấy trong danh sách
+    ASPIRATION_WINDOW = 0.5   # Nửa độ rộng cửa sổ kỳ vọng ở gốc
+    MAX_BATCH = 64            # Số thế cờ con tối đa chấm trong 1 lần forward ở nút depth 1 (batch_leaves)
+    def __init__(self, model_path="ai/weights/xiangqi_model.pth", depth=5, batch_leaves=False,
+                 quantize=False, intra_threads=None, inter_threads=None, tt_size_mb=16,
+                 move_time=5.0, node_limit=None, use_quiescence=True, use_pvs=True, use_null_move=True,
+                 use_lmr=True, use_check_extension=True, use_aspiration=True, workers=1,
+                 transposition_table=None, ponder=True):
         self.device = torch.device("cpu")
-        self.model = XiangqiNet().to(self.device)
+        # Số luồng CPU cho torch (None = mặc định của torch)
+        configure_threads(intra_threads, inter_threads)
+        self.model_path = model_path
+        self.quantize = quantize
         self.base_depth = depth
+        self.root_ply = 0  # len(move_stack) ở gốc của lần tìm kiếm hiện tại
+        self.last_root_ply = None
+
+        # --- LẶP SÂU DẦN (Iterative Deepening) THEO NGÂN SÁCH ---
+        # move_time: số giây tối đa cho 1 nước khi không có đồng hồ; node_limit: giới hạn số nút (None = không)
+        self.move_time = move_time
+        self.node_limit = node_limit
+        self.deadline = None
+        self.max_nodes = None
+        self.nodes = 0
+        self.root_best = None  # Nước tốt nhất của lần lặp trước, đi trước ở lần lặp sau
+        self.stop_flag = None  # Cờ dừng dùng chung (RawValue) khi chạy trong process của Lazy SMP
+        self.verbose = True
+
+        # --- TÌM SONG SONG (Lazy SMP): workers > 1 -> các process cùng tìm, chung bảng TT trong shared memory ---
+        self.workers = workers
+        self.smp = None  # ai.lazy_smp.LazySMP, tạo khi tìm lần đầu
+
+        # --- PONDER: tìm trước trên thời gian của người chơi ---
+        # Luôn chạy trong process pool của Lazy SMP (kể cả workers=1): thread nền chỉ chờ kết quả,
+        # không tranh GIL với vòng lặp vẽ của pygame suốt lượt người chơi
+        self.ponder = ponder
+        self.ponder_thread = None
+        self.ponder_stop = ctypes.c_bool(False)  # Cờ dừng (.value như RawValue của Lazy SMP)
+        self.ponder_hash = None    # Hash thế cờ sau nước đáp đoán trước (None: chỉ làm nóng bảng TT)
+        self.ponder_result = None  # (nước, điểm, độ sâu đã xong) của lần ponder gần nhất
+
+        # --- SẮP XẾP NƯỚC ĐI: PV + KILLER + HISTORY ---
+        self.pv = []                                        # Chuỗi nước chính của lần lặp trước
+        self.killers = [[0, 0] for _ in range(self.MAX_PLY)]  # 2 nước thường gây cắt beta mỗi tầng
+        self.history = [0] * (15 * 90)                     # [mã quân * 90 + ô đến] -> điểm cắt tỉa
         
         # --- TỐI ƯU 1: BỘ NHỚ ĐỆM (Transposition Table) ---
-        # Lưu kết quả chấm điểm để không phải tính lại những thế cờ trùng lặp
-        self.transposition_table = {} 
+        # Bảng kích thước cố định khóa Zobrist (độ sâu, loại cận, điểm, nước tốt nhất),
+        # giữ lại giữa các nước đi của cùng ván để lần tìm sau trúng cache nhiều hơn
+        self.tt_size_mb = tt_size_mb
+        if transposition_table is not None:
+            self.transposition_table = transposition_table
+        elif workers > 1 or ponder:
+            # Process con (Lazy SMP / ponder) ghi thẳng vào bảng chung -> lần tìm sau ở đây dùng lại được
+            self.transposition_table = TranspositionTable.shared(tt_size_mb)
+        else:
+            self.transposition_table = TranspositionTable(tt_size_mb)
+        # Điểm tĩnh của từng thế cờ (stand-pat của tìm kiếm tĩnh dùng lại, lô ở depth 1 ghi sẵn vào)
+        self.eval_cache = EvalCache()
+
+        # --- TÌM KIẾM TĨNH (Quiescence): ở lá đi tiếp các nước ăn quân cho tới khi "yên" ---
+        self.use_quiescence = use_quiescence
+
+        # --- NEGAMAX PVS: từng kỹ thuật bật / tắt riêng để đo số nút tiết kiệm (ai/bench_search.py) ---
+        self.use_pvs = use_pvs                        # Nước sau nước đầu: tìm cửa sổ rỗng, vượt alpha mới tìm lại
+        self.use_null_move = use_null_move            # Nhường lượt: vẫn >= beta -> cắt luôn
+        self.use_lmr = use_lmr                        # Nước thường xếp muộn: tìm nông hơn 1-2 tầng
+        self.use_check_extension = use_check_extension  # Đang bị chiếu: tìm sâu thêm 1 tầng
+        self.use_aspiration = use_aspiration          # Gốc: cửa sổ hẹp quanh điểm của lần lặp trước
+        self.root_depth = 0
+
+        # Mã hóa bàn cờ thẳng vào bộ đệm float32 dùng lại (không qua chuỗi FEN)
+        self.encoder = BoardEncoder()
+
+        # --- TỐI ƯU 3: CHẤM ĐIỂM LÁ THEO LÔ (BATCH) ---
+        # Ở nút depth 1: nước đầu (TT / PV, hay gây cắt nhất) chấm riêng; nước đầu không cắt thì chấm mọi nước
+        # còn lại (tối đa MAX_BATCH) trong 1 lần forward. Mặc định tắt: chỉ bật khi
+        # python -m ai.bench_search --batch cho thấy số thế / giây và thời gian tới cùng độ sâu tốt hơn.
+        self.batch_leaves = batch_leaves
+        self.stats = self.new_stats()
         
         try:
-            self.model.load_state_dict(torch.load(model_path, map_location=self.device))
-            self.model.eval()
-            print(f"✅ Bot Speed: Cache + Beam Search (Depth {self.base_depth})")
+            # BatchNorm gộp vào Conv; quantize=True: thêm int8 động cho các lớp Linear
+            self.model = load_for_inference(model_path, self.device, quantize)
+            mode = "int8" if quantize else "fp32"
+            print(f"✅ Bot Speed: TT + Alpha-Beta (Depth {self.base_depth}, {mode})")
         except:
+            self.model = XiangqiNet().to(self.device).eval()
             print("⚠️ Lỗi nạp model")
 
-        self.piece_values = {
-            'r': 90, 'n': 40, 'b': 20, 'a': 20, 'k': 1000, 'c': 45, 'p': 10,
-            'R': 90, 'N': 40, 'B': 20, 'A': 20, 'K': 1000, 'C': 45, 'P': 10
-        }
+
+    def close(self):
+        """Tắt process pool của Lazy SMP (nếu có)."""
+        if self.smp is not None:
+            self.smp.close()
+            self.smp = None
+
+    def new_stats(self):
+        return {'leaves': 0, 'batches': 0, 'batched': 0, 'max_batch': 0, 'cutoffs': 0, 'first_cutoffs': 0,
+                'qnodes': 0, 'null_cutoffs': 0, 'reductions': 0, 're_searches': 0, 'extensions': 0,
+                'aspiration_fails': 0}
 
     def count_pieces(self, board):
-        count = 0
-        for r in range(10):
-            for c in range(9):
-                if board.board[r][c]: count += 1
-        return count
-
-    def get_best_move(self, real_board):
-        # Xóa bộ nhớ đệm cũ mỗi lần đi mới (để tiết kiệm RAM)
-        self.transposition_table.clear()
-        
+        occ = board.bitboards.occ
+        return bin(occ[0] | occ[1]).count('1')
+
+    def time_budget(self, remaining_time=None, time_limit=None):
+        """Số giây cho nước này: theo đồng hồ còn lại (chia ~30 nước) nếu có, không vượt move_time."""
+        if time_limit is not None:
+            return time_limit
+        if remaining_time is not None:
+            return max(0.1, min(self.move_time, remaining_time / 30.0))
+        return self.move_time
+
+    def prepare_search(self, real_board):
+        """Chép bàn cờ, chọn độ sâu tối đa, đặt gốc và tuổi bảng TT. Trả về (board, độ sâu) hoặc (None, 0)."""
         board = real_board.copy()
         if not hasattr(board, 'validator') or not board.validator:
             board.validator = real_board.validator
-        if not board.validator: return None
+        if not board.validator: return None, 0
 
         # Tự động tăng độ sâu khi ít quân
         num_pieces = self.count_pieces(board)
@@ -47,135 +171,571 @@ class CustomXiangqiBot:
         
         # Chỉ tăng depth khi còn rất ít quân để tránh lag
         if num_pieces < 10: current_depth += 1 
-        
-        print(f"🤖 Bot tính Depth {current_depth} ({num_pieces} quân)...")
 
-        is_maximizing = (board.current_turn == 'white')
-        best_val, best_move = self.minimax(board, current_depth, -1000000, 1000000, is_maximizing)
-        
-        return best_move
-
-    def minimax(self, board, depth, alpha, beta, is_maximizing):
-        # 1. CHECK GAME OVER
-        if board.game_over:
-            if board.winner == 'white': return 100000 + depth, None
-            elif board.winner == 'black': return -100000 - depth, None
-            else: return 0, None
-
-        # 2. ĐIỂM DỪNG & TRA CỨU CACHE
-        # Tạo khóa (Key) đại diện cho bàn cờ hiện tại
-        board_key = board.to_fen() # FEN là duy nhất cho mỗi thế cờ
+        # Thế cờ lặp lại bên trong cây tìm kiếm (so với gốc) coi như hòa
+        self.root_ply = len(board.move_stack)
+
+        # Cùng ván: giữ bảng, chỉ tăng tuổi. Ván mới (hoặc vừa undo về trước): xóa bảng
+        if self.last_root_ply is None or self.root_ply < self.last_root_ply:
+            self.transposition_table.clear()
+        self.transposition_table.new_search()
+        self.last_root_ply = self.root_ply
+        return board, current_depth
+
+    def get_best_move(self, real_board, time_limit=None, remaining_time=None, node_limit=None):
+        """
+        Tìm nước đi bằng lặp sâu dần 1, 2, ... tới độ sâu tối đa trong ngân sách thời gian / số nút.
+        - time_limit: số giây cố định cho nước này
+        - remaining_time: thời gian còn lại trên đồng hồ (GameSidebar) -> tự chia ngân sách
+        Hết ngân sách giữa chừng: dừng ngay, trả nước tốt nhất của độ sâu đã tính xong gần nhất.
+        Đang ponder đúng thế cờ này: cho ponder chạy tiếp trong ngân sách rồi dùng luôn kết quả.
+        """
+        budget = self.time_budget(remaining_time, time_limit)
+        move = self.finish_ponder(real_board, budget)
+        if move is not None:
+            return Move(move)
+
+        board, current_depth = self.prepare_search(real_board)
+        if board is None: return None
+        print(f"🤖 Bot tính tối đa Depth {current_depth} ({self.count_pieces(board)} quân), {budget:.1f}s...")
+
+        best_move, _, _ = self.search(board, current_depth, budget, node_limit)
         
-        # Nếu thế cờ này đã từng tính rồi -> Lấy ra dùng luôn (Siêu nhanh)
-        if depth == 0:
-            if board_key in self.transposition_table:
-                return self.transposition_table[board_key], None
-            
-            score = self.evaluate(board)
-            self.transposition_table[board_key] = score # Lưu lại
+        # Trong lúc tìm kiếm nước đi là số nguyên, trả ra ngoài dạng Move (unpack được như tuple)
+        return Move(best_move) if best_move is not None else None
+
+    def search(self, board, max_depth, budget=None, node_limit=None, stop=None, in_pool=False):
+        """
+        Một lần tìm trong process này hoặc Lazy SMP (workers > 1). Trả về (nước, điểm, độ sâu đã xong).
+        in_pool: tìm trong process pool cả khi workers = 1 (ponder).
+        """
+        if self.workers > 1 or in_pool:
+            if self.smp is None:
+                from ai.lazy_smp import LazySMP
+                self.smp = LazySMP(self)
+            return self.smp.search(board, max_depth, budget, node_limit or self.node_limit, stop)
+        self.stop_flag = stop
+        try:
+            return self.iterative_deepening(board, max_depth, budget, node_limit)
+        finally:
+            self.stop_flag = None
+
+    # --- PONDER ---
+    def start_ponder(self, real_board):
+        """
+        Gọi sau khi bot vừa đi (tới lượt người chơi). Đoán nước đáp là nước thứ 2 của PV vừa tìm,
+        tìm trước thế cờ sau nước đó trong thread nền. Không đoán được: tìm thế cờ hiện tại
+        để làm nóng bảng TT cho mọi nước đáp.
+        """
+        self.stop_ponder()
+        if not self.ponder or real_board.game_over:
+            return
+        # PV tính từ thế cờ trước nước bot vừa đi: pv[0] phải đúng là nước đó (so ô đi / ô đến, bỏ cờ hiệu)
+        last = real_board.move_stack[-1][0] & 0xFFFF if real_board.move_stack else None
+        expected = self.pv[1] if len(self.pv) > 1 and self.pv[0] & 0xFFFF == last else None
+        if expected not in real_board.validator.generate_legal_moves(real_board, real_board.current_turn, packed=True):
+            expected = None
+        board, depth = self.prepare_search(real_board)
+        if board is None: return
+        if expected is not None:
+            board.push(expected)
+            # Gốc của lần tìm là thế cờ sau nước đoán
+            self.root_ply = self.last_root_ply = len(board.move_stack)
+        self.ponder_hash = board.hash if expected is not None else None
+        self.ponder_result = None
+        self.ponder_stop.value = False
+        print(f"💭 Ponder: {'đoán ' + str(Move(expected)) if expected else 'làm nóng bảng TT'}")
+        self.ponder_thread = threading.Thread(target=self._ponder, args=(board, depth), daemon=True)
+        self.ponder_thread.start()
+
+    def _ponder(self, board, depth):
+        self.verbose = False
+        try:
+            self.ponder_result = self.search(board, depth, stop=self.ponder_stop, in_pool=True)
+        except Exception as e:
+            print(f"❌ Lỗi ponder: {e}")
+        finally:
+            self.verbose = True
+
+    def stop_ponder(self):
+        """Dừng thread ponder (nếu có) và chờ nó thoát."""
+        if self.ponder_thread is None:
+            return
+        self.ponder_stop.value = True
+        self.ponder_thread.join()
+        self.ponder_thread = None
+
+    def finish_ponder(self, real_board, budget):
+        """
+        Người chơi vừa đi. Trúng nước đoán: ponder tìm tiếp tối đa 'budget' giây rồi trả nước đi của nó.
+        Trượt: dừng ponder, trả None (lần tìm thường sau đó vẫn dùng bảng TT đã được làm nóng).
+        """
+        if self.ponder_thread is None:
+            return None
+        hit = self.ponder_hash is not None and real_board.hash == self.ponder_hash
+        if hit:
+            self.ponder_thread.join(timeout=budget)
+        self.stop_ponder()
+        self.ponder_hash = None
+        if hit and self.ponder_result and self.ponder_result[0] is not None:
+            move, _, depth = self.ponder_result
+            print(f"🎯 Ponder trúng: {Move(move)} (depth {depth})")
+            return move
+        return None
+
+    def iterative_deepening(self, board, max_depth, budget=None, node_limit=None, depth_offset=0):
+        """
+        Lặp sâu dần 1 + depth_offset, ... tới max_depth + depth_offset. Trả về (nước tốt nhất, điểm, độ sâu đã xong).
+        budget=None: không tự dừng theo giờ (helper của Lazy SMP, dừng bằng stop_flag).
+        """
+        self.stats = self.new_stats()
+        t0 = time.perf_counter()
+        sign = 1 if board.current_turn == 'white' else -1
+        best_move = None
+        score = None
+        completed = 0
+        self.root_best = None
+        self.pv = []
+        self.killers = [[0, 0] for _ in range(self.MAX_PLY)]
+        self.history = [h >> 1 for h in self.history]  # Giữ lại một nửa kinh nghiệm của nước trước
+        self.nodes = 0
+        # Hạn chót theo giờ áp từ độ sâu 2 (độ sâu 1 luôn được tính trọn để có nước đi);
+        # giới hạn số nút áp ngay từ độ sâu 1, có hoặc không có ngân sách giờ
+        self.deadline = None
+        self.max_nodes = node_limit or self.node_limit
+        for depth in range(1 + depth_offset, max_depth + depth_offset + 1):
+            self.root_depth = depth
+            try:
+                score, move = self.search_root(board, depth, score)
+            except SearchTimeout:
+                if self.verbose:
+                    print(f"   ⏱️ Hết ngân sách ở depth {depth}, dùng kết quả depth {depth - 1}")
+                if best_move is None and not (self.stop_flag is not None and self.stop_flag.value):
+                    # Hết số nút ngay trong độ sâu 1: đi nước xếp đầu (TT / ăn quân / history)
+                    moves = self.get_ordered_moves(board, None, 0)
+                    best_move = moves[0] if moves else None
+                break
+            completed = depth
+            if move is not None:
+                best_move = self.root_best = move
+                self.pv = self.extract_pv(board, depth)
+            elapsed = time.perf_counter() - t0
+            # Điểm negamax theo bên đi -> in theo góc nhìn Đỏ như trước
+            if self.verbose:
+                print(f"   depth {depth}: {Move(best_move) if best_move else None} điểm {score * sign:.2f}, "
+                      f"{self.nodes} nút, {elapsed:.2f}s")
+            if abs(score) >= MATE_BOUND:
+                break
+            if budget is not None:
+                # Lần lặp sau thường lâu gấp vài lần -> quá nửa ngân sách thì không bắt đầu nữa
+                if elapsed > budget / 2:
+                    break
+                self.deadline = t0 + budget
+        self.deadline = self.max_nodes = None
+        if self.verbose:
+            self.report_stats(time.perf_counter() - t0)
+        return best_move, score, completed
+
+    def tick(self):
+        """Đếm 1 nút. Hết giờ / quá số nút -> dừng cứng bằng exception (bỏ dở lần lặp hiện tại)."""
+        self.nodes += 1
+        if self.stop_flag is not None and self.stop_flag.value:
+            raise SearchTimeout()
+        if self.max_nodes and self.nodes > self.max_nodes:
+            raise SearchTimeout()
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+    def search_root(self, board, depth, prev_score=None):
+        """
+        Tìm ở gốc với cửa sổ kỳ vọng (aspiration) quanh điểm của lần lặp trước:
+        rơi ra ngoài cửa sổ thì nới rộng gấp đôi về phía đó rồi tìm lại.
+        """
+        if not self.use_aspiration or prev_score is None or depth < 2 or abs(prev_score) >= MATE_BOUND:
+            return self.negamax(board, depth, -INF, INF, 0)
+        delta = self.ASPIRATION_WINDOW
+        alpha, beta = prev_score - delta, prev_score + delta
+        while True:
+            score, move = self.negamax(board, depth, alpha, beta, 0)
+            if score <= alpha:
+                alpha = max(-INF, alpha - delta)
+            elif score >= beta:
+                beta = min(INF, beta + delta)
+            else:
+                return score, move
+            self.stats['aspiration_fails'] += 1
+            delta *= 2
+            if delta > 8 * self.ASPIRATION_WINDOW:
+                alpha, beta = -INF, INF
+
+    def negamax(self, board, depth, alpha, beta, ply, allow_null=True):
+        """
+        Negamax PVS: điểm luôn theo góc nhìn bên đang đi (Đỏ: điểm model, Đen: đổi dấu).
+        Trả về (điểm, nước tốt nhất). ply: số nửa nước tính từ gốc (kể cả nước trống).
+        """
+        # Lá: chuyển sang tìm kiếm tĩnh (tự đếm nút, kiểm tra kết thúc / lặp / TT)
+        if depth <= 0 and self.use_quiescence:
+            return self.quiescence(board, alpha, beta, ply, 0), None
+
+        # 0. NGÂN SÁCH
+        self.tick()
+
+        # 1. CHECK GAME OVER (ăn Tướng / chiếu bí / hết nước: Validator.game_result, cache theo hash)
+        result = board.validator.game_result(board)
+        if result:
+            return self.result_score(board, result, ply), None
+
+        # Lặp thế cờ (tra lịch sử hash O(1)): không đi vòng lại, chấm hòa
+        if ply > 0 and board.repetition_count() > 1:
+            return 0, None
+
+        # 2. TRA CỨU CACHE
+        board_key = board.hash # Khóa Zobrist 64-bit, cập nhật O(1) theo từng nước đi
+        tt = self.transposition_table
+        alpha_orig, beta_orig = alpha, beta
+
+        # Nếu thế cờ này đã tính ở độ sâu đủ lớn -> dùng luôn (ở gốc vẫn tìm để chắc chắn có nước đi)
+        entry = tt.probe(board_key)
+        tt_move = None
+        if entry:
+            tt_depth, bound, score, tt_move = entry
+            score = score_from_tt(score, ply)
+            if tt_depth >= depth and ply > 0:
+                if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                    return score, tt_move or None
+
+        checked = in_check(board.bitboards, COLOR_INDEX[board.current_turn])
+        # Gia hạn khi bị chiếu (giới hạn theo độ sâu gốc để chuỗi chiếu liên tiếp không kéo dài vô hạn)
+        if checked and self.use_check_extension and ply < 2 * self.root_depth:
+            depth += 1
+            self.stats['extensions'] += 1
+
+        if depth <= 0:
+            score = self.relative_eval(board)
+            tt.store(board_key, 0, EXACT, score) # Lưu lại
             return score, None
 
-        # 3. LẤY NƯỚC ĐI
-        moves = self.get_ordered_moves(board)
+        pv_node = beta - alpha > self.NULL_WINDOW
+
+        # 3. NƯỚC TRỐNG (Null Move): nhường lượt mà vẫn >= beta -> thế cờ đủ tốt để cắt
+        if (self.use_null_move and allow_null and not pv_node and not checked and ply > 0
+                and depth >= self.NULL_MIN_DEPTH and self.relative_eval(board) >= beta):
+            attackers = self.attacking_pieces(board)
+            # Tàn cuộc chỉ còn Tốt / Sĩ / Tượng: dễ "cấm nước" (zugzwang), nhường lượt không an toàn
+            if attackers:
+                score = self.null_move_search(board, depth, beta, ply, attackers)
+                if score is not None:
+                    return score, None
+
+        # 4. LẤY NƯỚC ĐI (đã sắp xếp: TT / PV / ăn quân / killer / history; không cắt bớt nước nào)
+        # Ở gốc: nước tốt nhất của lần lặp trước đi đầu tiên
+        first = self.root_best if ply == 0 else tt_move
+        moves = self.get_ordered_moves(board, first, ply)
         if not moves: return (0, None)
 
-        # --- TỐI ƯU 2: BEAM SEARCH (CẮT TỈA) ---
-        # Thay vì tính hết 40 nước đi, chỉ tính Top 10-15 nước ngon nhất
-        # (Vì moves đã được sắp xếp ưu tiên ăn quân rồi)
-        BEAM_WIDTH = 12 
-        # Nếu đang ở độ sâu lớn (gần gốc), tính kỹ hơn. Sâu quá thì cắt bớt.
-        if depth > 2: 
-            moves = moves[:20] # Giữ 15 nước
+        # Nút depth 1: nước đầu chấm riêng, không cắt thì cả các nước còn lại chấm chung 1 lô
+        prefetched = 1 if depth == 1 and self.batch_leaves else len(moves)
+        killers = self.killers[ply] if ply < self.MAX_PLY else (0, 0)
+        best_score = -INF
+        best_move = None
+        for i, move in enumerate(moves):
+            if i >= prefetched:
+                prefetched = i + self.MAX_BATCH
+                self.prefetch(board, moves[i:prefetched])
+            board.push(move)
+            if i == 0:
+                score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)[0]
+            else:
+                reduction = 0
+                if (self.use_lmr and i >= self.LMR_MIN_MOVES and depth >= self.LMR_MIN_DEPTH and not checked
+                        and not move & CAPTURE and move not in killers
+                        and not in_check(board.bitboards, COLOR_INDEX[board.current_turn])):
+                    reduction = 2 if i >= 2 * self.LMR_MIN_MOVES + 2 and depth >= 5 else 1
+                    self.stats['reductions'] += 1
+                # PVS: cửa sổ rỗng (alpha, alpha + ε); tắt PVS thì dùng cửa sổ đầy đủ
+                window = alpha + self.NULL_WINDOW if self.use_pvs else beta
+                score = -self.negamax(board, depth - 1 - reduction, -window, -alpha, ply + 1)[0]
+                if score > alpha and reduction:
+                    # Nước bị giảm lại vượt alpha: tìm lại đủ độ sâu
+                    self.stats['re_searches'] += 1
+                    score = -self.negamax(board, depth - 1, -window, -alpha, ply + 1)[0]
+                if alpha < score < beta and window < beta:
+                    self.stats['re_searches'] += 1
+                    score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)[0]
+            board.pop()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                self.on_cutoff(board, move, depth, ply, i)
+                break
+        self.store(board_key, depth, ply, best_score, best_move, alpha_orig, beta_orig)
+        return best_score, best_move
+
+    def null_move_search(self, board, depth, beta, ply, attackers):
+        """
+        Thử nhường lượt (chỉ đổi lượt + hash, không đụng bàn cờ) và tìm nông hơn R tầng với cửa sổ rỗng ở beta.
+        Trả về điểm nếu được phép cắt, None nếu không.
+        Bên đi còn ít quân tấn công (Xe / Pháo / Mã): kiểm chứng lại bằng tìm kiếm thường cùng độ sâu giảm.
+        """
+        reduction = 3 if depth >= 6 else 2
+        board.switch_turn()
+        score = -self.negamax(board, depth - 1 - reduction, -beta, -beta + self.NULL_WINDOW, ply + 1, False)[0]
+        board.switch_turn()
+        if score < beta:
+            return None
+        if score >= MATE_BOUND:
+            score = beta  # Không tin điểm chiếu hết có được nhờ nhường lượt
+        if attackers <= self.NULL_VERIFY_PIECES:
+            verify = self.negamax(board, depth - 1 - reduction, beta - self.NULL_WINDOW, beta, ply, False)[0]
+            if verify < beta:
+                return None
+        self.stats['null_cutoffs'] += 1
+        return score
+
+    def attacking_pieces(self, board):
+        """Số Xe + Pháo + Mã của bên đang đi (0 -> không thử nước trống)."""
+        pieces = board.bitboards.pieces
+        base = COLOR_INDEX[board.current_turn] * 7
+        return bin(pieces[base + CHARIOT] | pieces[base + CANNON] | pieces[base + HORSE]).count('1')
+
+    def result_score(self, board, result, ply):
+        """Điểm thế cờ đã kết thúc theo bên đi: thắng / thua sớm hơn thì tuyệt đối lớn hơn."""
+        winner = result[0]
+        if winner == board.current_turn: return MATE - ply
+        elif winner in ('white', 'black'): return -(MATE - ply)
+        return 0
+
+    def on_cutoff(self, board, move, depth, ply, index):
+        """Nước 'move' (thứ index trong danh sách) gây cắt: ghi thống kê, cập nhật killer / history."""
+        self.stats['cutoffs'] += 1
+        if index == 0:
+            self.stats['first_cutoffs'] += 1
+        if move & CAPTURE:
+            return
+        killers = self.killers[ply] if ply < self.MAX_PLY else None
+        if killers is not None and killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        # Quân vừa đi đang đứng ở ô cũ (đã pop) -> mã quân đọc ở ô đi
+        code = board.mailbox[board._offset + ((move >> 4) & 0xF) * board._stride + (move & 0xF)]
+        self.history[code * 90 + ((move >> 12) & 0xF) * 9 + ((move >> 8) & 0xF)] += depth * depth
+
+    def extract_pv(self, board, depth):
+        """Đi theo nước tốt nhất trong bảng TT từ gốc để lấy chuỗi nước chính (PV)."""
+        pv = []
+        for _ in range(depth):
+            entry = self.transposition_table.probe(board.hash)
+            if not entry or not entry[3]:
+                break
+            move = entry[3]
+            if move not in board.validator.generate_legal_moves(board, board.current_turn, packed=True):
+                break
+            board.push(move)
+            pv.append(move)
+        for _ in pv:
+            board.pop()
+        return pv
+
+    def store(self, key, depth, ply, score, move, alpha, beta):
+        """
+        Lưu kết quả nút vào bảng kèm loại cận theo cửa sổ (alpha, beta) lúc vào nút.
+        Điểm chiếu hết được đổi sang tính từ nút này (score_to_tt), khi tra sẽ cộng lại ply của nút tra.
+        """
+        if score <= alpha: bound = UPPER
+        elif score >= beta: bound = LOWER
+        else: bound = EXACT
+        self.transposition_table.store(key, depth, bound, score_to_tt(score, ply), move)
+
+    def quiescence(self, board, alpha, beta, ply, qply):
+        """
+        Tìm kiếm tĩnh ở lá (negamax): chỉ đi tiếp các nước ăn quân để không chấm điểm giữa chừng một cuộc đổi quân.
+        - Stand-pat: bên đi được quyền dừng với điểm tĩnh hiện tại.
+        - Đang bị chiếu: không được stand-pat, xét mọi nước thoát chiếu.
+        - Bỏ nước ăn không thể kéo điểm qua alpha (delta pruning) và nước ăn lỗ (SEE < 0).
+        """
+        self.tick()
+        self.stats['qnodes'] += 1
+
+        result = board.validator.game_result(board)
+        if result:
+            return self.result_score(board, result, ply)
+        if ply > 0 and board.repetition_count() > 1:
+            return 0
+
+        board_key = board.hash
+        tt = self.transposition_table
+        alpha_orig, beta_orig = alpha, beta
+        entry = tt.probe(board_key)
+        tt_move = None
+        if entry:
+            _, bound, score, tt_move = entry
+            score = score_from_tt(score, ply)
+            if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                return score
+
+        if in_check(board.bitboards, COLOR_INDEX[board.current_turn]):
+            if qply >= self.MAX_QPLY:
+                return self.relative_eval(board)
+            best_score = -INF
+            moves = self.get_ordered_moves(board, tt_move, ply)
         else:
-            moves = moves[:10]  # Chỉ giữ 8 nước ngon nhất
+            stand_pat = self.relative_eval(board)
+            if qply >= self.MAX_QPLY or stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            best_score = stand_pat
+            moves = self.get_captures(board, stand_pat, alpha, tt_move)
 
         best_move = None
+        for move in moves:
+            board.push(move)
+            score = -self.quiescence(board, -beta, -alpha, ply + 1, qply + 1)
+            board.pop()
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        self.store(board_key, 0, ply, best_score, best_move, alpha_orig, beta_orig)
+        return best_score
+
+    def get_captures(self, board, stand_pat, alpha, tt_move=None):
+        """
+        Nước ăn quân cho tìm kiếm tĩnh, xếp theo MVV-LVA. Bỏ qua:
+        - delta pruning: stand_pat cộng giá trị quân bị ăn + DELTA_MARGIN vẫn không vượt alpha
+        - SEE < 0: chỉ tính khi quân ăn đắt hơn quân bị ăn (ngược lại SEE luôn >= 0)
+        """
+        mailbox, offset, stride = board.mailbox, board._offset, board._stride
+        values = board._code_value
+        bb = board.bitboards
+        scored = []
+        for m in board.validator.generate_legal_moves(board, board.current_turn, packed=True):
+            if not m & CAPTURE:
+                continue
+            fr, fc, tr, tc = (m >> 4) & 0xF, m & 0xF, (m >> 12) & 0xF, (m >> 8) & 0xF
+            victim = values[mailbox[offset + tr * stride + tc]]
+            attacker = values[mailbox[offset + fr * stride + fc]]
+            if stand_pat + victim / 1000.0 + self.DELTA_MARGIN <= alpha:
+                continue
+            if attacker > victim and see(bb, fr * 9 + fc, tr * 9 + tc) < 0:
+                continue
+            score = 1 << 30 if m == tt_move else victim * 16 - attacker // 16
+            scored.append((score, m))
+        scored.sort(reverse=True)
+        return [m for _, m in scored]
 
-        if is_maximizing: # ĐỎ (Max)
-            max_eval = -float('inf')
-            for move in moves:
-                start, end = move
-                captured = board.move_piece_dry_run(start, end)
-                
-                eval_score, _ = self.minimax(board, depth - 1, alpha, beta, False)
-                
-                board.undo_move_dry_run(start, end, captured)
-                
-                if eval_score > max_eval:
-                    max_eval = eval_score
-                    best_move = move
-                
-                alpha = max(alpha, eval_score)
-                if beta <= alpha: break
-            return max_eval, best_move
-
-        else: # ĐEN (Min)
-            min_eval = float('inf')
-            for move in moves:
-                start, end = move
-                captured = board.move_piece_dry_run(start, end)
-                
-                eval_score, _ = self.minimax(board, depth - 1, alpha, beta, True)
-                
-                board.undo_move_dry_run(start, end, captured)
-                
-                if eval_score < min_eval:
-                    min_eval = eval_score
-                    best_move = move
-                
-                beta = min(beta, eval_score)
-                if beta <= alpha: break
-            return min_eval, best_move
+    def relative_eval(self, board):
+        """Điểm tĩnh theo góc nhìn bên đang đi (evaluate trả theo góc nhìn Đỏ)."""
+        score = self.evaluate(board)
+        return score if board.current_turn == 'white' else -score
 
     def evaluate(self, board):
-        # Kết hợp AI + Vật chất
-        fen = board.to_fen()
-        with torch.no_grad():
-            t = fen_to_tensor(fen).unsqueeze(0).to(self.device)
+        # Kết hợp AI + Vật chất (tra eval_cache trước)
+        score = self.eval_cache.get(board.hash)
+        if score is not None:
+            return score
+        with torch.inference_mode():
+            t = self.encoder.encode(board).to(self.device)
             # Nhân 5.0 để AI quyết định chiến thuật chính
             ai_score = self.model(t).item() * 5.0 
+        self.stats['leaves'] += 1
 
         mat_score = self.get_material_score(board)
-        return ai_score + mat_score
+        score = ai_score + mat_score
+        self.eval_cache.put(board.hash, score)
+        return score
+
+    def prefetch(self, board, moves):
+        """
+        Đi thử từng nước con, thế cờ nào chưa kết thúc và chưa có trong eval_cache thì ghi vào bộ đệm encoder,
+        cuối cùng chấm cả lô bằng 1 lần forward và lưu vào eval_cache.
+        Bỏ qua thế cờ con đang bị chiếu khi có tìm kiếm tĩnh (không stand-pat nên không cần điểm tĩnh).
+        """
+        cache = self.eval_cache
+        pending = []  # (hash, điểm vật chất)
+        for move in moves:
+            board.push(move)
+            key = board.hash
+            if (cache.get(key) is None and not board.validator.game_result(board)
+                    and not (self.use_quiescence and in_check(board.bitboards, COLOR_INDEX[board.current_turn]))):
+                self.encoder.write(len(pending), board)
+                pending.append((key, self.get_material_score(board)))
+            board.pop()
+
+        if pending:
+            with torch.inference_mode():
+                out = self.model(self.encoder.batch(len(pending)).to(self.device)).view(-1).tolist()
+            for (key, mat_score), ai_score in zip(pending, out):
+                cache.put(key, ai_score * 5.0 + mat_score)
+            self.stats['leaves'] += len(pending)
+            self.stats['batched'] += len(pending)
+            self.stats['batches'] += 1
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(pending))
+
+    def report_stats(self, elapsed):
+        """In thống kê lần tìm kiếm vừa xong: số thế cờ lá đã chấm, kích thước lô, thế cờ / giây."""
+        stats = self.stats
+        rate = stats['leaves'] / elapsed if elapsed > 0 else 0
+        tt = self.transposition_table
+        if stats['cutoffs']:
+            print(f"✂️ Cắt tỉa: {stats['cutoffs']} lần, nước đầu tiên gây cắt "
+                  f"{stats['first_cutoffs'] / stats['cutoffs']:.1%}")
+        if stats['null_cutoffs'] or stats['reductions'] or stats['aspiration_fails']:
+            print(f"🪓 Nước trống cắt {stats['null_cutoffs']}, LMR {stats['reductions']} "
+                  f"(tìm lại {stats['re_searches']}), gia hạn chiếu {stats['extensions']}, "
+                  f"trượt cửa sổ gốc {stats['aspiration_fails']}")
+        if stats['qnodes']:
+            print(f"🔍 Tìm kiếm tĩnh: {stats['qnodes']} nút / {self.nodes} nút")
+        print(f"🗂️ TT: trúng {tt.hit_rate():.1%} / {tt.probes} lần tra, đầy ~{tt.hashfull():.0%}")
+        if stats['batches']:
+            avg = stats['batched'] / stats['batches']
+            print(f"📦 Batch: {stats['batches']} lô, TB {avg:.1f} thế/lô (max {stats['max_batch']}), "
+                  f"{stats['leaves']} lá, {rate:,.0f} thế/giây")
+        else:
+            print(f"📦 {stats['leaves']} lá, {rate:,.0f} thế/giây")
 
     def get_material_score(self, board):
-        score = 0
-        for r in range(10):
-            for c in range(9):
-                p = board.board[r][c]
-                if p:
-                    val = self.piece_values.get(p.symbol, 0)
-                    if p.color == 'white': score += val
-                    else: score -= val
-        return score / 100.0
-
-    def get_ordered_moves(self, board):
-        all_moves = []
-        capture_moves = []
-        quiet_moves = []
-        rows = 10; cols = 9
-        for r in range(rows):
-            for c in range(cols):
-                piece = board.board[r][c]
-                if piece and piece.color == board.current_turn:
-                    try:
-                        dests = board.validator.get_valid_moves_for_piece(board, (r, c), board.current_turn)
-                    except:
-                        dests = board.validator.get_valid_moves_for_piece(board, (r, c))
-                    
-                    if dests:
-                        for d in dests:
-                            move = ((r, c), d)
-                            target = board.board[d[0]][d[1]]
-                            if target: # Nước ăn quân
-                                val = self.piece_values.get(target.symbol, 0)
-                                capture_moves.append((val, move))
-                            else:
-                                quiet_moves.append(move)
-        
-        # Sắp xếp nước ăn quân: Ăn quân to nhất lên đầu
-        capture_moves.sort(key=lambda x: x[0], reverse=True)
-        sorted_captures = [m[1] for m in capture_moves]
-        random.shuffle(quiet_moves)
-        
-        return sorted_captures + quiet_moves
\ No newline at end of file
+        # Board cập nhật sẵn tổng giá trị quân mỗi bên (centipawn: Xe 900, Pháo 450, Mã 400...)
+        material = board.material
+        return (material[0] - material[1]) / 1000.0
+
+    def get_ordered_moves(self, board, tt_move=None, ply=0):
+        """
+        Sắp xếp nước đi (mỗi nước là 1 số nguyên): nước trong bảng TT > nước PV của lần lặp trước
+        > ăn quân (quân bị ăn to nhất, quân ăn nhỏ nhất trước) > 2 nước killer của tầng > ăn lỗ (SEE < 0)
+        > nước thường theo history.
+        """
+        moves = board.validator.generate_legal_moves(board, board.current_turn, packed=True)
+        pv_move = self.pv[ply] if ply < len(self.pv) else None
+        killers = self.killers[ply] if ply < self.MAX_PLY else (0, 0)
+        mailbox, offset, stride = board.mailbox, board._offset, board._stride
+        values, history = board._code_value, self.history
+        bb = board.bitboards
+        scored = []
+        for m in moves:
+            if m == tt_move:
+                score = 1 << 30
+            elif m == pv_move:
+                score = 1 << 29
+            elif m & CAPTURE:
+                victim = mailbox[offset + ((m >> 12) & 0xF) * stride + ((m >> 8) & 0xF)]
+                attacker = mailbox[offset + ((m >> 4) & 0xF) * stride + (m & 0xF)]
+                score = (1 << 28) + values[victim] * 16 - values[attacker] // 16
+                # Ăn lỗ (SEE < 0) xếp sau killer
+                if values[attacker] > values[victim]:
+                    gain = see(bb, ((m >> 4) & 0xF) * 9 + (m & 0xF), ((m >> 12) & 0xF) * 9 + ((m >> 8) & 0xF))
+                    if gain < 0:
+                        score = (1 << 26) + gain
+            elif m == killers[0]:
+                score = (1 << 27) + 1
+            elif m == killers[1]:
+                score = 1 << 27
+            else:
+                code = mailbox[offset + ((m >> 4) & 0xF) * stride + (m & 0xF)]
+                score = history[code * 90 + ((m >> 12) & 0xF) * 9 + ((m >> 8) & 0xF)]
+            scored.append((score, m))
+        scored.sort(reverse=True)
+        return [m for _, m in scored]
@@ -2,6 +2,10 @@ from stockfish import Stockfish
 import os
 
 class StockfishAdapter:
+    # Hàm nội bộ của python-stockfish dùng để gửi / đọc UCI thô (go ponder, ponderhit, stop).
+    # Không phải API công khai: phiên bản thư viện được ghim trong requirements.txt (stockfish==3.28.0)
+    RAW_UCI_ATTRS = ("_put", "_read_line")
+
     def __init__(self, difficulty="MEDIUM"):
         # --- [SỬA LẠI ĐƯỜNG DẪN] ---
         # Lấy thư mục chứa file script này (tức là thư mục ai/engines/)
@@ -12,6 +16,13 @@ class StockfishAdapter:
         
         print(f"--> [DEBUG] Đang tìm Stockfish tại: {exe_path}")
 
+        # --- [MỚI] PONDER: nghĩ trên thời gian của người chơi (UCI "go ponder") ---
+        self.ponder_move = None    # Nước đáp engine đoán (từ dòng "bestmove ... ponder ...")
+        self.pondering = False
+        self.ponder_fen = None     # FEN thế cờ sau nước đoán (so với FEN thật khi người chơi đi)
+        self.depth = None          # Độ sâu "go depth" (set_difficulty)
+        self.raw_uci = False       # Gửi / đọc lệnh UCI thô được không (xem _uci)
+
         if not os.path.exists(exe_path):
             print(f"❌ LỖI NGHIÊM TRỌNG: Không tìm thấy file stockfish.exe!")
             print(f"   (Bạn hãy chắc chắn file tên là 'stockfish.exe' chứ không phải tên dài ngoằng)")
@@ -21,6 +32,13 @@ class StockfishAdapter:
         try:
             self.engine = Stockfish(path=exe_path)
             self.set_difficulty(difficulty)
+            self.raw_uci = all(hasattr(self.engine, name) for name in self.RAW_UCI_ATTRS)
+            if not self.raw_uci:
+                print(f"⚠️ Thư viện stockfish không có {'/'.join(self.RAW_UCI_ATTRS)} "
+                      f"(cần đúng bản ghim trong requirements.txt): tắt ponder, dùng get_best_move thường")
+            try:
+                self.engine.update_engine_parameters({"Ponder": "true"})
+            except: pass  # Chỉ là gợi ý chia thời gian, "go ponder" vẫn chạy được khi thiếu
             print("✅ Kết nối Stockfish thành công!")
         except Exception as e:
             print(f"❌ Lỗi khởi tạo Stockfish: {e}")
@@ -42,6 +60,7 @@ class StockfishAdapter:
         # Cập nhật params
         self.engine.set_skill_level(config["skill"])
         self.engine.set_depth(config["depth"])
+        self.depth = config["depth"]
         self.engine.update_engine_parameters({"Minimum Thinking Time": config["time"]})
 
     def get_best_move(self, fen_string):
@@ -51,12 +70,71 @@ class StockfishAdapter:
             return None
         
         try:
+            if self.pondering:
+                if self._same_position(fen_string, self.ponder_fen):
+                    # Đoán trúng: engine chuyển từ ponder sang tìm thật, giữ nguyên cây đã tính
+                    print(f"🎯 Ponder trúng ({self.ponder_move})")
+                    self.pondering = False
+                    return self._uci("ponderhit", read_best_move=True)
+                # Đoán trượt: dừng, bảng hash của engine vẫn còn (không gửi ucinewgame)
+                self.stop_ponder()
+
             if self.engine.is_fen_valid(fen_string):
-                self.engine.set_fen_position(fen_string)
-                return self.engine.get_best_move()
+                # Không gửi ucinewgame: bảng hash của engine giữ lại giữa các nước
+                self.engine.set_fen_position(fen_string, send_ucinewgame_token=False)
+                if not self.raw_uci:
+                    return self.engine.get_best_move()
+                return self._uci(f"go depth {self.depth}", read_best_move=True)
             else:
                 print(f"⚠️ FEN không hợp lệ: {fen_string}")
                 return None
         except Exception as e:
             print(f"Lỗi khi tính nước đi: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def start_ponder(self, fen_string):
+        """
+        Gọi sau khi engine vừa đi (fen_string: thế cờ hiện tại, tới lượt người chơi).
+        Đi thử nước đáp engine đoán rồi "go ponder" trên thế cờ đó trong lúc người chơi suy nghĩ.
+        """
+        if not self.engine or not self.raw_uci or not self.ponder_move or self.pondering:
+            return False
+        try:
+            self._uci(f"position fen {fen_string} moves {self.ponder_move}")
+            self.ponder_fen = self.engine.get_fen_position()
+            self._uci(f"go ponder depth {self.depth}")
+            self.pondering = True
+            return True
+        except Exception as e:
+            print(f"Lỗi khi ponder: {e}")
+            return False
+
+    def stop_ponder(self):
+        """Dừng ponder (đoán trượt / hoàn tác / hết ván), bỏ nước đi engine trả về."""
+        if not self.pondering:
+            return
+        self.pondering = False
+        self._uci("stop", read_best_move=True)
+
+    def _uci(self, command, read_best_move=False):
+        """
+        Mọi lệnh UCI thô đi qua đây (dùng _put / _read_line nội bộ của python-stockfish, xem RAW_UCI_ATTRS).
+        - read_best_move: đọc output tới dòng 'bestmove <nước> [ponder <nước đoán>]', trả về nước đi và nhớ nước đoán.
+        """
+        missing = [name for name in self.RAW_UCI_ATTRS if not hasattr(self.engine, name)]
+        if missing:
+            raise RuntimeError(f"python-stockfish thiếu {', '.join(missing)}: cài đúng bản trong requirements.txt "
+                               f"(stockfish==3.28.0) để gửi lệnh UCI '{command}'")
+        self.engine._put(command)
+        if not read_best_move:
+            return None
+        while True:
+            parts = self.engine._read_line().split()
+            if parts and parts[0] == "bestmove":
+                self.ponder_move = parts[3] if len(parts) >= 4 and parts[2] == "ponder" else None
+                return None if parts[1] == "(none)" else parts[1]
+
+    @staticmethod
+    def _same_position(fen_a, fen_b):
+        # So vị trí quân + lượt đi + quyền nhập thành (bỏ qua en passant và bộ đếm nước)
+        return bool(fen_a and fen_b) and fen_a.split()[:3] == fen_b.split()[:3]
@@ -0,0 +1,103 @@
+"""
+Lazy SMP cho CustomXiangqiBot: nhiều process cùng tìm trên một thế cờ, chung bảng TT trong shared memory.
+
+- Process 0 là luồng chính: lặp sâu dần theo ngân sách thời gian / số nút, nước đi của nó được dùng.
+- Các process còn lại là helper: cùng lặp sâu dần không giới hạn giờ (helper lẻ đi trước 1 tầng)
+  để lấp đầy bảng TT cho luồng chính, dừng khi luồng chính xong (cờ dừng dùng chung).
+- Mỗi process nạp model 1 lần (initializer của pool), torch 1 luồng / process để không tranh CPU.
+- Cả luồng chính cũng chạy trong pool: thread AI của BoardUI chỉ chờ kết quả, không tranh GIL với vòng lặp vẽ.
+  Ponder cũng đi qua pool này (kể cả workers = 1, pool 1 process).
+- PV của luồng chính được trả về bot ở process cha (ponder đoán nước đáp từ PV).
+"""
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from ai.transposition import TranspositionTable
+from core.board import Board
+
+# Trạng thái riêng của từng process con (tạo trong _init_worker)
+_bot = None
+
+
+def _init_worker(bot_kwargs, buffers, tt_size_mb, stop_flag):
+    global _bot
+    from ai.custom_bot import CustomXiangqiBot
+    table = TranspositionTable(tt_size_mb, buffers=buffers)
+    _bot = CustomXiangqiBot(**bot_kwargs, transposition_table=table, intra_threads=1, inter_threads=1)
+    _bot.stop_flag = stop_flag
+
+
+def _search(job):
+    """Chạy trong process con: dựng lại thế cờ từ FEN + lịch sử hash rồi lặp sâu dần."""
+    fen, history, worker_id, max_depth, budget, node_limit, age, settings = job
+    board = Board.from_fen(fen, 'chinese_chess')
+    # Lịch sử hash của ván để vẫn nhận ra thế cờ lặp lại
+    board.position_history = list(history)
+    board.repetitions = {}
+    for h in history:
+        board.repetitions[h] = board.repetitions.get(h, 0) + 1
+
+    for name, value in settings.items():
+        setattr(_bot, name, value)
+    _bot.transposition_table.age = age
+    _bot.root_ply = len(board.move_stack)
+    _bot.verbose = _bot.verbose and worker_id == 0
+    if worker_id == 0:
+        move, score, depth = _bot.iterative_deepening(board, max_depth, budget, node_limit)
+    else:
+        move, score, depth = _bot.iterative_deepening(board, max_depth, depth_offset=worker_id & 1)
+    return move, score, depth, _bot.nodes, _bot.pv
+
+
+class LazySMP:
+    def __init__(self, bot):
+        self.bot = bot
+        self.workers = bot.workers
+        ctx = multiprocessing.get_context('spawn')  # torch không an toàn với fork khi đã có luồng
+        self.stop_flag = ctx.RawValue('b', 0)
+        bot_kwargs = {'model_path': bot.model_path, 'depth': bot.base_depth, 'batch_leaves': bot.batch_leaves,
+                      'quantize': bot.quantize, 'tt_size_mb': bot.tt_size_mb}
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=ctx, initializer=_init_worker,
+            initargs=(bot_kwargs, bot.transposition_table.buffers, bot.tt_size_mb, self.stop_flag))
+        self.nodes = 0
+
+    def search(self, board, max_depth, budget=None, node_limit=None, stop=None):
+        """
+        Tìm song song, trả về (nước, điểm, độ sâu đã xong) của luồng chính. Tổng số nút mọi process ghi vào bot.nodes.
+        stop: cờ dừng của process này (ponder), bật lên thì dừng mọi process.
+        """
+        from ai.custom_bot import SEARCH_SWITCHES
+        t0 = time.perf_counter()
+        fen = board.to_fen()
+        settings = {name: getattr(self.bot, name) for name in SEARCH_SWITCHES}
+        settings['verbose'] = self.bot.verbose
+        age = self.bot.transposition_table.age
+        self.stop_flag.value = 0
+        futures = [self.pool.submit(_search, (fen, board.position_history, i, max_depth, budget, node_limit,
+                                              age, settings))
+                   for i in range(self.workers)]
+        try:
+            while not futures[0].done():
+                if stop is not None and stop.value:
+                    self.stop_flag.value = 1
+                wait(futures[:1], timeout=0.05)
+            move, score, depth, nodes, pv = futures[0].result()
+        finally:
+            # Luồng chính xong (hoặc lỗi) -> dừng các helper
+            self.stop_flag.value = 1
+            helper_nodes = sum(f.result()[3] for f in futures[1:])
+            self.stop_flag.value = 0
+        nodes += helper_nodes
+        elapsed = time.perf_counter() - t0
+        self.bot.nodes = self.nodes = nodes
+        self.bot.pv = pv
+        rate = nodes / elapsed if elapsed > 0 else 0
+        if self.bot.verbose:
+            print(f"⚡ Lazy SMP: {self.workers} process, depth {depth}, {nodes} nút, {rate:,.0f} nút/giây")
+        return move, score, depth
+
+    def close(self):
+        self.stop_flag.value = 1
+        self.pool.shutdown(wait=True, cancel_futures=True)
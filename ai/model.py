@@ -29,4 +29,43 @@ class XiangqiNet(nn.Module):
         x = F.relu(self.fc1(x))
         x = self.dropout(x)
         x = torch.tanh(self.fc2(x)) # Output range [-1, 1]
-        return x
\ No newline at end of file
+        return x
+
+# =========================================================================
+# [MỚI] MODEL CHO SUY LUẬN TRÊN CPU (gộp BatchNorm, lượng tử hóa int8)
+# =========================================================================
+def configure_threads(intra_op=None, inter_op=None):
+    """Số luồng torch: intra_op (trong 1 phép toán), inter_op (giữa các phép toán). None = giữ mặc định."""
+    if intra_op:
+        torch.set_num_threads(intra_op)
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # Chỉ đặt được 1 lần, trước khi torch chạy song song lần đầu
+            print(f"⚠️ Không đổi được inter-op threads (đang là {torch.get_num_interop_threads()})")
+
+
+def fold_batchnorm(model):
+    """Gộp BatchNorm vào Conv2d đứng trước (model phải ở chế độ eval). bn1..bn3 thành Identity."""
+    model.eval()
+    return torch.ao.quantization.fuse_modules(
+        model, [['conv1', 'bn1'], ['conv2', 'bn2'], ['conv3', 'bn3']], inplace=False)
+
+
+def quantize_model(model):
+    """Gộp BatchNorm + lượng tử hóa động int8 cho các lớp Linear (fc1 11520x512 chiếm gần hết thời gian)."""
+    return torch.ao.quantization.quantize_dynamic(fold_batchnorm(model), {nn.Linear}, dtype=torch.qint8)
+
+
+def load_for_inference(model_path, device="cpu", quantize=False):
+    """Nạp trọng số XiangqiNet và chuẩn bị để chấm điểm (eval, tùy chọn int8)."""
+    model = XiangqiNet()
+    model.load_state_dict(torch.load(model_path, map_location=device))
+    model.eval()
+    if quantize:
+        # Lượng tử hóa động chỉ chạy trên CPU
+        model = quantize_model(model)
+    else:
+        model = fold_batchnorm(model).to(device)
+    return model
@@ -1,6 +1,8 @@
 import numpy as np
 import torch
 
+from core.board import FEN_CHARS
+
 # Map quân cờ (Viết hoa: Đỏ/Trắng, Viết thường: Đen)
 # Pikafish dùng: R, N, B, A, K, C, P
 PIECE_MAP = {
@@ -25,4 +27,84 @@ def fen_to_tensor(fen):
                     if r < 10 and c < 9: # Check an toàn
                         board[layer][r][c] = 1.0
                 c += 1
-    return torch.from_numpy(board)
\ No newline at end of file
+    return torch.from_numpy(board)
+
+# =========================================================================
+# [MỚI] MÃ HÓA THẲNG TỪ BOARD (không dựng / tách chuỗi FEN)
+# =========================================================================
+ROWS, COLS = 10, 9
+
+# Mã quân trong mailbox của Board (G/A/E/H/C/O/S) -> lớp theo PIECE_MAP (chữ FEN R/N/B/A/K/C/P), -1 = ô trống
+CODE_TO_PLANE = np.full(256, -1, dtype=np.int64)
+for _code, _char in enumerate(FEN_CHARS['chinese_chess']):
+    if _char:
+        CODE_TO_PLANE[_code] = PIECE_MAP[_char]
+
+_ROW_INDEX, _COL_INDEX = np.indices((ROWS, COLS)).reshape(2, -1)
+
+
+def _board_codes(board):
+    """Mảng (90,) mã quân đọc thẳng từ mailbox (bỏ hàng / cột đệm)."""
+    grid = np.frombuffer(board.mailbox, dtype=np.uint8).reshape(-1, board._stride)
+    top = board._offset // board._stride
+    return grid[top:top + ROWS, 1:1 + COLS].reshape(-1)
+
+
+def _fill(out, board):
+    """Ghi 14 lớp của 1 bàn cờ vào out (14, 10, 9) đã có sẵn."""
+    out.fill(0.0)
+    planes = CODE_TO_PLANE[_board_codes(board)]
+    occupied = planes >= 0
+    out[planes[occupied], _ROW_INDEX[occupied], _COL_INDEX[occupied]] = 1.0
+
+
+def board_to_tensor(board):
+    """Giống fen_to_tensor(board.to_fen()) nhưng đọc thẳng mailbox: tensor mới (14, 10, 9)."""
+    planes = np.zeros((14, ROWS, COLS), dtype=np.float32)
+    _fill(planes, board)
+    return torch.from_numpy(planes)
+
+
+class BoardEncoder:
+    """
+    Mã hóa Board cờ tướng vào bộ đệm float32 cấp phát sẵn (dùng lại ở mọi lần gọi).
+    Tensor trả về dùng chung bộ nhớ với bộ đệm: phải đưa vào model xong trước lần encode kế tiếp.
+    """
+    def __init__(self, capacity=1):
+        self.buffer = np.zeros((capacity, 14, ROWS, COLS), dtype=np.float32)
+        self.tensor = torch.from_numpy(self.buffer)
+
+    def _reserve(self, n):
+        if n > len(self.buffer):
+            self.buffer = np.zeros((n, 14, ROWS, COLS), dtype=np.float32)
+            self.tensor = torch.from_numpy(self.buffer)
+
+    def encode(self, board):
+        """1 bàn cờ -> tensor (1, 14, 10, 9), đưa thẳng vào model."""
+        _fill(self.buffer[0], board)
+        return self.tensor[:1]
+
+    def write(self, index, board):
+        """Ghi 1 bàn cờ vào hàng index của bộ đệm (gom dần thế cờ lá trong lúc push / pop)."""
+        if index >= len(self.buffer):
+            old = self.buffer
+            self.buffer = np.zeros((max(index + 1, 2 * len(old)), 14, ROWS, COLS), dtype=np.float32)
+            self.buffer[:len(old)] = old
+            self.tensor = torch.from_numpy(self.buffer)
+        _fill(self.buffer[index], board)
+
+    def batch(self, n):
+        """Tensor (n, 14, 10, 9) gồm n hàng đầu đã ghi bằng write()."""
+        return self.tensor[:n]
+
+    def encode_batch(self, boards):
+        """N bàn cờ -> tensor (N, 14, 10, 9)."""
+        n = len(boards)
+        self._reserve(n)
+        out = self.buffer[:n]
+        out.fill(0.0)
+        if n:
+            planes = CODE_TO_PLANE[np.stack([_board_codes(board) for board in boards])]
+            batch, square = np.nonzero(planes >= 0)
+            out[batch, planes[batch, square], _ROW_INDEX[square], _COL_INDEX[square]] = 1.0
+        return self.tensor[:n]
@@ -0,0 +1,155 @@
+"""
+Bảng chuyển vị (Transposition Table) kích thước cố định, khóa Zobrist (board.hash).
+
+Lưu trong 3 mảng song song (array), mỗi ô tốn 24 byte, không tăng theo số nút đã duyệt:
+    keys[i]   : hash 64-bit của thế cờ XOR meta[i] XOR 64 bit của scores[i] (0 = ô trống)
+    scores[i] : điểm (float, góc nhìn bên đang đi như negamax)
+    meta[i]   : nước đi tốt nhất (bit 0-23) | độ sâu (bit 24-31) | loại cận (bit 32-33) | tuổi (bit 34-41)
+
+Ô được chọn bằng hash & mask. Thay thế: ô trống / ô của lần tìm kiếm cũ (tuổi khác) / độ sâu mới >= độ sâu cũ
+-> ghi đè; còn lại giữ ô sâu hơn (depth-preferred + aging). Cùng thế cờ mà ô sâu hơn: chỉ cập nhật nước đi.
+Bảng giữ nguyên giữa các nước đi của cùng một ván (chỉ tăng tuổi), clear() khi sang ván mới.
+
+TranspositionTable.shared(): 3 mảng nằm trong shared memory (multiprocessing.RawArray) để nhiều process
+(Lazy SMP, ai/lazy_smp.py) cùng đọc / ghi không khóa. Khóa lưu dạng hash XOR meta XOR điểm: ô bị ghi dở
+bởi 2 process cùng lúc (meta / điểm của lần ghi này, khóa của lần ghi kia) sẽ không khớp khi tra
+và bị coi như trống.
+"""
+import struct
+from array import array
+from multiprocessing import RawArray
+from typing import Optional, Tuple
+
+# Loại cận của điểm
+EXACT = 0
+LOWER = 1   # Điểm thật >= score (cắt beta)
+UPPER = 2   # Điểm thật <= score (không nước nào vượt alpha)
+
+_MOVE_MASK = (1 << 24) - 1
+_ENTRY_BYTES = 8 + 8 + 8
+_DOUBLE = struct.Struct('<d')
+_UINT64 = struct.Struct('<Q')
+
+
+def _score_bits(score: float) -> int:
+    # 64 bit của số thực (đọc lại dạng số nguyên) để gộp điểm vào phép XOR kiểm tra khóa
+    return _UINT64.unpack(_DOUBLE.pack(score))[0]
+
+
+def _table_size(size_mb: int) -> int:
+    # Số ô là lũy thừa của 2 để lấy chỉ số bằng phép AND
+    n = 1
+    while n * 2 * _ENTRY_BYTES <= size_mb * 1024 * 1024:
+        n *= 2
+    return n
+
+
+class TranspositionTable:
+    def __init__(self, size_mb: int = 16, buffers=None):
+        """buffers: (keys, scores, meta) kiểu RawArray dùng chung giữa các process (xem shared())."""
+        n = _table_size(size_mb)
+        self.size = n
+        self.mask = n - 1
+        self.buffers = buffers
+        if buffers is None:
+            self.keys = array('Q', bytes(8 * n))
+            self.scores = array('d', bytes(8 * n))
+            self.meta = array('Q', bytes(8 * n))
+        else:
+            # memoryview trên shared memory: đọc / ghi theo chỉ số như array
+            self.keys, self.scores, self.meta = (memoryview(b).cast('B').cast(t) for b, t in zip(buffers, 'QdQ'))
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+
+    @classmethod
+    def shared(cls, size_mb: int = 16) -> 'TranspositionTable':
+        """Bảng trong shared memory; truyền table.buffers cho process con để dùng chung."""
+        n = _table_size(size_mb)
+        return cls(size_mb, (RawArray('Q', n), RawArray('d', n), RawArray('Q', n)))
+
+    def clear(self):
+        """Xóa toàn bộ (ván mới)."""
+        if self.buffers is None:
+            self.keys = array('Q', bytes(8 * self.size))
+            self.scores = array('d', bytes(8 * self.size))
+            self.meta = array('Q', bytes(8 * self.size))
+        else:
+            for b in self.buffers:
+                raw = memoryview(b).cast('B')
+                raw[:] = bytes(len(raw))
+        self.age = 0
+        self.probes = self.hits = 0
+
+    def new_search(self):
+        """Bắt đầu lần tìm kiếm mới: ô của các lần trước thành 'cũ', được ưu tiên ghi đè."""
+        self.age = (self.age + 1) & 0xFF
+        self.probes = self.hits = 0
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, float, int]]:
+        """(độ sâu, loại cận, điểm, nước đi) nếu có thế cờ này, ngược lại None."""
+        self.probes += 1
+        i = key & self.mask
+        meta = self.meta[i]
+        score = self.scores[i]
+        if self.keys[i] ^ meta ^ _score_bits(score) != key:
+            return None
+        self.hits += 1
+        return (meta >> 24) & 0xFF, (meta >> 32) & 0x3, score, meta & _MOVE_MASK
+
+    def store(self, key: int, depth: int, bound: int, score: float, move: Optional[int] = None):
+        i = key & self.mask
+        meta = self.meta[i]
+        old_key = self.keys[i] ^ meta ^ _score_bits(self.scores[i])
+        if old_key and old_key != key:
+            # Ô của lần tìm kiếm hiện tại và sâu hơn -> giữ lại
+            if (meta >> 34) & 0xFF == self.age and (meta >> 24) & 0xFF > depth:
+                return
+        elif old_key == key:
+            if (meta >> 34) & 0xFF == self.age and (meta >> 24) & 0xFF > depth:
+                # Cùng thế cờ, ô sâu hơn của lần tìm này (vd. tìm kiếm tĩnh ghi depth 0):
+                # giữ điểm / cận / độ sâu, chỉ cập nhật nước đi
+                if move and (move & _MOVE_MASK) != (meta & _MOVE_MASK):
+                    meta = meta & ~_MOVE_MASK | move & _MOVE_MASK
+                    self.keys[i] = key ^ meta ^ _score_bits(self.scores[i])
+                    self.meta[i] = meta
+                return
+            if not move:
+                # Cùng thế cờ nhưng không có nước mới: giữ nước đi tốt nhất đã biết
+                move = meta & _MOVE_MASK
+        meta = (move or 0) & _MOVE_MASK | min(depth, 0xFF) << 24 | bound << 32 | self.age << 34
+        score = float(score)
+        self.keys[i] = key ^ meta ^ _score_bits(score)
+        self.scores[i] = score
+        self.meta[i] = meta
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def hashfull(self, sample: int = 1000) -> float:
+        """Tỉ lệ ô đã dùng (ước lượng trên 'sample' ô đầu)."""
+        sample = min(sample, self.size)
+        return sum(1 for k in self.keys[:sample] if k) / sample
+
+
+class EvalCache:
+    """
+    Bộ nhớ đệm điểm tĩnh (model + vật chất) theo hash, kích thước cố định, ghi đè luôn.
+    Tách khỏi bảng TT vì ô depth 0 trong TT giờ là kết quả tìm kiếm tĩnh, không phải điểm tĩnh.
+    """
+    def __init__(self, size: int = 1 << 16):
+        n = 1
+        while n < size:
+            n *= 2
+        self.mask = n - 1
+        self.keys = array('Q', bytes(8 * n))
+        self.values = array('d', bytes(8 * n))
+
+    def get(self, key: int) -> Optional[float]:
+        i = key & self.mask
+        return self.values[i] if self.keys[i] == key else None
+
+    def put(self, key: int, value: float):
+        i = key & self.mask
+        self.keys[i] = key
+        self.values[i] = value
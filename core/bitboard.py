@@ -0,0 +1,464 @@
+"""
+Backend bitboard cho Cờ Vua.
+
+Quy ước ô: ô (row, col) của Board <-> bit số row * 8 + col
+(row 0 là hàng quân Đen, row 7 là hàng quân Trắng - giống hệt Board.board).
+Mỗi loại quân của mỗi màu được lưu bằng một số nguyên 64-bit.
+"""
+from typing import List, Optional, Tuple
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+COLOR_INDEX = {'white': WHITE, 'black': BLACK}
+PIECE_TYPE = {'P': PAWN, 'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+
+# Quyền nhập thành (bitmask) - cùng thứ tự với chuỗi "KQkq" của FEN
+CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ = 1, 2, 4, 8
+CASTLE_ALL = CASTLE_WK | CASTLE_WQ | CASTLE_BK | CASTLE_BQ
+# CASTLE_KEEP[sq]: quyền còn giữ lại khi có quân đi từ / đến sq (Vua, Xe rời chỗ hoặc Xe bị ăn)
+CASTLE_KEEP = [CASTLE_ALL] * 64
+CASTLE_KEEP[60] &= ~(CASTLE_WK | CASTLE_WQ)
+CASTLE_KEEP[63] &= ~CASTLE_WK
+CASTLE_KEEP[56] &= ~CASTLE_WQ
+CASTLE_KEEP[4] &= ~(CASTLE_BK | CASTLE_BQ)
+CASTLE_KEEP[7] &= ~CASTLE_BK
+CASTLE_KEEP[0] &= ~CASTLE_BQ
+
+FULL = (1 << 64) - 1
+ROW_MASKS = [0xFF << (8 * r) for r in range(8)]
+
+
+# =========================================================================
+# BẢNG TẤN CÔNG TÍNH SẴN
+# =========================================================================
+def _step_table(deltas):
+    """Bảng tấn công cho quân đi 1 bước (Mã, Vua, Tốt)."""
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        for dr, dc in deltas:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < 8 and 0 <= nc < 8:
+                mask |= 1 << (nr * 8 + nc)
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _step_table([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_ATTACKS = _step_table([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+# PAWN_ATTACKS[color][sq]: các ô mà Tốt màu color đứng ở sq đang ăn chéo tới
+# (Trắng đi lên = giảm row, Đen đi xuống = tăng row)
+PAWN_ATTACKS = [
+    _step_table([(-1, -1), (-1, 1)]),
+    _step_table([(1, -1), (1, 1)]),
+]
+
+ROOK_DIRS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+BISHOP_DIRS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+def _slide(sq, occ, dirs):
+    """Tính tấn công trượt theo kiểu dò từng ô (chỉ dùng khi dựng bảng)."""
+    r0, c0 = divmod(sq, 8)
+    attacks = 0
+    for dr, dc in dirs:
+        r, c = r0 + dr, c0 + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            bit = 1 << (r * 8 + c)
+            attacks |= bit
+            if occ & bit:
+                break
+            r += dr
+            c += dc
+    return attacks
+
+
+def _relevant_mask(sq, dirs):
+    """Các ô có thể chặn đường trượt (bỏ ô mép vì ô mép không chặn thêm gì)."""
+    r0, c0 = divmod(sq, 8)
+    mask = 0
+    for dr, dc in dirs:
+        r, c = r0 + dr, c0 + dc
+        while 0 <= r + dr < 8 and 0 <= c + dc < 8:
+            mask |= 1 << (r * 8 + c)
+            r += dr
+            c += dc
+    return mask
+
+
+def _slider_tables(dirs):
+    """
+    Bảng tra kiểu "magic": TABLE[sq][occ & MASK[sq]] -> tấn công.
+    Thay vì nhân số magic rồi dịch bit như C, ta dùng luôn dict của Python
+    (khóa là occupancy đã mask) - vẫn là một lần tra bảng, không phải dò tia.
+    """
+    masks, tables = [], []
+    for sq in range(64):
+        mask = _relevant_mask(sq, dirs)
+        table = {}
+        sub = 0
+        while True:  # Duyệt mọi tập con của mask (Carry-Rippler)
+            table[sub] = _slide(sq, sub, dirs)
+            sub = (sub - mask) & mask
+            if not sub:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+ROOK_MASKS, ROOK_TABLES = _slider_tables(ROOK_DIRS)
+BISHOP_MASKS, BISHOP_TABLES = _slider_tables(BISHOP_DIRS)
+
+
+def _between_table():
+    """BETWEEN[a][b]: các ô nằm giữa a và b (nếu cùng hàng/cột/chéo), ngược lại 0."""
+    table = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        r0, c0 = divmod(sq, 8)
+        for dr, dc in ROOK_DIRS + BISHOP_DIRS:
+            r, c = r0 + dr, c0 + dc
+            ray = 0
+            while 0 <= r < 8 and 0 <= c < 8:
+                table[sq][r * 8 + c] = ray
+                ray |= 1 << (r * 8 + c)
+                r += dr
+                c += dc
+    return table
+
+
+BETWEEN = _between_table()
+
+
+def rook_attacks(sq: int, occ: int) -> int:
+    return ROOK_TABLES[sq][occ & ROOK_MASKS[sq]]
+
+
+def bishop_attacks(sq: int, occ: int) -> int:
+    return BISHOP_TABLES[sq][occ & BISHOP_MASKS[sq]]
+
+
+# =========================================================================
+# VỊ TRÍ (POSITION)
+# =========================================================================
+class ChessBitboards:
+    """
+    Trạng thái quân cờ dạng bitboard.
+    - pieces[color * 6 + type]: bitboard từng loại quân.
+    - occ[color]: tất cả quân của một màu.
+    Board gọi put/remove mỗi khi một ô thay đổi nên bitboard luôn khớp với Board.board.
+    """
+    __slots__ = ('pieces', 'occ')
+    PIECE_TYPE = PIECE_TYPE
+
+    def __init__(self):
+        self.pieces = [0] * 12
+        self.occ = [0, 0]
+
+    @classmethod
+    def from_grid(cls, grid) -> 'ChessBitboards':
+        bb = cls()
+        for r, row in enumerate(grid):
+            for c, piece in enumerate(row):
+                if piece is not None:
+                    bb.put(r * 8 + c, COLOR_INDEX[piece.color], PIECE_TYPE[piece.symbol.upper()])
+        return bb
+
+    def put(self, sq: int, color: int, ptype: int):
+        bit = 1 << sq
+        self.pieces[color * 6 + ptype] |= bit
+        self.occ[color] |= bit
+
+    def remove(self, sq: int, color: int, ptype: int):
+        bit = ~(1 << sq)
+        self.pieces[color * 6 + ptype] &= bit
+        self.occ[color] &= bit
+
+    def copy(self) -> 'ChessBitboards':
+        new = ChessBitboards.__new__(ChessBitboards)
+        new.pieces = self.pieces[:]
+        new.occ = self.occ[:]
+        return new
+
+    def king_square(self, color: int) -> Optional[int]:
+        kings = self.pieces[color * 6 + KING]
+        return kings.bit_length() - 1 if kings else None
+
+
+# =========================================================================
+# PHÁT HIỆN TẤN CÔNG
+# =========================================================================
+def _attacked(pieces, them: int, sq: int, occ: int, keep: int = -1) -> bool:
+    """
+    Ô sq có bị phe `them` tấn công không (nhìn ngược từ sq ra ngoài).
+    - occ: occupancy dùng cho quân trượt.
+    - keep: mask các quân địch còn sống (dùng khi thử ăn quân mà không sửa bitboard).
+    """
+    base = them * 6
+    if KNIGHT_ATTACKS[sq] & pieces[base + KNIGHT] & keep:
+        return True
+    # Tốt địch đứng ở ô mà Tốt phe mình (đứng ở sq) ăn chéo tới
+    if PAWN_ATTACKS[them ^ 1][sq] & pieces[base + PAWN] & keep:
+        return True
+    if KING_ATTACKS[sq] & pieces[base + KING]:
+        return True
+    queens = pieces[base + QUEEN]
+    rooks = (pieces[base + ROOK] | queens) & keep
+    if rooks and ROOK_TABLES[sq][occ & ROOK_MASKS[sq]] & rooks:
+        return True
+    bishops = (pieces[base + BISHOP] | queens) & keep
+    if bishops and BISHOP_TABLES[sq][occ & BISHOP_MASKS[sq]] & bishops:
+        return True
+    return False
+
+
+def _attackers(pieces, them: int, sq: int, occ: int) -> int:
+    """Bitboard tất cả quân của phe `them` đang tấn công sq (dùng để tìm quân chiếu)."""
+    base = them * 6
+    queens = pieces[base + QUEEN]
+    return ((KNIGHT_ATTACKS[sq] & pieces[base + KNIGHT])
+            | (PAWN_ATTACKS[them ^ 1][sq] & pieces[base + PAWN])
+            | (KING_ATTACKS[sq] & pieces[base + KING])
+            | (ROOK_TABLES[sq][occ & ROOK_MASKS[sq]] & (pieces[base + ROOK] | queens))
+            | (BISHOP_TABLES[sq][occ & BISHOP_MASKS[sq]] & (pieces[base + BISHOP] | queens)))
+
+
+def _pins(pieces, us: int, ksq: int, own: int, enemy: int, occ: int) -> dict:
+    """
+    Tìm quân bị ghim: {ô quân bị ghim: mask các ô nó còn được đi (tia ghim + quân ghim)}.
+    Nhìn từ Vua ra, chỉ coi quân địch là vật cản để "xuyên" qua quân mình.
+    """
+    base = (us ^ 1) * 6
+    queens = pieces[base + QUEEN]
+    snipers = ((ROOK_TABLES[ksq][enemy & ROOK_MASKS[ksq]] & (pieces[base + ROOK] | queens))
+               | (BISHOP_TABLES[ksq][enemy & BISHOP_MASKS[ksq]] & (pieces[base + BISHOP] | queens)))
+    pins = {}
+    while snipers:
+        low = snipers & -snipers
+        snipers ^= low
+        ray = BETWEEN[ksq][low.bit_length() - 1]
+        blockers = ray & occ
+        # Đúng 1 quân chắn ở giữa và đó là quân mình -> bị ghim
+        if blockers and not blockers & (blockers - 1) and blockers & own:
+            pins[blockers.bit_length() - 1] = ray | low
+    return pins
+
+
+def is_square_attacked(bb: ChessBitboards, sq: int, by_color: int) -> bool:
+    return _attacked(bb.pieces, by_color, sq, bb.occ[0] | bb.occ[1])
+
+
+def in_check(bb: ChessBitboards, color: int) -> bool:
+    ksq = bb.king_square(color)
+    if ksq is None:
+        return False
+    return _attacked(bb.pieces, color ^ 1, ksq, bb.occ[0] | bb.occ[1])
+
+
+# =========================================================================
+# SINH NƯỚC ĐI
+# =========================================================================
+def _generate(bb: ChessBitboards, us: int, castling: int, ep_square: Optional[int],
+              from_square: Optional[int], legal: bool,
+              first_only: bool = False) -> List[Tuple[int, int]]:
+    """
+    Sinh nước đi dạng (from_sq, to_sq).
+    Khi legal=True: tính quân chiếu, quân bị ghim và ô chặn chiếu MỘT lần cho cả thế cờ,
+    rồi áp thẳng vào mask ô đích - không phải đi thử từng nước để xem Vua có bị chiếu.
+    - first_only: dừng ngay khi có nước đầu tiên (kiểm tra chiếu bí / hết nước).
+    """
+    them = us ^ 1
+    pieces = bb.pieces
+    own = bb.occ[us]
+    enemy = bb.occ[them]
+    occ = own | enemy
+    empty = ~occ & FULL
+    only = FULL if from_square is None else (1 << from_square)
+    base = us * 6
+    moves = []
+
+    kings = pieces[base + KING]
+    if not kings:
+        legal = False  # Thế cờ thiếu Vua (thế tự dựng) -> không có gì để giữ
+    ksq = kings.bit_length() - 1 if kings else -1
+
+    evasion = FULL  # Ô đích cho phép với quân không phải Vua
+    pins = {}
+    checkers = 0
+    if legal:
+        checkers = _attackers(pieces, them, ksq, occ)
+        if checkers:
+            if checkers & (checkers - 1):
+                evasion = 0  # Chiếu đôi: chỉ Vua được đi
+            else:
+                # Chiếu đơn: ăn quân chiếu hoặc chặn giữa
+                evasion = checkers | BETWEEN[ksq][checkers.bit_length() - 1]
+        pins = _pins(pieces, us, ksq, own, enemy, occ)
+
+    # --- TỐT ---
+    pawns = pieces[base + PAWN] & only
+    if pawns and evasion:
+        if us == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & ROW_MASKS[5]) >> 8) & empty
+            step = 8
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & ROW_MASKS[2]) << 8) & empty
+            step = -8
+        single &= evasion
+        double &= evasion
+        while single:
+            low = single & -single
+            to = low.bit_length() - 1
+            frm = to + step
+            if frm not in pins or pins[frm] & low:
+                moves.append((frm, to))
+            single ^= low
+        while double:
+            low = double & -double
+            to = low.bit_length() - 1
+            frm = to + 2 * step
+            if frm not in pins or pins[frm] & low:
+                moves.append((frm, to))
+            double ^= low
+        attacks_table = PAWN_ATTACKS[us]
+        capture_mask = enemy & evasion
+        b = pawns
+        while b:
+            low = b & -b
+            frm = low.bit_length() - 1
+            targets = attacks_table[frm] & capture_mask
+            if frm in pins:
+                targets &= pins[frm]
+            while targets:
+                t = targets & -targets
+                moves.append((frm, t.bit_length() - 1))
+                targets ^= t
+            b ^= low
+    if pawns and ep_square is not None and ep_square >> 3 == (2 if us == WHITE else 5):
+        # Tốt nào của mình ăn chéo được tới ô en passant.
+        # Hiếm gặp nên kiểm tra bằng cách đi thử: bắt qua đường có thể lộ Vua theo hàng ngang
+        # (2 Tốt cùng rời hàng) mà mask ghim thông thường không bắt được.
+        b = PAWN_ATTACKS[them][ep_square] & pawns
+        while b:
+            low = b & -b
+            frm = low.bit_length() - 1
+            if not legal or is_legal(bb, us, frm, ep_square, ep_square):
+                moves.append((frm, ep_square))
+            b ^= low
+    if first_only and moves:
+        return moves[:1]
+
+    # --- MÃ, TƯỢNG, XE, HẬU ---
+    allowed = ~own & evasion
+    if allowed:
+        for ptype in (KNIGHT, BISHOP, ROOK, QUEEN):
+            b = pieces[base + ptype] & only
+            while b:
+                low = b & -b
+                frm = low.bit_length() - 1
+                b ^= low
+                if ptype == KNIGHT:
+                    if frm in pins:
+                        continue  # Mã bị ghim không bao giờ đi được
+                    targets = KNIGHT_ATTACKS[frm]
+                elif ptype == BISHOP:
+                    targets = BISHOP_TABLES[frm][occ & BISHOP_MASKS[frm]]
+                elif ptype == ROOK:
+                    targets = ROOK_TABLES[frm][occ & ROOK_MASKS[frm]]
+                else:
+                    targets = (ROOK_TABLES[frm][occ & ROOK_MASKS[frm]] |
+                               BISHOP_TABLES[frm][occ & BISHOP_MASKS[frm]])
+                targets &= allowed
+                if frm in pins:
+                    targets &= pins[frm]
+                while targets:
+                    t = targets & -targets
+                    moves.append((frm, t.bit_length() - 1))
+                    targets ^= t
+                if first_only and moves:
+                    return moves[:1]
+
+    # --- VUA (kèm nhập thành) ---
+    if kings & only:
+        frm = ksq
+        targets = KING_ATTACKS[frm] & ~own
+        # Bỏ Vua khỏi occupancy để Vua không "núp" sau chính mình trên tia của quân trượt
+        occ_without_king = occ & ~kings
+        while targets:
+            t = targets & -targets
+            to = t.bit_length() - 1
+            if not legal or not _attacked(pieces, them, to, occ_without_king, ~t):
+                moves.append((frm, to))
+                if first_only:
+                    return moves
+            targets ^= t
+
+        if castling and not checkers:
+            if us == WHITE:
+                k_flag, q_flag, home = CASTLE_WK, CASTLE_WQ, 60
+            else:
+                k_flag, q_flag, home = CASTLE_BK, CASTLE_BQ, 4
+            if frm == home and castling & (k_flag | q_flag) and (legal or not _attacked(pieces, them, home, occ)):
+                # Cánh Vua: 2 ô f, g trống và không bị tấn công
+                if (castling & k_flag and not occ & (0b11 << (home + 1))
+                        and not _attacked(pieces, them, home + 1, occ)
+                        and not _attacked(pieces, them, home + 2, occ)):
+                    moves.append((home, home + 2))
+                # Cánh Hậu: 3 ô b, c, d trống; Vua chỉ đi qua d, c
+                if (castling & q_flag and not occ & (0b111 << (home - 3))
+                        and not _attacked(pieces, them, home - 1, occ)
+                        and not _attacked(pieces, them, home - 2, occ)):
+                    moves.append((home, home - 2))
+
+    return moves
+
+
+def generate_pseudo_moves(bb: ChessBitboards, color: int, castling: int = 0,
+                          ep_square: Optional[int] = None,
+                          from_square: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Sinh nước đi giả hợp lệ (chưa lọc nước để Vua bị chiếu) dạng (from_sq, to_sq).
+    Nhập thành vẫn được kiểm tra đầy đủ (ô trống, không đi qua ô bị tấn công).
+    """
+    return _generate(bb, color, castling, ep_square, from_square, legal=False)
+
+
+def generate_legal_moves(bb: ChessBitboards, color: int, castling: int = 0,
+                         ep_square: Optional[int] = None,
+                         from_square: Optional[int] = None,
+                         first_only: bool = False) -> List[Tuple[int, int]]:
+    """
+    Sinh nước đi hợp lệ dạng (from_sq, to_sq).
+    - from_square: chỉ sinh cho quân ở ô này (dùng cho get_valid_moves_for_piece).
+    - first_only: trả về ngay khi tìm được 1 nước (danh sách rỗng = hết nước đi).
+    """
+    return _generate(bb, color, castling, ep_square, from_square, legal=True, first_only=first_only)
+
+
+def is_legal(bb: ChessBitboards, color: int, frm: int, to: int,
+             ep_square: Optional[int] = None) -> bool:
+    """
+    Kiểm tra riêng một nước (frm -> to) có để Vua bị chiếu không.
+    Không sửa bitboard: chỉ tính occupancy mới bằng phép toán số nguyên.
+    """
+    pieces = bb.pieces
+    from_bit = 1 << frm
+    to_bit = 1 << to
+    occ = ((bb.occ[0] | bb.occ[1]) & ~from_bit) | to_bit
+    keep = ~to_bit  # Quân địch ở ô đích (nếu có) bị ăn
+
+    if to == ep_square and pieces[color * 6 + PAWN] & from_bit and (frm & 7) != (to & 7):
+        # En passant: Tốt bị bắt nằm cùng hàng với ô xuất phát
+        victim = (1 << (to + 8)) if color == WHITE else (1 << (to - 8))
+        occ &= ~victim
+        keep &= ~victim
+
+    kings = pieces[color * 6 + KING]
+    if not kings:
+        return True
+    ksq = to if kings & from_bit else kings.bit_length() - 1
+    return not _attacked(pieces, color ^ 1, ksq, occ, keep)
@@ -1,10 +1,12 @@
-from typing import List, Tuple, Optional
-import copy
+from typing import Tuple, Optional
 from core.piece import (
     Piece, Pawn, Rook, Knight, Bishop, Queen, King,
     General, Advisor, Elephant, Horse, Chariot, Cannon, Soldier,
     create_piece 
 )
+from core import bitboard, xiangqi_bitboard, zobrist
+from core import move as mv
+from core import mailbox
 
 # --- [FIX QUAN TRỌNG] IMPORT ĐÚNG FILE CỦA BẠN ---
 try:
@@ -14,6 +16,36 @@ except ImportError:
     MoveValidator = None 
 # -------------------------------------------------
 
+# Giá trị vật chất (centipawn) theo ký hiệu viết hoa; ký hiệu 2 loại cờ không trùng nhau
+PIECE_VALUES = {
+    # Cờ vua
+    'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0,
+    # Cờ tướng
+    'S': 100, 'A': 200, 'E': 200, 'H': 400, 'O': 450, 'C': 900, 'G': 0,
+}
+
+# --- [MỚI] FEN CỜ TƯỚNG: chữ cái WXF / UCCI (K A B N R C P), Đỏ viết hoa ---
+XIANGQI_SYMBOL_TO_FEN = {'G': 'K', 'A': 'A', 'E': 'B', 'H': 'N', 'C': 'R', 'O': 'C', 'S': 'P'}
+# Đọc FEN nhận cả chữ B/E (Tượng) và N/H (Mã)
+XIANGQI_FEN_TO_SYMBOL = {'K': 'G', 'A': 'A', 'B': 'E', 'E': 'E', 'N': 'H', 'H': 'H',
+                         'R': 'C', 'C': 'O', 'P': 'S'}
+
+
+def _fen_chars(game_type: str):
+    """Mã quân trong mailbox -> chữ FEN (trắng / Đỏ viết hoa)."""
+    chars = [''] * 256
+    code_to_piece, _ = mailbox.CODE_TABLES[game_type]
+    for code, piece in enumerate(code_to_piece):
+        if piece is None: continue
+        letter = piece.symbol.upper()
+        if game_type == 'chinese_chess':
+            letter = XIANGQI_SYMBOL_TO_FEN[letter]
+        chars[code] = letter if piece.color == 'white' else letter.lower()
+    return chars
+
+
+FEN_CHARS = {game_type: _fen_chars(game_type) for game_type in mailbox.CODE_TABLES}
+
 class Board:
     def __init__(self, game_type: str = 'chess'):
         self.game_type = game_type
@@ -35,12 +67,18 @@ class Board:
         self.last_move = None 
         # --------------------------------------------------
 
+        # --- [MỚI] NGĂN XẾP NƯỚC ĐI (push / pop) ---
+        # Mỗi phần tử là 1 tuple nhỏ đủ để hoàn tác chính xác nước đi đó
+        self.move_stack = []
+        # move_stack / position_history / repetitions đang dùng chung với bản sao (copy) -> tách khi sửa
+        self._shared_history = False
+
         if self.game_type == 'chess':
             self.rows, self.cols = 8, 8
         else:
             self.rows, self.cols = 10, 9 # Cờ tướng
             
-        self.board: List[List[Optional[Piece]]] = []
+        self.board = None  # GridView trên mailbox, tạo trong setup_board
         self.setup_board()
         
         # --- KHỞI TẠO VALIDATOR ---
@@ -60,62 +98,193 @@ class Board:
 
     def setup_board(self):
         """Khởi tạo bàn cờ."""
-        self.board = [[None for _ in range(self.cols)] for _ in range(self.rows)]
+        grid = [[None for _ in range(self.cols)] for _ in range(self.rows)]
 
         if self.game_type == 'chess':
-            self.board[0] = [
-                Rook('black', 'R'), Knight('black', 'N'), Bishop('black', 'B'), Queen('black', 'Q'),
-                King('black', 'K'), Bishop('black', 'B'), Knight('black', 'N'), Rook('black', 'R')
-            ]
-            self.board[1] = [Pawn('black', 'P') for _ in range(self.cols)]
+            back_rank = "RNBQKBNR"
+            grid[0] = [create_piece(s, 'black') for s in back_rank]
+            grid[1] = [create_piece('P', 'black') for _ in range(self.cols)]
             
-            self.board[6] = [Pawn('white', 'P') for _ in range(self.cols)]
-            self.board[7] = [
-                Rook('white', 'R'), Knight('white', 'N'), Bishop('white', 'B'), Queen('white', 'Q'),
-                King('white', 'K'), Bishop('white', 'B'), Knight('white', 'N'), Rook('white', 'R')
-            ]
+            grid[6] = [create_piece('P', 'white') for _ in range(self.cols)]
+            grid[7] = [create_piece(s, 'white') for s in back_rank]
+            # Bitboard song song với mailbox (dùng cho sinh nước đi nhanh)
+            self.bitboards = bitboard.ChessBitboards.from_grid(grid)
+            # Quyền nhập thành lưu ở Board (quân cờ dùng chung nên không giữ has_moved)
+            self.castling = bitboard.CASTLE_ALL
         
         elif self.game_type == 'chinese_chess':
+            # Quân dùng chung lấy từ create_piece (C = Xe, O = Pháo, S = Tốt)
+            back_rank = "CHEAGAEHC"
             # Đen
-            self.board[0] = [
-                Chariot('black', 'C'), Horse('black', 'H'), Elephant('black', 'E'), Advisor('black', 'A'),
-                General('black', 'G'), Advisor('black', 'A'), Elephant('black', 'E'), Horse('black', 'H'), Chariot('black', 'C')
-            ]
-            self.board[2] = [None, Cannon('black', 'O'), None, None, None, None, None, Cannon('black', 'O'), None]
-            self.board[3] = [Soldier('black', 'S'), None, Soldier('black', 'S'), None, Soldier('black', 'S'), None, Soldier('black', 'S'), None, Soldier('black', 'S')]
+            grid[0] = [create_piece(s, 'black') for s in back_rank]
+            grid[2] = [create_piece('O', 'black') if c in (1, 7) else None for c in range(self.cols)]
+            grid[3] = [create_piece('S', 'black') if c % 2 == 0 else None for c in range(self.cols)]
             
             # Đỏ (white)
-            self.board[9] = [
-                Chariot('white', 'C'), Horse('white', 'H'), Elephant('white', 'E'), Advisor('white', 'A'),
-                General('white', 'G'), Advisor('white', 'A'), Elephant('white', 'E'), Horse('white', 'H'), Chariot('white', 'C')
-            ]
-            self.board[7] = [None, Cannon('white', 'O'), None, None, None, None, None, Cannon('white', 'O'), None]
-            self.board[6] = [Soldier('white', 'S'), None, Soldier('white', 'S'), None, Soldier('white', 'S'), None, Soldier('white', 'S'), None, Soldier('white', 'S')]
+            grid[9] = [create_piece(s, 'white') for s in back_rank]
+            grid[7] = [create_piece('O', 'white') if c in (1, 7) else None for c in range(self.cols)]
+            grid[6] = [create_piece('S', 'white') if c % 2 == 0 else None for c in range(self.cols)]
+            # Bitboard 90-bit + occupancy hàng/cột cho Xe, Pháo
+            self.bitboards = xiangqi_bitboard.XiangqiBitboards.from_grid(grid)
+            self.castling = 0
+
+        # --- [MỚI] MAILBOX: bytearray phẳng có ô đệm, mỗi ô là mã quân (core/mailbox.py) ---
+        self._stride = self.cols + 2
+        self._offset = mailbox.PAD_ROWS * self._stride + 1
+        self._code_to_piece, self._piece_to_code = mailbox.CODE_TABLES[self.game_type]
+        self.mailbox = mailbox.new_mailbox(self.rows, self.cols)
+        for r in range(self.rows):
+            for c in range(self.cols):
+                if grid[r][c] is not None:
+                    self.mailbox[self._offset + r * self._stride + c] = self._piece_to_code[grid[r][c]]
+        # board.board[r][c] vẫn dùng được (view đọc / ghi qua mailbox)
+        self.board = mailbox.GridView(self)
+
+        # --- [MỚI] VỊ TRÍ VUA / TƯỚNG [trắng/đỏ, đen], cập nhật trong set_piece ---
+        king = 'K' if self.game_type == 'chess' else 'G'
+        self._king_codes = (self._piece_to_code[create_piece(king, 'white')],
+                            self._piece_to_code[create_piece(king, 'black')])
+        self.king_pos = [None, None]
+        for r in range(self.rows):
+            for c in range(self.cols):
+                code = self.mailbox[self._offset + r * self._stride + c]
+                if code in self._king_codes:
+                    self.king_pos[self._king_codes.index(code)] = (r, c)
+
+        # --- [MỚI] KHÓA ZOBRIST (board.hash) ---
+        self._piece_keys = zobrist.PIECE_KEYS.get(self.game_type)
+        self._n_types = len(self.bitboards.PIECE_TYPE)
+        self.hash = self.compute_hash()
+        # Tổng giá trị quân mỗi bên [trắng/đỏ, đen], cập nhật trong set_piece
+        self._code_value = [PIECE_VALUES[p.symbol.upper()] if p else 0 for p in self._code_to_piece]
+        self.material = [0, 0]
+        for code in self.mailbox:
+            if code != mailbox.EMPTY and code != mailbox.OFFBOARD:
+                self.material[(code - 1) // self._n_types] += self._code_value[code]
+
+        # FEN của thế cờ hiện tại (None = phải dựng lại); push / pop / set_piece / switch_turn xóa cache
+        self._fen = None
+
+        # --- [MỚI] ĐỒNG HỒ 50 NƯỚC + LỊCH SỬ HASH (phát hiện lặp thế cờ) ---
+        self.halfmove_clock = 0   # Số nửa nước từ lần ăn quân / đi Tốt gần nhất
+        self.fullmove_number = 1
+        self.reset_history()
+
+    def index(self, row: int, col: int) -> int:
+        """Chỉ số ô (row, col) trong mailbox."""
+        return self._offset + row * self._stride + col
+
+    def is_empty(self, row: int, col: int) -> bool:
+        """Ô trống và nằm trong bàn cờ (ô đệm là OFFBOARD nên chỉ 1 phép tra, bước tối đa 2 ô)."""
+        return self.mailbox[self._offset + row * self._stride + col] == mailbox.EMPTY
 
     def get_piece(self, pos: Tuple[int, int]) -> Optional[Piece]:
         row, col = pos
         if 0 <= row < self.rows and 0 <= col < self.cols:
-            return self.board[row][col]
+            return self._code_to_piece[self.mailbox[self._offset + row * self._stride + col]]
         return None
 
-    def find_king_pos(self, color: str) -> Optional[Tuple[int, int]]:
-        target_symbols = ['K', 'G'] 
+    def set_piece(self, pos: Tuple[int, int], piece: Optional[Piece]):
+        """
+        Đặt quân (hoặc None) vào một ô.
+        Mọi thay đổi trên bàn cờ phải đi qua hàm này để mailbox, bitboard, hash và vật chất luôn khớp nhau.
+        """
+        row, col = pos
+        idx = self._offset + row * self._stride + col
+        old = self.mailbox[idx]
+        code = self._piece_to_code[piece] if piece is not None else mailbox.EMPTY
+        if old == code: return
+        self._fen = None
+        bb = self.bitboards
+        sq = row * self.cols + col
+        n_types = self._n_types
+        if old != mailbox.EMPTY:
+            color, ptype = divmod(old - 1, n_types)
+            bb.remove(sq, color, ptype)
+            self.hash ^= self._piece_keys[old - 1][sq]
+            self.material[color] -= self._code_value[old]
+            if old == self._king_codes[color] and self.king_pos[color] == (row, col):
+                self.king_pos[color] = None
+        if code != mailbox.EMPTY:
+            color, ptype = divmod(code - 1, n_types)
+            bb.put(sq, color, ptype)
+            self.hash ^= self._piece_keys[code - 1][sq]
+            self.material[color] += self._code_value[code]
+            if code == self._king_codes[color]:
+                self.king_pos[color] = (row, col)
+        self.mailbox[idx] = code
+
+    def compute_hash(self) -> int:
+        """Tính lại toàn bộ khóa Zobrist từ đầu (chỉ dùng khi dựng bàn cờ / kiểm tra)."""
+        h = 0
         for r in range(self.rows):
             for c in range(self.cols):
-                piece = self.board[r][c]
-                if piece and piece.color == color:
-                    if piece.symbol.upper() in target_symbols:
-                        return (r, c)
+                code = self.mailbox[self._offset + r * self._stride + c]
+                if code != mailbox.EMPTY:
+                    h ^= self._piece_keys[code - 1][r * self.cols + c]
+        if self.current_turn == 'black':
+            h ^= zobrist.SIDE_KEY
+        self._state_key = self._state_hash()
+        return h ^ self._state_key
+
+    def _state_hash(self) -> int:
+        """Phần khóa của quyền nhập thành + cột en passant (cờ tướng luôn là 0)."""
+        if self.game_type != 'chess': return 0
+        key = zobrist.CASTLING_KEYS[self.castling_rights()]
+        ep = self.en_passant_square()
+        if ep:
+            # Chỉ tính en passant khi thực sự có Tốt đối phương đứng cạnh để bắt
+            row, col = self.last_move['end']
+            mover = self.last_move['color']
+            for c in (col - 1, col + 1):
+                p = self.get_piece((row, c))
+                if isinstance(p, Pawn) and p.color != mover:
+                    key ^= zobrist.EP_KEYS[col]
+                    break
+        return key
+
+    def _refresh_state_key(self):
+        """Cập nhật phần nhập thành / en passant của hash sau khi quyền nhập thành hoặc last_move đổi."""
+        new_key = self._state_hash()
+        self.hash ^= self._state_key ^ new_key
+        self._state_key = new_key
+        self._fen = None
+
+    def castling_rights(self) -> int:
+        """Quyền nhập thành dạng bitmask (CASTLE_WK | CASTLE_WQ | CASTLE_BK | CASTLE_BQ)."""
+        if self.game_type != 'chess': return 0
+        rights = self.castling
+        if rights:
+            # Vua / Xe phải còn ở đúng ô gốc (đi thử có thể tạm dời hoặc ăn mất Xe)
+            pieces = self.bitboards.pieces
+            for flag, king_sq, rook_sq, base in ((bitboard.CASTLE_WK, 60, 63, 0), (bitboard.CASTLE_WQ, 60, 56, 0),
+                                                 (bitboard.CASTLE_BK, 4, 7, 6), (bitboard.CASTLE_BQ, 4, 0, 6)):
+                if rights & flag and not (pieces[base + bitboard.KING] >> king_sq & 1
+                                          and pieces[base + bitboard.ROOK] >> rook_sq & 1):
+                    rights &= ~flag
+        return rights
+
+    def en_passant_square(self) -> Optional[Tuple[int, int]]:
+        """Ô bắt tốt qua đường (ô Tốt vừa nhảy qua khi đi 2 bước), hoặc None."""
+        if self.game_type != 'chess' or not self.last_move: return None
+        p = self.last_move['piece']
+        start = self.last_move['start']
+        end = self.last_move['end']
+        if p.symbol.upper() == 'P' and abs(start[0] - end[0]) == 2:
+            return ((start[0] + end[0]) // 2, start[1])
         return None
 
+    def find_king_pos(self, color: str) -> Optional[Tuple[int, int]]:
+        """Vị trí Vua / Tướng của 'color' (O(1): được cập nhật trong set_piece khi đi / hoàn tác)."""
+        return self.king_pos[bitboard.COLOR_INDEX[color]]
+
+    def is_file_clear(self, col: int, r1: int, r2: int) -> bool:
+        """Cờ tướng: cột col trống giữa hàng r1 và r2 (tra occupancy cột, dùng cho lộ mặt Tướng)."""
+        if self.game_type != 'chinese_chess': return False
+        return xiangqi_bitboard.file_clear(self.bitboards, col, r1, r2)
+
     def get_board_state(self):
-        state = [['' for _ in range(self.cols)] for _ in range(self.rows)]
-        for r in range(self.rows):
-            for c in range(self.cols):
-                piece = self.board[r][c]
-                if piece:
-                    state[r][c] = piece.symbol
-        return state
+        return [[piece.symbol if piece else '' for piece in row] for row in self.board]
 
     # --- LOGIC ONLINE ---
     def set_player_color(self, color: str):
@@ -127,106 +296,264 @@ class Board:
 
     def switch_turn(self):
         self.current_turn = 'black' if self.current_turn == 'white' else 'white' 
+        self.hash ^= zobrist.SIDE_KEY
+        self._fen = None
+
+    # --- [MỚI] PUSH / POP: ĐI VÀ HOÀN TÁC NƯỚC ĐI ---
+    def push(self, move, promotion: str = None):
+        """
+        Đi một nước (Move / int của core/move.py) và lưu bản ghi hoàn tác vào move_stack.
+        Xử lý đủ nhập thành, bắt tốt qua đường, phong cấp, quyền nhập thành, last_move,
+        game_over; hash và vật chất được cập nhật dần qua set_piece.
+        Không in log, không kiểm tra chiếu bí (dùng cho tìm kiếm / perft / undo).
+        - promotion: None -> Tốt lên hàng cuối vẫn là Tốt (move_piece dùng cho "chờ phong cấp").
+        """
+        m = int(move)
+        self._fen = None  # FEN cache hết hiệu lực
+        if self._shared_history: self._unshare_history()
+        promotion = promotion or mv.promotion_of(m)
+        from_row, from_col = from_pos = ((m >> 4) & 0xF, m & 0xF)
+        to_row, to_col = to_pos = ((m >> 12) & 0xF, (m >> 8) & 0xF)
+        piece = self.get_piece(from_pos)
+        captured = self.get_piece(to_pos)
+        captured_pos = to_pos
+        rook_from = rook_to = None
+        is_chess = self.game_type == 'chess'
+
+        if is_chess:
+            kind = piece.symbol.upper()
+            # Nhập thành: Vua đi 2 cột -> dời Xe
+            if kind == 'K' and abs(from_col - to_col) == 2:
+                if to_col > from_col: rook_from, rook_to = (from_row, 7), (from_row, 5)
+                else: rook_from, rook_to = (from_row, 0), (from_row, 3)
+            # Bắt tốt qua đường: Tốt đi chéo vào ô trống, quân bị bắt ở hàng cũ
+            elif kind == 'P' and from_col != to_col and captured is None:
+                captured_pos = (from_row, to_col)
+                captured = self.get_piece(captured_pos)
+
+        self.move_stack.append((m, piece, captured, captured_pos, self.castling, self.last_move,
+                                self.game_over, self.winner, self.promotion_pending, self.promotion_pos,
+                                self.hash, self._state_key, self.halfmove_clock))
+
+        if is_chess:
+            if captured_pos != to_pos:
+                self.set_piece(captured_pos, None)
+            if self.castling:
+                self.castling &= bitboard.CASTLE_KEEP[from_row * 8 + from_col] & bitboard.CASTLE_KEEP[to_row * 8 + to_col]
+
+        self.set_piece(to_pos, piece)
+        self.set_piece(from_pos, None)
+        if rook_from:
+            self.set_piece(rook_to, self.get_piece(rook_from))
+            self.set_piece(rook_from, None)
+        if promotion and is_chess and isinstance(piece, Pawn) and piece.can_promote(to_row):
+            self.set_piece(to_pos, create_piece(promotion, piece.color))
+
+        if captured is not None and captured.symbol.upper() in ('K', 'G'):
+            self.winner = piece.color
+            self.game_over = True
+
+        # Cờ vua: ăn quân hoặc đi Tốt thì đếm lại 50 nước (cờ tướng: chỉ ăn quân)
+        if captured is not None or (is_chess and kind == 'P'):
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if piece.color == 'black':
+            self.fullmove_number += 1
+
+        self._update_last_move(from_pos, to_pos, piece)
+        self.switch_turn()
+        self._remember_position()
+
+    def pop(self) -> int:
+        """Hoàn tác nước cuối trong move_stack, trả lại đúng mọi trạng thái. Trả về nước đi (int)."""
+        if self._shared_history: self._unshare_history()
+        (m, piece, captured, captured_pos, self.castling, self.last_move, self.game_over, self.winner,
+         self.promotion_pending, self.promotion_pos, old_hash, old_state_key,
+         self.halfmove_clock) = self.move_stack.pop()
+        self._forget_position()
+        self._fen = None
+        from_pos = ((m >> 4) & 0xF, m & 0xF)
+        to_row, to_col = to_pos = ((m >> 12) & 0xF, (m >> 8) & 0xF)
+
+        if self.game_type == 'chess' and piece.symbol.upper() == 'K' and abs(from_pos[1] - to_col) == 2:
+            # Trả Xe nhập thành về góc
+            rook_from, rook_to = ((to_row, 7), (to_row, 5)) if to_col > from_pos[1] else ((to_row, 0), (to_row, 3))
+            self.set_piece(rook_from, self.get_piece(rook_to))
+            self.set_piece(rook_to, None)
+
+        self.set_piece(to_pos, None)
+        self.set_piece(from_pos, piece)  # Quân gốc (Tốt trước khi phong cấp)
+        if captured is not None:
+            self.set_piece(captured_pos, captured)
+
+        self.current_turn = piece.color
+        if piece.color == 'black':
+            self.fullmove_number -= 1
+        self.hash = old_hash
+        self._state_key = old_state_key
+        return m
+
+    # --- [MỚI] LỊCH SỬ HASH: LẶP THẾ CỜ, LUẬT 50 NƯỚC, CHIẾU / ĐUỔI DAI ---
+    def reset_history(self):
+        """Bắt đầu lại lịch sử hash từ thế cờ hiện tại (sau setup_board / dựng từ FEN)."""
+        self.position_history = []  # hash sau từng nửa nước, phần tử đầu là thế cờ xuất phát
+        self.repetitions = {}       # hash -> số lần xuất hiện trong ván
+        self._shared_history = False
+        self._remember_position()
+
+    def _unshare_history(self):
+        """Lịch sử đang dùng chung với bản sao: chép riêng trước lần sửa đầu tiên (copy-on-push)."""
+        self.move_stack = self.move_stack[:]
+        self.position_history = self.position_history[:]
+        self.repetitions = self.repetitions.copy()
+        self._shared_history = False
+
+    def _remember_position(self):
+        if self._shared_history: self._unshare_history()
+        self.position_history.append(self.hash)
+        self.repetitions[self.hash] = self.repetitions.get(self.hash, 0) + 1
+
+    def _forget_position(self):
+        if self._shared_history: self._unshare_history()
+        h = self.position_history.pop()
+        count = self.repetitions[h] - 1
+        if count: self.repetitions[h] = count
+        else: del self.repetitions[h]
+
+    def repetition_count(self) -> int:
+        """Số lần thế cờ hiện tại (tính cả lượt đi, quyền nhập thành, en passant) đã xuất hiện. O(1)."""
+        return self.repetitions.get(self.hash, 0)
+
+    def is_threefold_repetition(self) -> bool:
+        return self.repetitions.get(self.hash, 0) >= 3
+
+    def is_fifty_moves(self) -> bool:
+        return self.halfmove_clock >= 100
+
+    def repetition_result(self) -> Optional[Tuple[str, str]]:
+        """
+        Kết quả do lặp thế cờ / luật 50 nước, dạng (winner, lý do) như Validator.game_result, hoặc None.
+        - Cờ vua: hòa khi lặp 3 lần ('threefold') hoặc 50 nước không ăn quân, không đi Tốt ('fifty_moves').
+        - Cờ tướng: lặp 3 lần thì xử theo chuỗi nước trong vòng lặp (xem _adjudicate_cycle).
+        """
+        if self.game_type == 'chess':
+            if self.halfmove_clock >= 100: return ('draw', 'fifty_moves')
+            if self.repetitions.get(self.hash, 0) >= 3: return ('draw', 'threefold')
+            return None
+        if self.repetitions.get(self.hash, 0) < 3: return None
+        return self._adjudicate_cycle()
+
+    def _adjudicate_cycle(self) -> Tuple[str, str]:
+        """
+        Cờ tướng: xét vòng lặp gần nhất (từ lần trước gặp cùng hash tới giờ).
+        Phe nào mọi nước trong vòng đều chiếu (chiếu dai) thì thua; nếu không, phe nào mọi nước đều
+        đuổi bắt quân (đuổi dai) thì thua; cả hai cùng phạm hoặc không ai phạm -> hòa.
+        """
+        history = self.position_history
+        start = len(history) - 3
+        while start >= 0 and history[start] != self.hash:
+            start -= 2
+        plies = len(history) - 1 - start
+        if start < 0 or plies > len(self.move_stack):
+            return ('draw', 'repetition')
+
+        # Lùi về đầu vòng rồi đi lại từng nước để xem nước đó có chiếu / đuổi không
+        moves = [self.pop() for _ in range(plies)][::-1]
+        checks = {'white': True, 'black': True}
+        chases = {'white': True, 'black': True}
+        for m in moves:
+            mover = self.current_turn
+            self.push(m)
+            them = xiangqi_bitboard.COLOR_INDEX[self.current_turn]
+            if not xiangqi_bitboard.in_check(self.bitboards, them):
+                checks[mover] = False
+                if not self._is_chase(((m >> 12) & 0xF, (m >> 8) & 0xF), them):
+                    chases[mover] = False
+
+        for flags, reason in ((checks, 'perpetual_check'), (chases, 'perpetual_chase')):
+            if flags['white'] != flags['black']:
+                return ('black' if flags['white'] else 'white', reason)
+        return ('draw', 'repetition')
+
+    def _is_chase(self, pos: Tuple[int, int], them: int) -> bool:
+        """
+        Quân vừa đi tới pos dọa ăn một quân địch (phe them) không phải Tướng / Tốt mà quân đó
+        không được bảo vệ; Xe bị Mã / Pháo dọa thì luôn tính là bị đuổi.
+        """
+        bb = self.bitboards
+        n_types = self._n_types
+        sq = pos[0] * self.cols + pos[1]
+        attacker = (self.mailbox[self._offset + pos[0] * self._stride + pos[1]] - 1) % n_types
+        enemy = bb.occ[them]
+        for _, to in xiangqi_bitboard.generate_pseudo_moves(bb, them ^ 1, from_square=sq):
+            if not enemy >> to & 1:
+                continue
+            r, c = divmod(to, self.cols)
+            target = (self.mailbox[self._offset + r * self._stride + c] - 1) % n_types
+            if target in (xiangqi_bitboard.GENERAL, xiangqi_bitboard.SOLDIER):
+                continue
+            if target == xiangqi_bitboard.CHARIOT and attacker != xiangqi_bitboard.CHARIOT:
+                return True
+            if not xiangqi_bitboard.is_square_attacked(bb, to, them):
+                return True
+        return False
 
     # --- LOGIC DI CHUYỂN & PHONG CẤP ---
-    def move_piece(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], promotion: str = None) -> bool:
+    def move_piece(self, from_pos, to_pos: Tuple[int, int] = None, promotion: str = None) -> bool:
         """
         Thực hiện nước đi. 
+        - from_pos: tọa độ (r, c), hoặc cả nước đi dạng Move / int (core/move.py) khi bỏ trống to_pos.
         - promotion: Ký tự quân muốn phong cấp (ví dụ 'Q').
         """
+        if to_pos is None:
+            m = int(from_pos)
+            from_pos, to_pos = mv.unpack(m)
+            promotion = promotion or mv.promotion_of(m)
+
         # 0. Chặn nếu đang chờ phong cấp
         if self.promotion_pending and self.promotion_pos != to_pos:
             return False
 
         if self.game_over: return False
-        
-        from_row, from_col = from_pos
-        to_row, to_col = to_pos
-        
+
+        # Tin nhắn mạng gửi riêng quân phong cấp (from == to) khi đang chờ phong cấp
+        if self.promotion_pending and from_pos == to_pos:
+            return self.apply_promotion(promotion) if promotion else False
+
         piece = self.get_piece(from_pos)
-        target_piece = self.get_piece(to_pos)
-        
-        if piece:
-            # --- [MỚI] CHECK NHẬP THÀNH (CASTLING) ---
-            # Phát hiện Vua đi 2 bước
-            is_castling = False
-            if self.game_type == 'chess' and isinstance(piece, King) and abs(from_col - to_col) == 2:
-                is_castling = True
-
-            # --- [MỚI] CHECK BẮT TỐT QUA ĐƯỜNG (EN PASSANT) ---
-            # Phát hiện Tốt đi chéo sang ô trống
-            is_en_passant = False
-            en_passant_capture_pos = None
-            if self.game_type == 'chess' and isinstance(piece, Pawn):
-                if from_col != to_col and target_piece is None:
-                    is_en_passant = True
-                    # Quân bị bắt nằm ở hàng cũ (from_row), cột mới (to_col)
-                    en_passant_capture_pos = (from_row, to_col)
-
-            # 1. Xử lý ăn quân (Bình thường)
-            if target_piece and target_piece.symbol.upper() in ['K', 'G']:
-                self.winner = self.current_turn 
-                self.game_over = True
-                print(f"GAME OVER! {self.winner.upper()} thắng!")
-
-            # 2. Di chuyển quân chính (Vua/Tốt/...)
-            self.board[to_row][to_col] = piece
-            self.board[from_row][from_col] = None
-            
-            # 3. Cập nhật trạng thái quân (has_moved cho King/Rook)
-            if hasattr(piece, 'update_position'): piece.update_position((to_row, to_col))
-            elif hasattr(piece, 'has_moved'): piece.has_moved = True
-            
-            # --- [MỚI] THỰC HIỆN SIDE-EFFECTS ---
-            
-            # A. Nếu là Nhập thành -> Di chuyển Xe
-            if is_castling:
-                if to_col > from_col: # Nhập thành cánh Vua (phải)
-                    rook_from = (from_row, 7); rook_to = (from_row, 5)
-                else: # Nhập thành cánh Hậu (trái)
-                    rook_from = (from_row, 0); rook_to = (from_row, 3)
-                
-                rook = self.board[rook_from[0]][rook_from[1]]
-                if rook:
-                    self.board[rook_to[0]][rook_to[1]] = rook
-                    self.board[rook_from[0]][rook_from[1]] = None
-                    if hasattr(rook, 'has_moved'): rook.has_moved = True
-                    print("Backend: Đã di chuyển Xe nhập thành.")
-
-            # B. Nếu là En Passant -> Xóa tốt đối phương
-            if is_en_passant and en_passant_capture_pos:
-                self.board[en_passant_capture_pos[0]][en_passant_capture_pos[1]] = None
-                print("Backend: Đã bắt tốt qua đường.")
-
-            # -------------------------------------
-
-            # --- XỬ LÝ PHONG CẤP (PAWN PROMOTION) ---
-            if self.game_type == 'chess' and isinstance(piece, Pawn):
-                if piece.can_promote(to_row):
-                    if promotion:
-                         self.apply_promotion(promotion, pos_override=(to_row, to_col))
-                         self._update_last_move(from_pos, to_pos, piece) # Lưu move
-                         return True
-                    
-                    self.promotion_pending = True
-                    self.promotion_pos = (to_row, to_col)
-                    print("Chờ phong cấp...")
-                    return True
-
-            if not self.game_over:
-                self._update_last_move(from_pos, to_pos, piece)
-                self.switch_turn()
-                print(f"Đã đi: {from_pos}->{to_pos}. Lượt: {self.current_turn}")
-                # --- [QUAN TRỌNG] KIỂM TRA CHIẾU BÍ / HẾT NƯỚC ---
-                self.check_game_status()
-                # -------------------------------------------------
-            else:
-                print("Game đã kết thúc.")
-            return True
-        else:
+        if not piece:
             print(f"Lỗi: Không có quân tại {from_pos}")
             return False
-    
+
+        # Đi quân qua push: nhập thành (dời Xe), en passant (xóa Tốt), phong cấp đều nằm trong đó
+        self.push(mv.encode(from_pos, to_pos), promotion)
+
+        if self.game_over:
+            print(f"GAME OVER! {self.winner.upper()} thắng!")
+            return True
+
+        # --- XỬ LÝ PHONG CẤP (PAWN PROMOTION) ---
+        if not promotion and self.game_type == 'chess' and isinstance(piece, Pawn) and piece.can_promote(to_pos[0]):
+            # Chưa chọn quân: vẫn là lượt người vừa đi cho tới khi apply_promotion
+            self.switch_turn()
+            self.promotion_pending = True
+            self.promotion_pos = to_pos
+            print("Chờ phong cấp...")
+            return True
+
+        print(f"Đã đi: {from_pos}->{to_pos}. Lượt: {self.current_turn}")
+        # --- [QUAN TRỌNG] KIỂM TRA CHIẾU BÍ / HẾT NƯỚC ---
+        self.check_game_status()
+        # -------------------------------------------------
+        return True
+
+    def undo_move(self, plies: int = 1) -> bool:
+        """Hoàn tác 'plies' nước gần nhất (dùng cho nút Undo trên UI)."""
+        if len(self.move_stack) < plies: return False
+        for _ in range(plies):
+            self.pop()
+        return True
 
     def _update_last_move(self, start, end, piece):
         """Lưu lại nước đi vừa thực hiện để check En Passant."""
@@ -237,21 +564,20 @@ class Board:
             'color': piece.color,
             'symbol': piece.symbol
         }
+        self._refresh_state_key()
 
     def apply_promotion(self, promotion_symbol: str, pos_override: Tuple[int, int] = None) -> bool:
-        """Biến Tốt thành quân khác (Hậu, Xe...)."""
+        """Biến Tốt đang chờ phong cấp thành quân khác (Hậu, Xe...)."""
         pos = pos_override if pos_override else self.promotion_pos
         if not pos: return False
 
         row, col = pos
-        pawn = self.board[row][col]
+        pawn = self.get_piece(pos)
         
         if pawn:
             try:
                 new_piece = create_piece(promotion_symbol, pawn.color)
-                self.board[row][col] = new_piece
-                # piece mới cũng coi như đã di chuyển
-                if hasattr(new_piece, 'has_moved'): new_piece.has_moved = True 
+                self.set_piece(pos, new_piece)
                 print(f"Đã phong cấp thành {new_piece.symbol} tại {pos}")
             except Exception as e:
                 print(f"Lỗi phong cấp: {e}")
@@ -260,10 +586,12 @@ class Board:
         self.promotion_pos = None
         
         if not self.game_over:
-            # Lưu last move cho promotion (quan trọng nếu muốn undo)
-            self._update_last_move(pos, pos, self.board[row][col]) 
             self.switch_turn()
+            # Lịch sử đang giữ hash lúc Tốt chưa phong cấp -> thay bằng thế cờ thật
+            self._forget_position()
+            self._remember_position()
             print(f"Hoàn tất phong cấp. Lượt: {self.current_turn}")
+            self.check_game_status()
         
         return True
     # --- THÊM VÀO CUỐI CLASS BOARD (core/board.py) ---
@@ -291,147 +619,152 @@ class Board:
 
     def to_fen(self):
         """
-        Chuyển trạng thái bàn cờ hiện tại thành chuỗi FEN chuẩn để gửi cho Stockfish.
-        Ví dụ: rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1
+        Chuyển trạng thái bàn cờ hiện tại thành chuỗi FEN.
+        - Cờ vua (gửi cho Stockfish): rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1
+        - Cờ tướng (WXF / UCCI):      rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 1
+        Kết quả được cache tới khi bàn cờ đổi (push / pop / set_piece / switch_turn).
         """
-        if self.game_type != 'chess':
-            return "" # Stockfish không chơi cờ tướng
+        if self._fen is not None:
+            return self._fen
 
-        fen = ""
-        # 1. Duyệt bàn cờ để xây dựng vị trí quân
-        for r in range(8):
+        # 1. Vị trí quân: đọc thẳng mã quân trong mailbox
+        chars = FEN_CHARS[self.game_type]
+        ranks = []
+        for r in range(self.rows):
+            start = self._offset + r * self._stride
+            rank = ""
             empty_count = 0
-            for c in range(8):
-                p = self.board[r][c]
-                if p is None:
+            for code in self.mailbox[start:start + self.cols]:
+                if code == mailbox.EMPTY:
                     empty_count += 1
-                else:
-                    if empty_count > 0:
-                        fen += str(empty_count)
-                        empty_count = 0
-                    # Quân trắng viết hoa, đen viết thường (Code Piece của bạn đã xử lý việc này chưa? 
-                    # Nếu piece.symbol trả về 'K' cho đen thì cần sửa. 
-                    # Giả sử: Trắng Hoa, Đen thường chuẩn FEN)
-                    symbol = p.symbol
-                    if p.color == 'white': symbol = symbol.upper()
-                    else: symbol = symbol.lower()
-                    fen += symbol
-            if empty_count > 0:
-                fen += str(empty_count)
-            if r < 7:
-                fen += "/"
-
-        # 2. Lượt đi ('w' hoặc 'b')
-        fen += " w " if self.current_turn == 'white' else " b "
+                    continue
+                if empty_count:
+                    rank += str(empty_count)
+                    empty_count = 0
+                rank += chars[code]
+            if empty_count:
+                rank += str(empty_count)
+            ranks.append(rank)
+
+        # 2. Lượt đi ('w' hoặc 'b'; cờ tướng: 'w' là Đỏ)
+        fen = "/".join(ranks) + (" w " if self.current_turn == 'white' else " b ")
 
         # 3. Quyền nhập thành (Castling Rights)
-        # Logic đơn giản: Kiểm tra Vua và Xe có ở vị trí gốc và chưa di chuyển
-        castling = ""
-        # Check Trắng
-        k_w = self.get_piece((7, 4))
-        if k_w and k_w.symbol.upper() == 'K' and k_w.color == 'white' and not getattr(k_w, 'has_moved', True):
-            r_w_k = self.get_piece((7, 7)) # Xe cánh vua
-            if r_w_k and r_w_k.symbol.upper() == 'R' and not getattr(r_w_k, 'has_moved', True):
-                castling += "K"
-            r_w_q = self.get_piece((7, 0)) # Xe cánh hậu
-            if r_w_q and r_w_q.symbol.upper() == 'R' and not getattr(r_w_q, 'has_moved', True):
-                castling += "Q"
-        
-        # Check Đen
-        k_b = self.get_piece((0, 4))
-        if k_b and k_b.symbol.upper() == 'K' and k_b.color == 'black' and not getattr(k_b, 'has_moved', True):
-            r_b_k = self.get_piece((0, 7))
-            if r_b_k and r_b_k.symbol.upper() == 'R' and not getattr(r_b_k, 'has_moved', True):
-                castling += "k"
-            r_b_q = self.get_piece((0, 0))
-            if r_b_q and r_b_q.symbol.upper() == 'R' and not getattr(r_b_q, 'has_moved', True):
-                castling += "q"
-        
+        rights = self.castling_rights()
+        castling = "".join(flag for bit, flag in ((bitboard.CASTLE_WK, "K"), (bitboard.CASTLE_WQ, "Q"),
+                                                  (bitboard.CASTLE_BK, "k"), (bitboard.CASTLE_BQ, "q"))
+                           if rights & bit)
         fen += castling if castling else "-"
 
         # 4. En Passant Target
         # Logic: Nếu nước vừa rồi là Tốt đi 2 ô, thì ô ở giữa là en passant target
         en_passant = "-"
-        if self.last_move:
-            p = self.last_move['piece']
-            start = self.last_move['start']
-            end = self.last_move['end']
-            if p.symbol.upper() == 'P' and abs(start[0] - end[0]) == 2:
-                # Tính ô target (hàng giữa)
-                r_target = (start[0] + end[0]) // 2
-                c_target = start[1]
-                # Đổi sang tọa độ đại số (ví dụ e3)
-                files = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
-                en_passant = f"{files[c_target]}{8 - r_target}"
+        ep = self.en_passant_square() if self.game_type == 'chess' else None
+        if ep:
+            # Đổi sang tọa độ đại số (ví dụ e3)
+            en_passant = f"{chr(ord('a') + ep[1])}{8 - ep[0]}"
         
         fen += f" {en_passant}"
 
-        # 5. Halfmove và Fullmove (Để tạm mặc định vì không ảnh hưởng nhiều logic cơ bản)
-        fen += " 0 1"
-        
+        # 5. Halfmove (đồng hồ 50 nước) và Fullmove
+        fen += f" {self.halfmove_clock} {self.fullmove_number}"
+
+        self._fen = fen
         return fen
-    
+
+    @classmethod
+    def from_fen(cls, fen: str, game_type: Optional[str] = None) -> 'Board':
+        """
+        Dựng Board từ FEN (cờ vua, hoặc cờ tướng theo chữ WXF / UCCI).
+        game_type bỏ trống: 10 hàng -> cờ tướng, 8 hàng -> cờ vua.
+        """
+        parts = fen.split()
+        ranks = parts[0].split('/')
+        if game_type is None:
+            game_type = 'chinese_chess' if len(ranks) == 10 else 'chess'
+        board = cls(game_type)
+        if len(ranks) != board.rows:
+            raise ValueError(f"FEN cần {board.rows} hàng, nhận {len(ranks)}: {fen}")
+
+        for r in range(board.rows):
+            for c in range(board.cols):
+                board.set_piece((r, c), None)
+        for r, rank in enumerate(ranks):
+            c = 0
+            for ch in rank:
+                if ch.isdigit():
+                    c += int(ch)
+                    continue
+                color = 'white' if ch.isupper() else 'black'
+                symbol = ch.upper() if game_type == 'chess' else XIANGQI_FEN_TO_SYMBOL[ch.upper()]
+                board.set_piece((r, c), create_piece(symbol, color))
+                c += 1
+
+        # Lượt đi: 'b' là Đen ('w' / 'r' là trắng / Đỏ)
+        if len(parts) > 1 and parts[1] == 'b':
+            board.switch_turn()
+
+        if game_type == 'chess':
+            # Quyền nhập thành lưu ở Board
+            rights = parts[2] if len(parts) > 2 else '-'
+            board.castling = 0
+            for flag, bit in (('K', bitboard.CASTLE_WK), ('Q', bitboard.CASTLE_WQ),
+                              ('k', bitboard.CASTLE_BK), ('q', bitboard.CASTLE_BQ)):
+                if flag in rights:
+                    board.castling |= bit
+            # En passant: dựng lại last_move là nước Tốt vừa đi 2 ô
+            ep = parts[3] if len(parts) > 3 else '-'
+            if ep != '-':
+                col = ord(ep[0]) - ord('a')
+                row = 8 - int(ep[1])
+                if row == 2:
+                    start, end = (1, col), (3, col)
+                else:
+                    start, end = (6, col), (4, col)
+                pawn = board.get_piece(end)
+                if pawn is not None:
+                    board.last_move = {'start': start, 'end': end, 'piece': pawn,
+                                       'color': pawn.color, 'symbol': pawn.symbol}
+        if len(parts) > 5:
+            board.halfmove_clock = int(parts[4])
+            board.fullmove_number = int(parts[5])
+
+        board.hash = board.compute_hash()
+        board._fen = None
+        board.reset_history()
+        return board
+
     # --- THÊM VÀO CLASS BOARD ---
 
-    def move_piece_dry_run(self, start, end):
-        """Đi thử: Di chuyển quân nhưng không vẽ, trả về quân bị ăn (nếu có)"""
-        r1, c1 = start
-        r2, c2 = end
-        
-        piece = self.board[r1][c1]
-        target = self.board[r2][c2] # Quân bị ăn (có thể là None)
-        
-        # Di chuyển
-        self.board[r2][c2] = piece
-        self.board[r1][c1] = None
-        
-        # Cập nhật tọa độ nội bộ của quân cờ (nếu có)
-        if hasattr(piece, 'update_position'):
-            piece.update_position((r2, c2))
-            
-        # Đổi lượt (để sinh FEN đúng lượt tiếp theo)
-        self.switch_turn()
-        
-        return target # Trả về để tí nữa còn hoàn tác
+    def move_piece_dry_run(self, start, end=None):
+        """Đi thử (qua push): trả về quân bị ăn (nếu có). Hoàn tác bằng undo_move_dry_run / pop."""
+        m = int(start) if end is None else mv.encode(start, end)
+        self.push(m)
+        return self.move_stack[-1][2]
+
+    def undo_move_dry_run(self, start=None, end=None, captured_piece=None):
+        """Hoàn tác nước đi thử gần nhất (tham số giữ để tương thích cách gọi cũ)."""
+        self.pop()
 
-    def undo_move_dry_run(self, start, end, captured_piece):
-        """Hoàn tác: Trả quân về vị trí cũ"""
-        r1, c1 = start
-        r2, c2 = end
-        
-        piece = self.board[r2][c2] # Quân vừa đi đến đích
-        
-        # Trả về chỗ cũ
-        self.board[r1][c1] = piece
-        self.board[r2][c2] = captured_piece # Trả lại quân bị ăn (hoặc None)
-        
-        # Cập nhật lại tọa độ
-        if hasattr(piece, 'update_position'):
-            piece.update_position((r1, c1))
-            
-        # Đổi lại lượt
-        self.switch_turn()
     def copy(self):
-        """Tạo một bản sao độc lập của bàn cờ"""
-        # Tạo instance mới
-        new_board = Board(self.game_type)
-        
-        # Copy trạng thái bàn cờ (Deepcopy để không dính dáng gì bộ nhớ cũ)
-        # Lưu ý: Nếu Piece của bạn có chứa 'pygame.Surface' (ảnh), deepcopy sẽ lỗi.
-        # Code Piece chuẩn thường chỉ chứa data (color, symbol), ảnh load ở UI.
-        try:
-            new_board.board = copy.deepcopy(self.board)
-        except Exception:
-            # Fallback nếu deepcopy lỗi (do dính ảnh): Copy tay
-            new_board.board = [[copy.copy(p) if p else None for p in row] for row in self.board]
-            
-        new_board.current_turn = self.current_turn
-        new_board.game_over = self.game_over
-        new_board.winner = self.winner
-        
-        # Copy validator (quan trọng)
-        new_board.validator = self.validator 
-        
+        """
+        Tạo một bản sao độc lập của bàn cờ.
+        Quân cờ là bất biến, dùng chung -> chỉ cần copy nông lưới ô + bitboard + vài biến trạng thái
+        (không chạy lại setup_board, không tạo Validator mới, không deepcopy).
+        Lịch sử nước đi / hash dùng chung theo tham chiếu, bàn nào push / pop trước thì tự chép riêng
+        (_unshare_history): copy không tốn thêm theo số nước đã đi.
+        """
+        new_board = Board.__new__(Board)
+        new_board.__dict__.update(self.__dict__)
+        new_board.mailbox = self.mailbox[:]
+        new_board.board = mailbox.GridView(new_board)
+        new_board.material = self.material[:]
+        new_board.king_pos = self.king_pos[:]
+        self._shared_history = new_board._shared_history = True
+        # Bitboard phải khớp với lưới vừa copy
+        if self.bitboards is not None:
+            new_board.bitboards = self.bitboards.copy()
+        # last_move luôn được thay bằng dict mới (không sửa tại chỗ) nên dùng chung được
         return new_board
     # --- THÊM HÀM NÀY VÀO CUỐI CLASS BOARD ---
     def check_game_status(self):
@@ -439,47 +772,29 @@ class Board:
         Kiểm tra xem phe hiện tại (current_turn) có bị Chiếu bí hoặc Hết nước đi không.
         Hàm này được gọi ngay sau switch_turn.
         """
-        if self.game_over: return
-
-        # 1. Kiểm tra xem phe hiện tại còn nước đi hợp lệ nào không?
-        has_valid_move = False
-        
-        # Duyệt toàn bộ bàn cờ để tìm quân của phe hiện tại
-        for r in range(self.rows):
-            for c in range(self.cols):
-                p = self.board[r][c]
-                if p and p.color == self.current_turn:
-                    # Nếu tìm thấy ít nhất 1 nước đi hợp lệ -> Chưa thua
-                    if self.validator:
-                        moves = self.validator.get_valid_moves_for_piece(self, (r, c), self.current_turn)
-                        if moves:
-                            has_valid_move = True
-                            break
-            if has_valid_move: break
-        
-        # 2. Xử lý kết quả nếu không còn nước đi
-        if not has_valid_move:
-            self.game_over = True
-            
-            # Kiểm tra xem có đang bị chiếu không?
-            is_in_check = False
-            if self.validator:
-                is_in_check = self.validator.is_in_check(self, self.current_turn)
-            
-            # Xác định người thắng (là người vừa đi xong -> ngược lại với current_turn)
-            winner_color = 'white' if self.current_turn == 'black' else 'black'
-            
-            if is_in_check:
-                # [CHIẾU BÍ - CHECKMATE]
-                self.winner = winner_color
-                print(f"🏁 CHIẾU BÍ! {winner_color.upper()} Thắng!")
-            else:
-                # [HẾT NƯỚC - STALEMATE]
-                if self.game_type == 'chinese_chess':
-                    # Luật Cờ Tướng: Hết nước đi là THUA
-                    self.winner = winner_color
-                    print(f"🏁 HẾT NƯỚC (Cờ Tướng)! {winner_color.upper()} Thắng!")
-                else:
-                    # Luật Cờ Vua: Hết nước đi (nhưng không bị chiếu) là HÒA
-                    self.winner = 'draw'
-                    print(f"🏁 HẾT NƯỚC (Cờ Vua)! HÒA (Stalemate)!")
\ No newline at end of file
+        if self.game_over or not self.validator: return
+
+        # Validator.game_result: dừng ở nước hợp lệ đầu tiên, cache theo hash
+        # Không có -> xét lặp thế cờ / 50 nước (theo lịch sử hash của ván này)
+        result = self.validator.game_result(self) or self.repetition_result()
+        if result is None: return
+
+        self.winner, reason = result
+        self.game_over = True
+        if reason == 'checkmate':
+            # [CHIẾU BÍ - CHECKMATE]
+            print(f"🏁 CHIẾU BÍ! {self.winner.upper()} Thắng!")
+        elif reason == 'no_moves':
+            # Luật Cờ Tướng: Hết nước đi là THUA
+            print(f"🏁 HẾT NƯỚC (Cờ Tướng)! {self.winner.upper()} Thắng!")
+        elif reason == 'stalemate':
+            # Luật Cờ Vua: Hết nước đi (nhưng không bị chiếu) là HÒA
+            print(f"🏁 HẾT NƯỚC (Cờ Vua)! HÒA (Stalemate)!")
+        elif reason in ('perpetual_check', 'perpetual_chase'):
+            kind = "CHIẾU DAI" if reason == 'perpetual_check' else "ĐUỔI DAI"
+            print(f"🏁 {kind}! {self.winner.upper()} Thắng!")
+        elif self.winner == 'draw':
+            # Lặp thế cờ 3 lần / luật 50 nước
+            print(f"🏁 HÒA ({reason})!")
+        else:
+            print(f"GAME OVER! {self.winner.upper()} thắng!")
\ No newline at end of file
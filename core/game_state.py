@@ -122,13 +122,8 @@ class GameState:
             return False
 
         row, col = self.promotion_pos
-        pawn = self.board.get_piece(self.promotion_pos)
-        
-        if pawn:
-            # Tạo quân mới (Hậu, Xe, ...) giữ nguyên màu của Tốt
-            new_piece = pawn.promote(promotion_symbol)
-            # Cập nhật thẳng vào board (truy cập trực tiếp mảng 2 chiều của object Board)
-            self.board.board[row][col] = new_piece
+        # Board tự đổi quân (qua set_piece), đổi lượt và kiểm tra kết thúc ván
+        self.board.apply_promotion(promotion_symbol, self.promotion_pos)
         
         # Reset trạng thái phong cấp
         self.promotion_pending = False
@@ -141,33 +136,15 @@ class GameState:
     def _finalize_turn(self, last_move_dest: Tuple[int, int]):
         """Logic chung để xử lý sau khi một nước đi hoàn tất (Move hoặc Promote)."""
         
-        # --- [LOGIC ĂN VUA LÀ THẮNG LUÔN] ---
-        # Kiểm tra xem nước đi vừa rồi có ăn mất Vua/Tướng địch không (dựa vào trạng thái hiện tại của bàn cờ)
-        # Tuy nhiên, thông thường logic "bị ăn" đã xử lý lúc move. 
-        # Ở đây ta kiểm tra lại nếu cần, hoặc logic cũ kiểm tra captured.
-        # Để đơn giản và nhất quán, ta check xem Vua đối phương còn trên bàn cờ không.
-        
         opponent_color = self.opponent_color()
-        enemy_king_found = False
-        for r in range(self.rows):
-            for c in range(self.cols):
-                p = self.board.get_piece((r, c))
-                if p and p.color == opponent_color and p.symbol.upper() in ['K', 'G']:
-                    enemy_king_found = True
-                    break
-            if enemy_king_found:
-                break
-        
-        if not enemy_king_found:
-            self.winner = self.current_turn
-            return
-
-        # Kiểm tra check/checkmate
         self.is_check = self.validator.is_in_check(self.board, opponent_color)
-        
-        # Checkmate
-        if self.is_check and self.validator.is_checkmate(self.board, opponent_color):
-            self.winner = self.current_turn
+
+        # Ăn Vua / chiếu bí / hết nước: cùng một đường với Board và bot (Validator.game_result, cache theo hash)
+        # rồi tới lặp thế cờ / 50 nước (lịch sử hash của Board)
+        result = self.validator.game_result(self.board) or self.board.repetition_result()
+        if result:
+            self.winner, reason = result
+            self.is_checkmate = reason == 'checkmate'
 
         # Đổi lượt
         if not self.winner:
@@ -0,0 +1,109 @@
+"""
+Mailbox: bàn cờ lưu trong 1 bytearray phẳng, mỗi ô là 1 mã quân (số nguyên nhỏ).
+
+Bố cục (cả 8x8 và 10x9): thêm 1 cột đệm mỗi bên và 2 hàng đệm trên/dưới,
+ô đệm mang giá trị OFFBOARD. Bước nhảy xa nhất (Mã, Tượng: 2 ô) luôn rơi vào ô đệm
+nên kiểm tra "ra ngoài bàn cờ" chỉ còn 1 phép tra mảng.
+
+    index(r, c) = (r + 2) * stride + (c + 1),   stride = cols + 2
+
+Mã quân: 0 = trống, 1 + color * số_loại + loại_quân (trùng chỉ số bitboard + 1), 255 = ngoài bàn.
+"""
+from typing import List, Optional
+
+from core import bitboard, xiangqi_bitboard
+from core.piece import Piece, create_piece
+
+EMPTY = 0
+OFFBOARD = 0xFF
+PAD_ROWS = 2
+
+
+def new_mailbox(rows: int, cols: int) -> bytearray:
+    """Mailbox trống: ô trong bàn = EMPTY, ô đệm = OFFBOARD."""
+    stride = cols + 2
+    mb = bytearray([OFFBOARD]) * ((rows + 2 * PAD_ROWS) * stride)
+    for r in range(rows):
+        start = (r + PAD_ROWS) * stride + 1
+        mb[start:start + cols] = bytes(cols)
+    return mb
+
+
+def _code_tables(piece_types: dict):
+    """(code -> Piece dùng chung, Piece -> code) cho một loại cờ."""
+    n_types = len(piece_types)
+    code_to_piece: List[Optional[Piece]] = [None] * 256
+    piece_to_code = {}
+    for color, color_index in (('white', bitboard.WHITE), ('black', bitboard.BLACK)):
+        for symbol, ptype in piece_types.items():
+            piece = create_piece(symbol, color)
+            code = 1 + color_index * n_types + ptype
+            code_to_piece[code] = piece
+            piece_to_code[piece] = code
+    return code_to_piece, piece_to_code
+
+
+CODE_TABLES = {
+    'chess': _code_tables(bitboard.PIECE_TYPE),
+    'chinese_chess': _code_tables(xiangqi_bitboard.PIECE_TYPE),
+}
+
+
+class RowView:
+    """Một hàng của mailbox, đọc / ghi như list cũ: board[r][c]."""
+    __slots__ = ('_board', '_row')
+
+    def __init__(self, board, row: int):
+        self._board = board
+        self._row = row
+
+    def __len__(self):
+        return self._board.cols
+
+    def __getitem__(self, col):
+        if isinstance(col, slice):
+            return list(self)[col]
+        board = self._board
+        if col < 0:
+            col += board.cols
+        if not 0 <= col < board.cols:
+            raise IndexError("column out of range")
+        return board._code_to_piece[board.mailbox[board._offset + self._row * board._stride + col]]
+
+    def __setitem__(self, col, piece):
+        # Ghi qua set_piece để bitboard / hash / vật chất vẫn khớp
+        self._board.set_piece((self._row, col), piece)
+
+    def __iter__(self):
+        board = self._board
+        start = board._offset + self._row * board._stride
+        table = board._code_to_piece
+        return (table[code] for code in board.mailbox[start:start + board.cols])
+
+
+class GridView:
+    """View tương thích kiểu list-of-lists (board.board[r][c]) cho UI và code cũ."""
+    __slots__ = ('_board',)
+
+    def __init__(self, board):
+        self._board = board
+
+    def __len__(self):
+        return self._board.rows
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return list(self)[row]
+        board = self._board
+        if row < 0:
+            row += board.rows
+        if not 0 <= row < board.rows:
+            raise IndexError("row out of range")
+        return RowView(board, row)
+
+    def __iter__(self):
+        return (RowView(self._board, r) for r in range(self._board.rows))
+
+    def __getattr__(self, name):
+        # Hàm tiện ích của Board (is_empty, find_king_pos, is_file_clear...) dùng được qua view
+        return getattr(self._board, name)
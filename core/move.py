@@ -0,0 +1,122 @@
+"""
+Mã hóa nước đi thành MỘT số nguyên nhỏ (dùng chung cho cờ vua và cờ tướng).
+
+    bit  0-7  : ô đi   (row << 4 | col)
+    bit  8-15 : ô đến  (row << 4 | col)
+    bit 16-18 : quân phong cấp (0 = không, 1..4 = Q R B N)
+    bit 19+   : cờ hiệu (ăn quân, nhập thành, bắt tốt qua đường, Tốt đi 2 ô)
+
+Trong vòng tìm kiếm chỉ dùng số nguyên (so sánh / hash là 1 phép toán).
+Lớp Move là "view" có __slots__ để đọc cho dễ, và vẫn unpack được như tuple cũ:
+    start, end = Move(m)
+"""
+from typing import Optional, Tuple
+
+PROMOTION_PIECES = ' QRBN'
+
+CAPTURE = 1 << 19
+CASTLE = 1 << 20
+EN_PASSANT = 1 << 21
+DOUBLE_PUSH = 1 << 22
+
+SQUARE_MASK = 0xFF
+FROM_TO_MASK = 0xFFFF
+
+
+def square(row: int, col: int) -> int:
+    return row << 4 | col
+
+
+def encode(start: Tuple[int, int], end: Tuple[int, int], promotion: Optional[str] = None,
+           flags: int = 0) -> int:
+    """((r1, c1), (r2, c2), 'Q') -> int."""
+    m = start[0] << 4 | start[1] | (end[0] << 12) | (end[1] << 8) | flags
+    if promotion:
+        m |= PROMOTION_PIECES.index(promotion.upper()) << 16
+    return m
+
+
+def from_pos(m: int) -> Tuple[int, int]:
+    return (m >> 4) & 0xF, m & 0xF
+
+
+def to_pos(m: int) -> Tuple[int, int]:
+    return (m >> 12) & 0xF, (m >> 8) & 0xF
+
+
+def unpack(m: int) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """int -> ((r1, c1), (r2, c2)) dạng cũ."""
+    return ((m >> 4) & 0xF, m & 0xF), ((m >> 12) & 0xF, (m >> 8) & 0xF)
+
+
+def promotion_of(m: int) -> Optional[str]:
+    index = (m >> 16) & 0x7
+    return PROMOTION_PIECES[index] if index else None
+
+
+def with_promotion(m: int, promotion: str) -> int:
+    return (m & ~(0x7 << 16)) | (PROMOTION_PIECES.index(promotion.upper()) << 16)
+
+
+def same_squares(a: int, b: int) -> bool:
+    """So sánh chỉ theo ô đi / ô đến (bỏ qua cờ hiệu)."""
+    return (a & FROM_TO_MASK) == (b & FROM_TO_MASK)
+
+
+class Move:
+    """View đọc được của một nước đi đã mã hóa. Bằng nhau / hash theo số nguyên."""
+    __slots__ = ('value',)
+
+    def __init__(self, value, end: Optional[Tuple[int, int]] = None,
+                 promotion: Optional[str] = None, flags: int = 0):
+        if end is not None:
+            value = encode(value, end, promotion, flags)
+        self.value = int(value)
+
+    @property
+    def start(self) -> Tuple[int, int]:
+        return from_pos(self.value)
+
+    @property
+    def end(self) -> Tuple[int, int]:
+        return to_pos(self.value)
+
+    @property
+    def promotion(self) -> Optional[str]:
+        return promotion_of(self.value)
+
+    @property
+    def is_capture(self) -> bool:
+        return bool(self.value & CAPTURE)
+
+    @property
+    def is_castle(self) -> bool:
+        return bool(self.value & CASTLE)
+
+    @property
+    def is_en_passant(self) -> bool:
+        return bool(self.value & EN_PASSANT)
+
+    def __int__(self):
+        return self.value
+
+    __index__ = __int__
+
+    def __iter__(self):
+        # Cho phép: start, end = move
+        yield from_pos(self.value)
+        yield to_pos(self.value)
+
+    def __eq__(self, other):
+        if isinstance(other, Move):
+            return self.value == other.value
+        if isinstance(other, int):
+            return self.value == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        promo = self.promotion or ''
+        return f"Move({self.start}->{self.end}{promo})"
@@ -1,15 +1,29 @@
-from typing import List, Tuple, TYPE_CHECKING
-# Import đầy đủ các quân để check isinstance chuẩn xác
-from .piece import King, Rook, Pawn, Knight, Bishop, Queen, Soldier, Horse, Cannon, Chariot, Elephant, Advisor, General
+from typing import List, Optional, Tuple, TYPE_CHECKING
+from . import bitboard, xiangqi_bitboard
+from . import move as mv
+
+# Đổi chỉ số ô của bitboard (r*cols + c) sang ô mã hóa của Move (r << 4 | c)
+_PACKED_SQUARE = {
+    8: [(sq // 8) << 4 | (sq % 8) for sq in range(64)],
+    9: [(sq // 9) << 4 | (sq % 9) for sq in range(90)],
+}
 
 if TYPE_CHECKING:
     from .board import Board
 
 class MoveValidator:
+    # Số thế cờ tối đa giữ trong cache kết quả ván (đầy thì xóa hết, làm lại từ đầu)
+    RESULT_CACHE_SIZE = 1 << 16
+
     def __init__(self, game_type: str = 'chess'):
         self.game_type = game_type
+        self._result_cache = {}  # board.hash -> kết quả của game_result
 
-    def is_valid_move(self, board: 'Board', start_pos: Tuple[int, int], end_pos: Tuple[int, int], player_color: str) -> bool:
+    def is_valid_move(self, board: 'Board', start_pos, end_pos, player_color: str = None) -> bool:
+        # Cho phép gọi is_valid_move(board, move, color) với Move / int đã mã hóa
+        if player_color is None:
+            player_color = end_pos
+            start_pos, end_pos = mv.unpack(int(start_pos))
         piece = board.get_piece(start_pos)
         if not piece or piece.color != player_color:
             return False
@@ -23,151 +37,142 @@ class MoveValidator:
         if not piece or piece.color != player_color:
             return []
 
-        # 1. Lấy nước đi cơ bản
-        raw_moves = []
-        if hasattr(piece, 'valid_moves'):
-            raw_moves = piece.valid_moves(board, pos)
-
-        # 2. LOGIC NHẬP THÀNH (CASTLING)
-        if self.game_type == 'chess' and isinstance(piece, King):
-            has_moved = getattr(piece, 'has_moved', False)
-            if not has_moved and not self.is_in_check(board, player_color):
-                row, col = pos
-                opponent_color = 'black' if player_color == 'white' else 'white'
-                
-                # King-side (Cánh Vua)
-                if self._can_castle_kingside(board, row, col, player_color):
-                    middle_pos = (row, col + 1) # Ô f1/f8
-                    # Check kỹ: Ô đi qua có bị tấn công không?
-                    if not self.is_square_attacked(board, middle_pos, opponent_color):
-                        raw_moves.append((row, col + 2)) 
-                
-                # Queen-side (Cánh Hậu)
-                if self._can_castle_queenside(board, row, col, player_color):
-                    middle_pos = (row, col - 1) # Ô d1/d8
-                    if not self.is_square_attacked(board, middle_pos, opponent_color):
-                        raw_moves.append((row, col - 2))
-
-        # 3. LOGIC BẮT TỐT QUA ĐƯỜNG (EN PASSANT)
-        if self.game_type == 'chess' and isinstance(piece, Pawn):
-            ep_move = self._get_en_passant_move(board, pos, piece)
-            if ep_move:
-                raw_moves.append(ep_move)
-
-        # 4. Lọc nước đi an toàn (Move Safety Check)
-        valid_moves = []
-        for move in raw_moves:
-            if self._is_move_safe(board, pos, move, player_color):
-                valid_moves.append(move)
-
-        return valid_moves
-
-    # --- [QUAN TRỌNG] HÀM CHECK BỊ TẤN CÔNG (HARDENED) ---
+        # --- CỜ VUA: SINH NƯỚC ĐI BẰNG BITBOARD ---
+        # (Nhập thành, bắt tốt qua đường và lọc nước tự chiếu đều nằm trong core/bitboard.py)
+        if self.game_type == 'chess':
+            row, col = pos
+            kind = piece.symbol.upper()
+            # Quyền nhập thành chỉ cần cho Vua, ô en passant chỉ cần cho Tốt
+            castling = board.castling_rights() if kind == 'K' else 0
+            ep = board.en_passant_square() if kind == 'P' else None
+            moves = bitboard.generate_legal_moves(
+                board.bitboards, bitboard.COLOR_INDEX[player_color], castling,
+                ep[0] * 8 + ep[1] if ep else None, from_square=row * 8 + col
+            )
+            return [divmod(to, 8) for _, to in moves]
+
+        # --- CỜ TƯỚNG: BITBOARD 90-BIT, XE/PHÁO TRA BẢNG THEO HÀNG/CỘT ---
+        row, col = pos
+        moves = xiangqi_bitboard.generate_legal_moves(
+            board.bitboards, xiangqi_bitboard.COLOR_INDEX[player_color], from_square=row * 9 + col
+        )
+        return [divmod(to, 9) for _, to in moves]
+
+    # --- [MỚI] SINH TOÀN BỘ NƯỚC ĐI CỦA MỘT PHE ---
+    def generate_legal_moves(self, board: 'Board', color: str, first_only: bool = False,
+                             split: bool = False, packed: bool = False):
+        """
+        Sinh toàn bộ nước đi hợp lệ của phe 'color' trong một lượt, dạng ((r1, c1), (r2, c2)).
+        - first_only: dừng ở nước hợp lệ đầu tiên (đủ để biết chiếu bí / hết nước).
+        - split: trả về (captures, quiets) thay vì một danh sách.
+        - packed: mỗi nước là 1 số nguyên (core/move.py) kèm cờ hiệu ăn quân / nhập thành / en passant.
+        """
+        if self.game_type == 'chess':
+            us = bitboard.COLOR_INDEX[color]
+            ep = board.en_passant_square()
+            ep_sq = ep[0] * 8 + ep[1] if ep else None
+            raw = bitboard.generate_legal_moves(board.bitboards, us, board.castling_rights(),
+                                                ep_sq, first_only=first_only)
+            cols = 8
+        else:
+            us = xiangqi_bitboard.COLOR_INDEX[color]
+            ep_sq = None
+            raw = xiangqi_bitboard.generate_legal_moves(board.bitboards, us, first_only=first_only)
+            cols = 9
+
+        if packed:
+            return self._pack(board, us, raw, cols, ep_sq, split)
+        if not split:
+            return [(divmod(frm, cols), divmod(to, cols)) for frm, to in raw]
+
+        enemy = board.bitboards.occ[us ^ 1]
+        pawns = board.bitboards.pieces[us * 6 + bitboard.PAWN] if ep_sq is not None else 0
+        captures, quiets = [], []
+        for frm, to in raw:
+            move = (divmod(frm, cols), divmod(to, cols))
+            # Ăn quân: ô đích có quân địch, hoặc Tốt bắt qua đường
+            if enemy >> to & 1 or (to == ep_sq and pawns >> frm & 1):
+                captures.append(move)
+            else:
+                quiets.append(move)
+        return captures, quiets
+
+    def _pack(self, board: 'Board', us: int, raw, cols: int, ep_sq, split: bool):
+        """Mã hóa list (from_sq, to_sq) của bitboard thành list số nguyên Move."""
+        sq = _PACKED_SQUARE[cols]
+        bb = board.bitboards
+        enemy = bb.occ[us ^ 1]
+        if cols == 8:
+            pawns = bb.pieces[us * 6 + bitboard.PAWN]
+            kings = bb.pieces[us * 6 + bitboard.KING]
+        else:
+            pawns = kings = 0
+        special = pawns | kings  # Chỉ Tốt / Vua mới có thể là nước đặc biệt
+        captures, quiets = [], []
+        for frm, to in raw:
+            m = sq[frm] | sq[to] << 8
+            if enemy >> to & 1:
+                captures.append(m | mv.CAPTURE)
+            elif not special >> frm & 1:
+                quiets.append(m)
+            elif to == ep_sq and pawns >> frm & 1 and (frm - to) % 8:
+                captures.append(m | mv.CAPTURE | mv.EN_PASSANT)
+            elif abs(frm - to) == 16 and pawns >> frm & 1:
+                quiets.append(m | mv.DOUBLE_PUSH)
+            elif abs(frm - to) == 2 and kings >> frm & 1:
+                quiets.append(m | mv.CASTLE)
+            else:
+                quiets.append(m)
+        if split:
+            return captures, quiets
+        return captures + quiets
+
+    # --- [MỚI] KẾT THÚC VÁN: ĂN VUA / CHIẾU BÍ / HẾT NƯỚC ---
+    def game_result(self, board: 'Board') -> Optional[Tuple[str, str]]:
+        """
+        Kết quả ván cờ với phe đang tới lượt (board.current_turn).
+        Trả về None nếu còn nước đi, ngược lại (winner, lý do):
+        - winner: 'white' / 'black' / 'draw'
+        - lý do: 'king_captured', 'checkmate', 'stalemate' (cờ vua: hòa), 'no_moves' (cờ tướng: hết nước là thua)
+        Chỉ sinh tới nước hợp lệ đầu tiên; kết quả được cache theo board.hash.
+        """
+        key = board.hash
+        cache = self._result_cache
+        if key in cache:
+            return cache[key]
+
+        color = board.current_turn
+        opponent = 'white' if color == 'black' else 'black'
+        if board.find_king_pos(color) is None:
+            result = (opponent, 'king_captured')
+        elif self.generate_legal_moves(board, color, first_only=True):
+            result = None
+        elif self.is_in_check(board, color):
+            result = (opponent, 'checkmate')
+        elif self.game_type == 'chess':
+            result = ('draw', 'stalemate')
+        else:
+            result = (opponent, 'no_moves')
+
+        if len(cache) >= self.RESULT_CACHE_SIZE:
+            cache.clear()
+        cache[key] = result
+        return result
+
+    # --- [QUAN TRỌNG] HÀM CHECK BỊ TẤN CÔNG ---
     def is_square_attacked(self, board: 'Board', pos: Tuple[int, int], attacker_color: str) -> bool:
-        """Kiểm tra ô 'pos' có bị 'attacker_color' nhắm tới không."""
-        target_r, target_c = pos
-        
-        for r in range(board.rows):
-            for c in range(board.cols):
-                piece = board.board[r][c]
-                if not piece or piece.color != attacker_color:
-                    continue
-                
-                # A. XỬ LÝ RIÊNG CHO TỐT (PAWN) - Fix lỗi Tốt không tính đe dọa ô trống
-                if isinstance(piece, (Pawn, Soldier)):
-                    if board.game_type == 'chess':
-                        # Tốt đen đánh xuống (+1), Tốt trắng đánh lên (-1)
-                        direction = 1 if piece.color == 'black' else -1
-                        attack_r = r + direction
-                        # Nếu cùng hàng tấn công và chênh lệch 1 cột -> BỊ CHIẾU
-                        if attack_r == target_r and abs(c - target_c) == 1:
-                            return True
-                    # (Logic Cờ tướng cho Tốt có thể thêm ở đây nếu cần)
-                    continue 
-
-                # B. XỬ LÝ RIÊNG CHO MÃ (KNIGHT) - Tính toán hình học, không phụ thuộc valid_moves
-                if isinstance(piece, (Knight, Horse)):
-                    if board.game_type == 'chess':
-                        dr = abs(r - target_r)
-                        dc = abs(c - target_c)
-                        if (dr == 1 and dc == 2) or (dr == 2 and dc == 1):
-                            return True
-                    elif board.game_type == 'chinese_chess':
-                        # Cờ tướng phức tạp hơn (có cản), nên dùng valid_moves
-                        pass
-                    
-                    if board.game_type == 'chess': continue
-
-                # C. XỬ LÝ RIÊNG CHO VUA (KING)
-                if isinstance(piece, (King, General)):
-                    if abs(r - target_r) <= 1 and abs(c - target_c) <= 1:
-                        return True
-                    continue
-
-                # D. CÁC QUÂN CÒN LẠI (Xe, Tượng, Hậu) - Dùng valid_moves là an toàn
-                if hasattr(piece, 'valid_moves'):
-                    moves = piece.valid_moves(board, (r, c))
-                    if pos in moves:
-                        return True
-        
-        return False
-
-    # --- CÁC HÀM PHỤ TRỢ KHÁC (Giữ nguyên logic chuẩn) ---
-    def _can_castle_kingside(self, board: 'Board', r, c, color):
-        if board.board[r][5] is not None or board.board[r][6] is not None: return False
-        rook = board.board[r][7]
-        if not isinstance(rook, Rook) or rook.color != color or getattr(rook, 'has_moved', False): return False
-        return True
-
-    def _can_castle_queenside(self, board: 'Board', r, c, color):
-        if board.board[r][1] is not None or board.board[r][2] is not None or board.board[r][3] is not None: return False
-        rook = board.board[r][0]
-        if not isinstance(rook, Rook) or rook.color != color or getattr(rook, 'has_moved', False): return False
-        return True
-
-    def _get_en_passant_move(self, board: 'Board', current_pos: Tuple[int, int], pawn: Pawn):
-        last_move = getattr(board, 'last_move', None)
-        if not last_move: return None
-        r, c = current_pos
-        lm_piece = last_move['piece']
-        lm_start = last_move['start']
-        lm_end = last_move['end']
-        if isinstance(lm_piece, Pawn) and abs(lm_start[0] - lm_end[0]) == 2:
-            if lm_end[0] == r and abs(lm_end[1] - c) == 1:
-                direction = -1 if pawn.color == 'white' else 1 
-                return (r + direction, lm_end[1])
-        return None
-
-    def _is_move_safe(self, board: 'Board', start: Tuple[int, int], end: Tuple[int, int], color: str) -> bool:
-        target_piece = board.board[end[0]][end[1]]
-        moving_piece = board.board[start[0]][start[1]]
-        
-        en_passant_victim_pos = None
-        en_passant_victim = None
-        if self.game_type == 'chess' and isinstance(moving_piece, Pawn) and start[1] != end[1] and target_piece is None:
-            en_passant_victim_pos = (start[0], end[1]) 
-            en_passant_victim = board.board[en_passant_victim_pos[0]][en_passant_victim_pos[1]]
-            board.board[en_passant_victim_pos[0]][en_passant_victim_pos[1]] = None 
-
-        board.board[end[0]][end[1]] = moving_piece
-        board.board[start[0]][start[1]] = None
-        
-        original_pos = None
-        if hasattr(moving_piece, 'pos'):
-            original_pos = moving_piece.pos
-            moving_piece.pos = end 
-            
-        is_safe = not self.is_in_check(board, color)
-        
-        board.board[start[0]][start[1]] = moving_piece
-        board.board[end[0]][end[1]] = target_piece
-        if original_pos and hasattr(moving_piece, 'pos'): moving_piece.pos = original_pos
-        if en_passant_victim_pos: board.board[en_passant_victim_pos[0]][en_passant_victim_pos[1]] = en_passant_victim
-
-        return is_safe
+        """
+        Kiểm tra ô 'pos' có bị 'attacker_color' nhắm tới không.
+        Nhìn ngược từ 'pos' ra ngoài (tia Xe/Tượng/Hậu, hình Mã có chân, Tốt, ngòi Pháo,
+        lộ mặt Tướng) và trả về ngay khi gặp kẻ tấn công đầu tiên.
+        """
+        row, col = pos
+        if self.game_type == 'chess':
+            return bitboard.is_square_attacked(board.bitboards, row * 8 + col, bitboard.COLOR_INDEX[attacker_color])
+        return xiangqi_bitboard.is_square_attacked(board.bitboards, row * 9 + col,
+                                                   xiangqi_bitboard.COLOR_INDEX[attacker_color])
 
     def is_in_check(self, board: 'Board', color: str) -> bool:
-        king_pos = board.find_king_pos(color)
-        if not king_pos: return False 
-        opponent_color = 'black' if color == 'white' else 'white'
-        return self.is_square_attacked(board, king_pos, opponent_color)
\ No newline at end of file
+        if self.game_type == 'chess':
+            return bitboard.in_check(board.bitboards, bitboard.COLOR_INDEX[color])
+        return xiangqi_bitboard.in_check(board.bitboards, xiangqi_bitboard.COLOR_INDEX[color])
\ No newline at end of file
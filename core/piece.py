@@ -6,13 +6,29 @@ class Piece(ABC):
     Lớp cơ sở cho tất cả quân cờ.
     - color: 'white' (trắng/đỏ) hoặc 'black' (đen).
     - symbol: Ký tự đại diện (ví dụ: 'K' cho Vua).
+    Quân cờ là bất biến và dùng chung (flyweight, lấy qua create_piece): mọi quân Tốt trắng là
+    cùng một object. Trạng thái riêng như "đã di chuyển" (nhập thành) nằm ở Board.
     """
+    __slots__ = ('color', 'symbol')
+
     def __init__(self, color: str, symbol: str):
         if color not in ['white', 'black']:
             raise ValueError("Color must be 'white' or 'black'")
-        self.color = color
-        self.symbol = symbol.upper() if color == 'white' else symbol.lower()
-        self.has_moved = False  # Dùng cho nhập thành (Chess) hoặc các quy tắc đặc biệt
+        object.__setattr__(self, 'color', color)
+        object.__setattr__(self, 'symbol', symbol.upper() if color == 'white' else symbol.lower())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Quân cờ là bất biến (dùng chung giữa các bàn cờ)")
+
+    # Copy / deepcopy / pickle đều trả về đúng object dùng chung
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return create_piece, (self.symbol, self.color)
 
     @abstractmethod
     def valid_moves(self, board: List[List['Piece']], pos: Tuple[int, int]) -> List[Tuple[int, int]]:
@@ -32,6 +48,10 @@ class Piece(ABC):
 
     def is_empty(self, board: List[List['Piece']], row: int, col: int) -> bool:
         """Kiểm tra ô có trống không."""
+        # Board / GridView có mailbox đệm: ô ngoài bàn là OFFBOARD -> 1 phép tra
+        is_empty = getattr(board, 'is_empty', None)
+        if is_empty is not None:
+            return is_empty(row, col)
         rows, cols = len(board), len(board[0]) if board else 0
         return 0 <= row < rows and 0 <= col < cols and board[row][col] is None
 
@@ -57,6 +77,8 @@ class Piece(ABC):
 # ----------------- Quân cờ Chess -----------------
 
 class Pawn(Piece):  # Tốt (Chess)
+    __slots__ = ()
+
     def valid_moves(self, board, pos):
         row, col = pos
         moves = []
@@ -67,7 +89,7 @@ class Pawn(Piece):  # Tốt (Chess)
         if self.is_empty(board, row + direction, col):
             moves.append((row + direction, col))
             # Tiến 2 từ vị trí đầu
-            if not self.has_moved and row == start_row and self.is_empty(board, row + 2 * direction, col):
+            if row == start_row and self.is_empty(board, row + 2 * direction, col):
                 moves.append((row + 2 * direction, col))
 
         # Ăn chéo
@@ -101,12 +123,16 @@ class Pawn(Piece):  # Tốt (Chess)
 
 
 class Rook(Piece):  # Xe (Chess)
+    __slots__ = ()
+
     def valid_moves(self, board, pos):
         directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
         return self._slide_moves(board, pos, directions)
 
 
 class Knight(Piece):  # Mã (Chess)
+    __slots__ = ()
+
     def valid_moves(self, board, pos):
         row, col = pos
         deltas = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
@@ -119,18 +145,24 @@ class Knight(Piece):  # Mã (Chess)
 
 
 class Bishop(Piece):  # Tượng (Chess)
+    __slots__ = ()
+
     def valid_moves(self, board, pos):
         directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
         return self._slide_moves(board, pos, directions)
 
 
 class Queen(Piece):  # Hậu (Chess)
+    __slots__ = ()
+
     def valid_moves(self, board, pos):
         directions = [(0,1),(0,-1),(1,0),(-1,0),(1,1),(1,-1),(-1,1),(-1,-1)]
         return self._slide_moves(board, pos, directions)
 
 
 class King(Piece):  # Vua (Chess)
+    __slots__ = ()
+
     def valid_moves(self, board, pos):
         row, col = pos
         deltas = [(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)]
@@ -140,24 +172,14 @@ class King(Piece):  # Vua (Chess)
             if 0 <= r < len(board) and 0 <= c < len(board[0]) and (self.is_empty(board, r, c) or self.is_enemy(board[r][c])):
                 moves.append((r, c))
 
-        # Nhập thành (castling) - cần kiểm tra an toàn, nhưng đơn giản hóa
-        if not self.has_moved:
-            # Kingside (O-O)
-            if self.is_empty(board, row, col + 1) and self.is_empty(board, row, col + 2):
-                rook = board[row][col + 3]
-                if isinstance(rook, Rook) and rook.color == self.color and not rook.has_moved:
-                    moves.append((row, col + 2))
-            # Queenside (O-O-O)
-            if self.is_empty(board, row, col - 1) and self.is_empty(board, row, col - 2) and self.is_empty(board, row, col - 3):
-                rook = board[row][col - 4]
-                if isinstance(rook, Rook) and rook.color == self.color and not rook.has_moved:
-                    moves.append((row, col - 2))
-
+        # Nhập thành cần quyền nhập thành lưu ở Board -> do core/bitboard.py sinh
         return moves
 
 # ----------------- Quân cờ Chinese Chess -----------------
 
 class General(Piece):  # Tướng (Chinese Chess)
+    __slots__ = ()
+
     def __init__(self, color: str, symbol: str = 'G'):
         super().__init__(color, symbol)
 
@@ -182,6 +204,14 @@ class General(Piece):  # Tướng (Chinese Chess)
     def _is_facing_general(self, board, new_pos):
         # Tìm vị trí Tướng địch và kiểm tra cột thẳng, không có chắn
         enemy_color = 'white' if self.color == 'black' else 'black'
+        # Board (hoặc view của nó): vị trí Tướng lưu sẵn + tra occupancy cột -> O(1)
+        find_king_pos = getattr(board, 'find_king_pos', None)
+        if find_king_pos is not None:
+            enemy_general_pos = find_king_pos(enemy_color)
+            if not enemy_general_pos or new_pos[1] != enemy_general_pos[1]:
+                return False
+            return board.is_file_clear(new_pos[1], new_pos[0], enemy_general_pos[0])
+
         enemy_general_pos = None
         for r in range(len(board)):
             for c in range(len(board[0])):
@@ -203,6 +233,8 @@ class General(Piece):  # Tướng (Chinese Chess)
 
 
 class Advisor(Piece):  # Sĩ (Chinese Chess)
+    __slots__ = ()
+
     def valid_moves(self, board, pos):
         row, col = pos
         moves = []
@@ -220,6 +252,8 @@ class Advisor(Piece):  # Sĩ (Chinese Chess)
 
 
 class Elephant(Piece):  # Tượng (Chinese Chess)
+    __slots__ = ()
+
     def valid_moves(self, board, pos):
         row, col = pos
         moves = []
@@ -238,12 +272,14 @@ class Elephant(Piece):  # Tượng (Chinese Chess)
 
 
 class Horse(Piece):  # Mã (Chinese Chess)
+    __slots__ = ()
+
     def valid_moves(self, board, pos):
         row, col = pos
         moves = []
         # Chân mã: hướng chắn
         leg_deltas = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-        jump_deltas = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+        jump_deltas = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (-1, 2), (1, -2), (-1, -2)]
 
         for i in range(4):  # 4 hướng chính
             leg_dr, leg_dc = leg_deltas[i]
@@ -259,12 +295,16 @@ class Horse(Piece):  # Mã (Chinese Chess)
 
 
 class Chariot(Piece):  # Xe (Chinese Chess)
+    __slots__ = ()
+
     def valid_moves(self, board, pos):
         directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
         return self._slide_moves(board, pos, directions)
 
 
 class Cannon(Piece):  # Pháo (Chinese Chess)
+    __slots__ = ()
+
     def valid_moves(self, board, pos):
         moves = []
         row, col = pos
@@ -290,6 +330,8 @@ class Cannon(Piece):  # Pháo (Chinese Chess)
 
 
 class Soldier(Piece):  # Tốt (Chinese Chess)
+    __slots__ = ()
+
     def valid_moves(self, board, pos):
         row, col = pos
         moves = []
@@ -338,7 +380,15 @@ def create_piece(symbol: str, color: str) -> Piece:
         'O': Cannon,  # 'O' cho Cannon để tránh trùng N
         'S': Soldier
     }
-    cls = pieces_map.get(symbol)
-    if cls:
-        return cls(color, symbol)
-    raise ValueError(f"Unknown piece symbol: {symbol}")
\ No newline at end of file
+    key = (symbol, color)
+    piece = _FLYWEIGHTS.get(key)
+    if piece is None:
+        cls = pieces_map.get(symbol)
+        if not cls:
+            raise ValueError(f"Unknown piece symbol: {symbol}")
+        piece = _FLYWEIGHTS[key] = cls(color, symbol)
+    return piece
+
+
+# Bộ đệm quân cờ dùng chung: (symbol viết hoa, color) -> instance
+_FLYWEIGHTS = {}
\ No newline at end of file
@@ -0,0 +1,594 @@
+"""
+Backend bitboard cho Cờ Tướng.
+
+Quy ước ô: ô (row, col) của Board <-> bit số row * 9 + col (số nguyên 90-bit).
+Row 0-4 là nửa bàn của Đen, row 5-9 là nửa bàn của Đỏ ('white').
+
+Ngoài bitboard từng loại quân, vị trí còn giữ occupancy theo hàng (9 bit) và
+theo cột (10 bit) để Xe/Pháo tra bảng thay vì dò từng ô.
+"""
+from typing import List, Optional, Tuple
+
+WHITE, BLACK = 0, 1
+GENERAL, ADVISOR, ELEPHANT, HORSE, CHARIOT, CANNON, SOLDIER = range(7)
+
+COLOR_INDEX = {'white': WHITE, 'black': BLACK}
+PIECE_TYPE = {'G': GENERAL, 'A': ADVISOR, 'E': ELEPHANT, 'H': HORSE, 'C': CHARIOT, 'O': CANNON, 'S': SOLDIER}
+
+ROWS, COLS = 10, 9
+RANK_MASK = (1 << COLS) - 1
+FILE_MASK = (1 << ROWS) - 1
+
+
+def _on_board(r, c):
+    return 0 <= r < ROWS and 0 <= c < COLS
+
+
+def _in_palace(color, r, c):
+    return 3 <= c <= 5 and (7 <= r <= 9 if color == WHITE else 0 <= r <= 2)
+
+
+def _own_half(color, r):
+    return r >= 5 if color == WHITE else r <= 4
+
+
+def _crossed_river(color, r):
+    return r <= 4 if color == WHITE else r >= 5
+
+
+# =========================================================================
+# BẢNG TRA HÀNG / CỘT CHO XE VÀ PHÁO
+# =========================================================================
+def _line_tables(length):
+    """
+    Với quân đứng ở vị trí i trên một đường (hàng hoặc cột) có occupancy `occ`:
+    - slide[i][occ]: các ô Xe đi tới được (ô trống + quân chặn đầu tiên mỗi hướng).
+    - screen[i][occ]: quân đứng ngay sau "ngòi" đầu tiên mỗi hướng (ô Pháo ăn được).
+    Bit của chính quân ở vị trí i trong occ được bỏ qua.
+    """
+    slide = [[0] * (1 << length) for _ in range(length)]
+    screen = [[0] * (1 << length) for _ in range(length)]
+    for i in range(length):
+        for occ in range(1 << length):
+            s = sc = 0
+            for step in (1, -1):
+                j = i + step
+                jumped = False
+                while 0 <= j < length:
+                    bit = 1 << j
+                    if not jumped:
+                        s |= bit
+                        if occ & bit:
+                            jumped = True
+                    elif occ & bit:
+                        sc |= bit
+                        break
+                    j += step
+            slide[i][occ] = s
+            screen[i][occ] = sc
+    return slide, screen
+
+
+def _spread_file(mask10):
+    """Đổi mask 10 bit theo hàng thành bitboard 90-bit ở cột 0."""
+    out = 0
+    for r in range(ROWS):
+        if mask10 >> r & 1:
+            out |= 1 << (r * COLS)
+    return out
+
+
+# Hàng: kết quả là mask 9 bit theo cột, dịch trái row*9 khi dùng.
+RANK_SLIDE, RANK_SCREEN = _line_tables(COLS)
+# Cột: kết quả đã trải sẵn thành bitboard ở cột 0, dịch trái col khi dùng.
+FILE_SLIDE, FILE_SCREEN = _line_tables(ROWS)
+FILE_SLIDE = [[_spread_file(m) for m in row] for row in FILE_SLIDE]
+FILE_SCREEN = [[_spread_file(m) for m in row] for row in FILE_SCREEN]
+# FILE_BETWEEN[r1][r2]: mask 10 bit các hàng nằm giữa r1 và r2 (so với file_occ của một cột)
+FILE_BETWEEN = [[sum(1 << r for r in range(min(a, b) + 1, max(a, b))) for b in range(ROWS)]
+                for a in range(ROWS)]
+
+
+# =========================================================================
+# BẢNG NƯỚC ĐI CỦA CÁC QUÂN ĐI BƯỚC
+# =========================================================================
+def _bit(r, c):
+    return 1 << (r * COLS + c)
+
+
+GENERAL_MOVES = [[0] * 90, [0] * 90]
+ADVISOR_MOVES = [[0] * 90, [0] * 90]
+SOLDIER_MOVES = [[0] * 90, [0] * 90]
+# ELEPHANT_MOVES[color][sq]: list (mắt tượng, ô đích)
+ELEPHANT_MOVES = [[[] for _ in range(90)], [[] for _ in range(90)]]
+# HORSE_MOVES[sq]: list (chân mã, mask 2 ô đích theo chân đó)
+HORSE_MOVES = [[] for _ in range(90)]
+# HORSE_ATTACKERS[sq]: list (chân mã, mask các ô Mã đứng để đá tới sq qua chân đó)
+HORSE_ATTACKERS = [[] for _ in range(90)]
+# SOLDIER_ATTACKERS[color][sq]: các ô mà Tốt màu color đứng sẽ ăn được sq
+SOLDIER_ATTACKERS = [[0] * 90, [0] * 90]
+
+for _sq in range(90):
+    _r, _c = divmod(_sq, COLS)
+    for _color in (WHITE, BLACK):
+        for _dr, _dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            if _in_palace(_color, _r, _c) and _in_palace(_color, _r + _dr, _c + _dc):
+                GENERAL_MOVES[_color][_sq] |= _bit(_r + _dr, _c + _dc)
+        for _dr, _dc in ((-1, -1), (-1, 1), (1, -1), (1, 1)):
+            if _in_palace(_color, _r, _c) and _in_palace(_color, _r + _dr, _c + _dc):
+                ADVISOR_MOVES[_color][_sq] |= _bit(_r + _dr, _c + _dc)
+            _tr, _tc = _r + 2 * _dr, _c + 2 * _dc
+            if _own_half(_color, _r) and _on_board(_tr, _tc) and _own_half(_color, _tr):
+                ELEPHANT_MOVES[_color][_sq].append((_bit(_r + _dr, _c + _dc), _bit(_tr, _tc)))
+
+        forward = -1 if _color == WHITE else 1
+        if _on_board(_r + forward, _c):
+            SOLDIER_MOVES[_color][_sq] |= _bit(_r + forward, _c)
+        if _crossed_river(_color, _r):
+            for _dc in (-1, 1):
+                if _on_board(_r, _c + _dc):
+                    SOLDIER_MOVES[_color][_sq] |= _bit(_r, _c + _dc)
+
+    for _lr, _lc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        if not _on_board(_r + _lr, _c + _lc):
+            continue
+        targets = 0
+        for _side in (-1, 1):
+            # Nhảy thẳng 2 ô theo hướng chân, lệch 1 ô sang bên
+            _tr = _r + 2 * _lr + (_side if _lr == 0 else 0)
+            _tc = _c + 2 * _lc + (_side if _lc == 0 else 0)
+            if _on_board(_tr, _tc):
+                targets |= _bit(_tr, _tc)
+        if targets:
+            HORSE_MOVES[_sq].append((_bit(_r + _lr, _c + _lc), targets))
+
+for _sq in range(90):
+    for _leg, _targets in HORSE_MOVES[_sq]:
+        _t = _targets
+        while _t:
+            _low = _t & -_t
+            _to = _low.bit_length() - 1
+            _t ^= _low
+            for _entry in HORSE_ATTACKERS[_to]:
+                if _entry[0] == _leg:
+                    _entry[1] |= 1 << _sq
+                    break
+            else:
+                HORSE_ATTACKERS[_to].append([_leg, 1 << _sq])
+    for _color in (WHITE, BLACK):
+        _t = SOLDIER_MOVES[_color][_sq]
+        while _t:
+            _low = _t & -_t
+            SOLDIER_ATTACKERS[_color][_low.bit_length() - 1] |= 1 << _sq
+            _t ^= _low
+
+HORSE_ATTACKERS = [[tuple(e) for e in entries] for entries in HORSE_ATTACKERS]
+
+
+# =========================================================================
+# VỊ TRÍ (POSITION)
+# =========================================================================
+class XiangqiBitboards:
+    """
+    Trạng thái Cờ Tướng dạng bitboard 90-bit.
+    - pieces[color * 7 + type], occ[color]: giống ChessBitboards.
+    - rank_occ[row] (9 bit), file_occ[col] (10 bit): occupancy theo đường cho Xe/Pháo.
+    """
+    __slots__ = ('pieces', 'occ', 'rank_occ', 'file_occ')
+    PIECE_TYPE = PIECE_TYPE
+
+    def __init__(self):
+        self.pieces = [0] * 14
+        self.occ = [0, 0]
+        self.rank_occ = [0] * ROWS
+        self.file_occ = [0] * COLS
+
+    @classmethod
+    def from_grid(cls, grid) -> 'XiangqiBitboards':
+        bb = cls()
+        for r, row in enumerate(grid):
+            for c, piece in enumerate(row):
+                if piece is not None:
+                    bb.put(r * COLS + c, COLOR_INDEX[piece.color], PIECE_TYPE[piece.symbol.upper()])
+        return bb
+
+    def put(self, sq: int, color: int, ptype: int):
+        bit = 1 << sq
+        self.pieces[color * 7 + ptype] |= bit
+        self.occ[color] |= bit
+        r, c = divmod(sq, COLS)
+        self.rank_occ[r] |= 1 << c
+        self.file_occ[c] |= 1 << r
+
+    def remove(self, sq: int, color: int, ptype: int):
+        bit = ~(1 << sq)
+        self.pieces[color * 7 + ptype] &= bit
+        self.occ[color] &= bit
+        r, c = divmod(sq, COLS)
+        self.rank_occ[r] &= ~(1 << c)
+        self.file_occ[c] &= ~(1 << r)
+
+    def copy(self) -> 'XiangqiBitboards':
+        new = XiangqiBitboards.__new__(XiangqiBitboards)
+        new.pieces = self.pieces[:]
+        new.occ = self.occ[:]
+        new.rank_occ = self.rank_occ[:]
+        new.file_occ = self.file_occ[:]
+        return new
+
+    def king_square(self, color: int) -> Optional[int]:
+        generals = self.pieces[color * 7 + GENERAL]
+        return generals.bit_length() - 1 if generals else None
+
+
+# =========================================================================
+# PHÁT HIỆN TẤN CÔNG (NHÌN NGƯỢC TỪ Ô ĐÍCH)
+# =========================================================================
+def _attacked(pieces, them: int, sq: int, occ: int, rank_bits: int, file_bits: int,
+              keep: int = -1, general_target: bool = True) -> bool:
+    """
+    Ô sq có bị phe `them` tấn công không. Thay vì sinh nước đi của từng quân địch,
+    ta nhìn từ sq ra ngoài theo từng kiểu tấn công và dừng ngay khi gặp kẻ tấn công.
+    - rank_bits / file_bits: occupancy hàng và cột đi qua sq.
+    - keep: mask quân địch còn sống (khi thử ăn quân mà không sửa bitboard).
+    - general_target: sq là chỗ Tướng phe kia đứng -> tính luật lộ mặt Tướng.
+      Khi đó bỏ qua Sĩ/Tượng/Tướng đi bước vì chúng không rời được cung/sông.
+    """
+    base = them * 7
+    if SOLDIER_ATTACKERS[them][sq] & pieces[base + SOLDIER] & keep:
+        return True
+    horses = pieces[base + HORSE] & keep
+    if horses:
+        for leg, sources in HORSE_ATTACKERS[sq]:
+            # Chân mã nằm sát Mã, chéo góc với sq
+            if sources & horses and not occ & leg:
+                return True
+    r, c = divmod(sq, COLS)
+    rank_shift = r * COLS
+    file_line = FILE_SLIDE[r][file_bits] << c
+    if ((RANK_SLIDE[c][rank_bits] << rank_shift) | file_line) & pieces[base + CHARIOT] & keep:
+        return True
+    cannons = pieces[base + CANNON] & keep
+    if cannons and ((RANK_SCREEN[c][rank_bits] << rank_shift) | (FILE_SCREEN[r][file_bits] << c)) & cannons:
+        return True
+    if general_target:
+        # Lộ mặt Tướng: Tướng địch "nhìn" thẳng tới như một quân Xe trên cột
+        return bool(file_line & pieces[base + GENERAL])
+    if ADVISOR_MOVES[them][sq] & pieces[base + ADVISOR] & keep:
+        return True
+    if GENERAL_MOVES[them][sq] & pieces[base + GENERAL]:
+        return True
+    elephants = pieces[base + ELEPHANT] & keep
+    if elephants:
+        for eye, source in ELEPHANT_MOVES[them][sq]:
+            if source & elephants and not occ & eye:
+                return True
+    return False
+
+
+def is_square_attacked(bb: XiangqiBitboards, sq: int, by_color: int) -> bool:
+    r, c = divmod(sq, COLS)
+    general_target = bool(bb.pieces[(by_color ^ 1) * 7 + GENERAL] >> sq & 1)
+    return _attacked(bb.pieces, by_color, sq, bb.occ[0] | bb.occ[1],
+                     bb.rank_occ[r], bb.file_occ[c], general_target=general_target)
+
+
+def in_check(bb: XiangqiBitboards, color: int) -> bool:
+    ksq = bb.king_square(color)
+    if ksq is None:
+        return False
+    r, c = divmod(ksq, COLS)
+    return _attacked(bb.pieces, color ^ 1, ksq, bb.occ[0] | bb.occ[1],
+                     bb.rank_occ[r], bb.file_occ[c])
+
+
+# =========================================================================
+# TRAO ĐỔI QUÂN (SEE - Static Exchange Evaluation)
+# =========================================================================
+# Giá trị quân khi tính trao đổi (centipawn, theo thứ tự GENERAL..SOLDIER); Tướng rất lớn để luôn ăn sau cùng
+SEE_VALUES = (10000, 200, 200, 400, 900, 450, 100)
+# Thứ tự chọn quân ăn lại: quân rẻ nhất trước
+_SEE_ORDER = (SOLDIER, ADVISOR, ELEPHANT, HORSE, CANNON, CHARIOT, GENERAL)
+
+
+def _file_bits(occ: int, c: int) -> int:
+    """Occupancy 10 bit của cột c, lấy từ bitboard occ bất kỳ."""
+    bits = 0
+    for r in range(ROWS):
+        if occ >> (r * COLS + c) & 1:
+            bits |= 1 << r
+    return bits
+
+
+def attackers_to(bb: XiangqiBitboards, sq: int, color: int, occ: int) -> int:
+    """
+    Mask mọi quân phe color đang tấn công ô sq, với occupancy occ cho trước
+    (SEE bỏ dần quân đã trao đổi khỏi occ -> Xe / Pháo phía sau tự "lộ" ra).
+    Không tính lộ mặt Tướng (ô đích của SEE không phải Tướng).
+    """
+    pieces = bb.pieces
+    base = color * 7
+    r, c = divmod(sq, COLS)
+    rank_bits = (occ >> (r * COLS)) & RANK_MASK
+    file_bits = _file_bits(occ, c)
+    attackers = SOLDIER_ATTACKERS[color][sq] & pieces[base + SOLDIER]
+    horses = pieces[base + HORSE] & occ
+    if horses:
+        for leg, sources in HORSE_ATTACKERS[sq]:
+            if not occ & leg:
+                attackers |= sources & horses
+    attackers |= ((RANK_SLIDE[c][rank_bits] << (r * COLS)) | (FILE_SLIDE[r][file_bits] << c)) & pieces[base + CHARIOT]
+    attackers |= ((RANK_SCREEN[c][rank_bits] << (r * COLS)) | (FILE_SCREEN[r][file_bits] << c)) & pieces[base + CANNON]
+    attackers |= ADVISOR_MOVES[color][sq] & pieces[base + ADVISOR]
+    attackers |= GENERAL_MOVES[color][sq] & pieces[base + GENERAL]
+    elephants = pieces[base + ELEPHANT] & occ
+    if elephants:
+        for eye, source in ELEPHANT_MOVES[color][sq]:
+            if source & elephants and not occ & eye:
+                attackers |= source
+    return attackers & occ
+
+
+def _piece_type_at(pieces, color: int, bit: int) -> int:
+    base = color * 7
+    for ptype in _SEE_ORDER:
+        if pieces[base + ptype] & bit:
+            return ptype
+    return -1
+
+
+def see(bb: XiangqiBitboards, frm: int, to: int) -> int:
+    """
+    Kết quả trao đổi trên ô `to` khi quân ở `frm` ăn vào (centipawn, góc nhìn bên đi).
+    Hai bên lần lượt ăn lại bằng quân rẻ nhất; mỗi bên được dừng khi ăn tiếp bị lỗ.
+    """
+    pieces = bb.pieces
+    occ = bb.occ[0] | bb.occ[1]
+    us = 0 if bb.occ[0] >> frm & 1 else 1
+    victim = _piece_type_at(pieces, us ^ 1, 1 << to)
+    gain = [SEE_VALUES[victim] if victim >= 0 else 0]
+    on_square = SEE_VALUES[_piece_type_at(pieces, us, 1 << frm)]
+    occ ^= 1 << frm
+    side = us
+    while True:
+        side ^= 1
+        attackers = attackers_to(bb, to, side, occ)
+        if not attackers:
+            break
+        for ptype in _SEE_ORDER:
+            candidates = attackers & pieces[side * 7 + ptype]
+            if candidates:
+                break
+        lsb = candidates & -candidates
+        if ptype == GENERAL and attackers_to(bb, to, side ^ 1, occ ^ lsb):
+            # Tướng không được ăn vào ô còn bị bảo vệ
+            break
+        gain.append(on_square - gain[-1])
+        on_square = SEE_VALUES[ptype]
+        occ ^= lsb
+    for d in range(len(gain) - 1, 0, -1):
+        gain[d - 1] = -max(-gain[d - 1], gain[d])
+    return gain[0]
+
+
+def file_clear(bb: XiangqiBitboards, col: int, r1: int, r2: int) -> bool:
+    """Không có quân nào giữa hàng r1 và r2 trên cột col (1 phép AND trên file_occ)."""
+    return not bb.file_occ[col] & FILE_BETWEEN[r1][r2]
+
+
+# =========================================================================
+# SINH NƯỚC ĐI
+# =========================================================================
+def generate_pseudo_moves(bb: XiangqiBitboards, color: int,
+                          from_square: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Sinh nước đi giả hợp lệ (chưa kiểm tra chiếu / lộ mặt Tướng) dạng (from_sq, to_sq).
+    - from_square: chỉ sinh cho quân ở ô này.
+    """
+    us = color
+    pieces = bb.pieces
+    own = bb.occ[us]
+    enemy = bb.occ[us ^ 1]
+    occ = own | enemy
+    not_own = ~own
+    rank_occ = bb.rank_occ
+    file_occ = bb.file_occ
+    only = -1 if from_square is None else (1 << from_square)
+    base = us * 7
+    moves = []
+
+    for ptype in (CHARIOT, CANNON, HORSE, SOLDIER, ADVISOR, ELEPHANT, GENERAL):
+        b = pieces[base + ptype] & only
+        while b:
+            low = b & -b
+            frm = low.bit_length() - 1
+            b ^= low
+
+            if ptype == CHARIOT or ptype == CANNON:
+                r, c = divmod(frm, COLS)
+                rank_bits = rank_occ[r]
+                file_bits = file_occ[c]
+                slide = (RANK_SLIDE[c][rank_bits] << (r * COLS)) | (FILE_SLIDE[r][file_bits] << c)
+                if ptype == CHARIOT:
+                    targets = slide & not_own
+                else:
+                    screen = (RANK_SCREEN[c][rank_bits] << (r * COLS)) | (FILE_SCREEN[r][file_bits] << c)
+                    targets = (slide & ~occ) | (screen & enemy)
+            elif ptype == HORSE:
+                targets = 0
+                for leg, dests in HORSE_MOVES[frm]:
+                    if not occ & leg:
+                        targets |= dests
+                targets &= not_own
+            elif ptype == SOLDIER:
+                targets = SOLDIER_MOVES[us][frm] & not_own
+            elif ptype == ADVISOR:
+                targets = ADVISOR_MOVES[us][frm] & not_own
+            elif ptype == ELEPHANT:
+                targets = 0
+                for eye, dest in ELEPHANT_MOVES[us][frm]:
+                    if not occ & eye:
+                        targets |= dest
+                targets &= not_own
+            else:
+                targets = GENERAL_MOVES[us][frm] & not_own
+
+            while targets:
+                t = targets & -targets
+                moves.append((frm, t.bit_length() - 1))
+                targets ^= t
+
+    return moves
+
+
+def is_legal(bb: XiangqiBitboards, color: int, frm: int, to: int) -> bool:
+    """
+    Kiểm tra nước (frm -> to) có để Tướng bị chiếu hoặc lộ mặt Tướng không.
+    Không sửa bitboard: occupancy mới được tính bằng phép toán số nguyên.
+    """
+    pieces = bb.pieces
+    from_bit = 1 << frm
+    to_bit = 1 << to
+    occ = ((bb.occ[0] | bb.occ[1]) & ~from_bit) | to_bit
+
+    generals = pieces[color * 7 + GENERAL]
+    if not generals:
+        return True
+    ksq = to if generals & from_bit else generals.bit_length() - 1
+    r, c = divmod(ksq, COLS)
+    file_bits = bb.file_occ[c]
+    if frm % COLS == c:
+        file_bits &= ~(1 << (frm // COLS))
+    if to % COLS == c:
+        file_bits |= 1 << (to // COLS)
+    rank_bits = (occ >> (r * COLS)) & RANK_MASK
+    return not _attacked(pieces, color ^ 1, ksq, occ, rank_bits, file_bits, ~to_bit)
+
+
+# RAYS[sq]: các ô theo 4 hướng tính từ sq ra ngoài: lên, xuống (cột), trái, phải (hàng)
+RAYS = []
+for _sq in range(90):
+    _r, _c = divmod(_sq, COLS)
+    RAYS.append(([rr * COLS + _c for rr in range(_r - 1, -1, -1)],
+                 [rr * COLS + _c for rr in range(_r + 1, ROWS)],
+                 [_r * COLS + cc for cc in range(_c - 1, -1, -1)],
+                 [_r * COLS + cc for cc in range(_c + 1, COLS)]))
+
+
+def _check_info(bb: XiangqiBitboards, color: int, ksq: int):
+    """
+    Phân tích chiếu / ghim quanh Tướng ở ksq, làm 1 lần cho cả thế cờ.
+    Trả về (evasion, pins, special_from, special_to) cho các nước không phải của Tướng:
+    - evasion: mask ô đến chặn / ăn quân đang chiếu (-1 = không bị chiếu, None = chiếu đôi -> thử từng nước)
+    - pins: ô quân bị Xe / Tướng địch ghim -> mask ô được đi (vẫn nằm giữa Tướng và quân ghim, hoặc ăn nó)
+    - special_from: ngòi Pháo (rời đi có thể làm đổi số ngòi), quân đứng chân Mã đang nhắm Tướng
+    - special_to: ô trống giữa Tướng và Pháo chưa có ngòi, quân địch đứng chân Mã (ăn nó thì Mã chiếu được)
+    Nước đi ra từ special_from hoặc vào special_to được kiểm tra lại bằng is_legal.
+    """
+    pieces = bb.pieces
+    them = color ^ 1
+    own = bb.occ[color]
+    occ = own | bb.occ[them]
+    base = them * 7
+    cannons = pieces[base + CANNON]
+    checks = 0
+    evasion = 0
+    pins = {}
+    special_from = special_to = 0
+
+    for d, ray in enumerate(RAYS[ksq]):
+        # Trên cột, Tướng địch "nhìn" thẳng như Xe (lộ mặt Tướng)
+        sliders = pieces[base + CHARIOT] | (pieces[base + GENERAL] if d < 2 else 0)
+        seen = []   # Tối đa 3 quân đầu tiên trên tia
+        segs = []   # segs[i]: các ô từ Tướng tới trước quân thứ i
+        path = 0
+        for sq in ray:
+            bit = 1 << sq
+            if occ & bit:
+                seen.append(bit)
+                segs.append(path)
+                if len(seen) == 3:
+                    break
+            path |= bit
+        if not seen:
+            continue
+        p1 = seen[0]
+        if p1 & sliders:
+            checks += 1
+            evasion |= segs[0] | p1
+        elif p1 & cannons:
+            # Pháo chưa có ngòi: quân nào chen vào giữa sẽ thành ngòi
+            special_to |= segs[0]
+        if len(seen) < 2:
+            continue
+        p2 = seen[1]
+        if p1 & own and p2 & sliders:
+            # Bị Tướng địch ghim thì không được ăn Tướng (như is_legal)
+            pins[p1.bit_length() - 1] = segs[1] | (p2 & pieces[base + CHARIOT])
+        elif p2 & cannons:
+            checks += 1
+            evasion |= (segs[1] & ~p1) | p2
+            if p1 & own:
+                special_from |= p1
+        if len(seen) == 3 and seen[2] & cannons:
+            # 2 ngòi: quân ta rời tia (hoặc ăn ngòi kia dọc tia) thì Pháo chiếu
+            special_from |= (p1 | p2) & own
+
+    horses = pieces[base + HORSE]
+    for leg, sources in HORSE_ATTACKERS[ksq]:
+        attackers = sources & horses
+        if not attackers:
+            continue
+        if not occ & leg:
+            checks += bin(attackers).count('1')
+            evasion |= attackers | leg
+        elif own & leg:
+            special_from |= leg
+        else:
+            special_to |= leg
+
+    soldiers = SOLDIER_ATTACKERS[them][ksq] & pieces[base + SOLDIER]
+    if soldiers:
+        checks += bin(soldiers).count('1')
+        evasion |= soldiers
+
+    if checks == 0:
+        evasion = -1
+    elif checks > 1:
+        evasion = None
+    return evasion, pins, special_from, special_to
+
+
+def generate_legal_moves(bb: XiangqiBitboards, color: int,
+                         from_square: Optional[int] = None,
+                         first_only: bool = False) -> List[Tuple[int, int]]:
+    """
+    Sinh nước đi hợp lệ dạng (from_sq, to_sq).
+    Chiếu / ghim / ngòi Pháo / chân Mã được phân tích 1 lần (_check_info), nước đi được lọc bằng mask.
+    Chỉ nước của Tướng, chiếu đôi và các trường hợp ngòi Pháo / chân Mã mới phải thử bằng is_legal.
+    - first_only: trả về ngay khi tìm được 1 nước (danh sách rỗng = hết nước đi).
+    """
+    moves = generate_pseudo_moves(bb, color, from_square)
+    generals = bb.pieces[color * 7 + GENERAL]
+    if not generals:
+        return moves[:1] if first_only else moves
+    ksq = generals.bit_length() - 1
+    evasion, pins, special_from, special_to = _check_info(bb, color, ksq)
+    if evasion is None:
+        special_from = -1  # Chiếu đôi (vd. Xe + Pháo cùng hàng): một nước chặn có thể gỡ cả hai
+
+    legal = []
+    for frm, to in moves:
+        if frm == ksq or (special_from >> frm) & 1 or (special_to >> to) & 1:
+            ok = is_legal(bb, color, frm, to)
+        elif not (evasion >> to) & 1:
+            ok = False
+        elif frm in pins:
+            ok = (pins[frm] >> to) & 1
+        else:
+            ok = True
+        if ok:
+            legal.append((frm, to))
+            if first_only:
+                break
+    return legal
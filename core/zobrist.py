@@ -0,0 +1,28 @@
+"""
+Khóa Zobrist 64-bit cho Board (cờ vua + cờ tướng).
+
+hash = XOR của khóa (quân, ô) cho mọi quân trên bàn
+       ^ SIDE_KEY nếu tới lượt Đen
+       ^ CASTLING_KEYS[quyền nhập thành] ^ EP_KEYS[cột en passant] (chỉ cờ vua)
+
+Mỗi nước đi chỉ cần XOR vài khóa nên cập nhật O(1).
+Bảng sinh từ seed cố định -> hai máy chơi online cho ra cùng hash (dùng để phát hiện lệch bàn cờ).
+"""
+import random
+
+_rng = random.Random(0x5A0B215)
+
+
+def _key() -> int:
+    return _rng.getrandbits(64)
+
+
+# PIECE_KEYS[game_type][color * số_loại_quân + loại_quân][ô]
+PIECE_KEYS = {
+    'chess': [[_key() for _ in range(64)] for _ in range(2 * 6)],
+    'chinese_chess': [[_key() for _ in range(90)] for _ in range(2 * 7)],
+}
+SIDE_KEY = _key()
+CASTLING_KEYS = [_key() for _ in range(16)]
+CASTLING_KEYS[0] = 0  # Không còn quyền nhập thành -> không đóng góp gì
+EP_KEYS = [_key() for _ in range(8)]
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Chạy pytest từ bất kỳ đâu vẫn import được core / ai / utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,41 @@
+"""Perft regression cho bộ sinh nước đi (cờ vua + cờ tướng) và kiểm tra push / pop khôi phục đúng thế cờ."""
+import random
+
+import pytest
+
+from core.board import Board
+from utils.perft import REFERENCE_POSITIONS, START_FEN, _legal_moves, perft
+
+# Độ sâu rẻ để chạy mỗi lần test; bộ đầy đủ: python -m utils.perft
+PERFT_DEPTH = {'chess': 3, 'chinese_chess': 3}
+
+CASES = [(game, name, fen, counts[:PERFT_DEPTH[game]])
+         for game, positions in REFERENCE_POSITIONS.items()
+         for name, fen, counts in positions]
+
+
+@pytest.mark.parametrize("game, name, fen, counts", CASES, ids=[f"{c[0]}-{c[1]}" for c in CASES])
+def test_perft_reference(game, name, fen, counts):
+    board = Board.from_fen(fen, game)
+    for depth, expected in enumerate(counts, start=1):
+        assert perft(board, depth) == expected, f"{name} depth {depth}"
+
+
+@pytest.mark.parametrize("game", ['chess', 'chinese_chess'])
+def test_push_pop_round_trip(game):
+    rng = random.Random(2024)
+    for fen in [START_FEN[game]] + [fen for _, fen, _ in REFERENCE_POSITIONS[game]]:
+        board = Board.from_fen(fen, game)
+        stack = []
+        for _ in range(40):
+            moves = _legal_moves(board)
+            if not moves:
+                break
+            stack.append((board.to_fen(), board.hash))
+            board.push(rng.choice(moves))
+            assert board.hash == board.compute_hash()
+        while stack:
+            fen_before, hash_before = stack.pop()
+            board.pop()
+            assert board.to_fen() == fen_before
+            assert board.hash == hash_before == board.compute_hash()
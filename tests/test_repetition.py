@@ -0,0 +1,62 @@
+"""Luật lặp thế cờ / 50 nước: Board.repetition_result (chiếu dai, đuổi dai, hai bên cùng chiếu, lặp 3 lần)."""
+from core.board import Board
+from core import move as mv
+from core import xiangqi_bitboard
+
+
+def play_cycle(fen, game, cycle, times=3):
+    """Đi lại vòng nước 'cycle' (list (from, to)) cho tới khi thế cờ đầu xuất hiện lần thứ 'times'."""
+    board = Board.from_fen(fen, game)
+    for _ in range(times - 1):
+        for frm, to in cycle:
+            assert board.repetition_result() is None
+            board.push(mv.encode(frm, to))
+    return board
+
+
+def test_chess_threefold():
+    cycle = [((7, 6), (5, 5)), ((0, 6), (2, 5)), ((5, 5), (7, 6)), ((2, 5), (0, 6))]
+    board = play_cycle("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", 'chess', cycle)
+    assert board.is_threefold_repetition()
+    assert board.repetition_result() == ('draw', 'threefold')
+
+
+def test_chess_fifty_moves():
+    board = Board.from_fen("4k3/8/8/8/8/8/8/4K2R w - - 99 80", 'chess')
+    assert board.repetition_result() is None
+    board.push(mv.encode((7, 4), (7, 3)))
+    assert board.is_fifty_moves()
+    assert board.repetition_result() == ('draw', 'fifty_moves')
+
+
+def test_xiangqi_repetition_draw():
+    # Hai Tướng đi qua đi lại, không ai chiếu / đuổi
+    cycle = [((9, 3), (8, 3)), ((0, 4), (1, 4)), ((8, 3), (9, 3)), ((1, 4), (0, 4))]
+    board = play_cycle("4k4/9/9/9/9/9/9/9/9/3K5 w - - 0 1", 'chinese_chess', cycle)
+    assert board.repetition_result() == ('draw', 'repetition')
+
+
+def test_xiangqi_perpetual_check_loses():
+    # Xe Đỏ chiếu liên tục, Tướng Đen né qua lại -> Đỏ chiếu dai, thua
+    cycle = [((5, 3), (5, 4)), ((0, 4), (0, 3)), ((5, 4), (5, 3)), ((0, 3), (0, 4))]
+    board = play_cycle("4k4/9/9/9/9/3R5/9/9/9/5K3 w - - 0 1", 'chinese_chess', cycle)
+    assert board.repetition_result() == ('black', 'perpetual_check')
+
+
+def test_xiangqi_mutual_check_draw():
+    # Mỗi nước của cả hai bên đều chiếu -> cả hai cùng chiếu dai, hòa
+    fen = "1a3k3/2n1R4/9/4r4/9/4c4/4R1N2/2P6/4KC3/9 w - - 0 1"
+    cycle = [((6, 4), (6, 5)), ((5, 4), (5, 5)), ((6, 5), (6, 4)), ((5, 5), (5, 4))]
+    board = Board.from_fen(fen, 'chinese_chess')
+    for frm, to in cycle:
+        board.push(mv.encode(frm, to))
+        assert xiangqi_bitboard.in_check(board.bitboards, xiangqi_bitboard.COLOR_INDEX[board.current_turn])
+    board = play_cycle(fen, 'chinese_chess', cycle)
+    assert board.repetition_result() == ('draw', 'repetition')
+
+
+def test_xiangqi_perpetual_chase_loses():
+    # Pháo Đen chạy qua lại, Xe Đỏ đuổi theo dọa ăn (Pháo không được bảo vệ) -> Đỏ đuổi dai, thua
+    cycle = [((3, 0), (4, 0)), ((3, 8), (4, 8)), ((4, 0), (3, 0)), ((4, 8), (3, 8))]
+    board = play_cycle("4k4/9/9/c7R/9/9/9/9/9/3K5 b - - 0 1", 'chinese_chess', cycle)
+    assert board.repetition_result() == ('black', 'perpetual_chase')
@@ -3,6 +3,7 @@ import threading
 import pygame
 import os
 from core.board import Board
+from core import move as move_codec
 from utils.constants import (
     WIDTH, HEIGHT,
     HIGHLIGHT_COLOR,
@@ -105,6 +106,7 @@ class BoardUI:
         
         self.ai_engine = ai_engine # Lưu lại AI
         self.is_ai_thinking = False
+        self.is_pondering = False  # AI đang nghĩ trước trong lúc người chơi suy nghĩ
         # Nếu chơi với máy, mình cầm Trắng, Máy cầm Đen
         if self.ai_engine:
             self.game_logic.set_player_color('white')
@@ -179,6 +181,9 @@ class BoardUI:
         
         self.selected_piece_pos = None
         self.possible_moves = []
+        # Nước đi hợp lệ của cả phe đang tới lượt, sinh 1 lần cho mỗi thế cờ
+        self._side_moves = []
+        self._side_moves_key = None
         
          
         self.move_sound = None
@@ -272,7 +277,11 @@ class BoardUI:
                     # Khi quay lại Menu, Menu thấy None sẽ tự động reset về trang chủ.
                     self.network_manager.reset_connection()
                 
+                self._stop_pondering()
                 return 'QUIT_GAME'
+            # [MỚI] Ctrl+Z / Backspace: đi lại nước vừa rồi (chỉ khi chơi Offline / với máy)
+            if event.key == pygame.K_BACKSPACE or (event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL):
+                self._undo_last_move()
         self.ui_manager.process_events(event)
 
         if self.promotion_window:
@@ -374,6 +383,7 @@ class BoardUI:
                         if self.network_manager:
                             move_data = {
                                 "type": "move", "from": from_pos, "to": to_pos, 
+                                "move": move_codec.encode(from_pos, to_pos),
                                 "game_type": self.game_logic.game_type
                             }
                             self.network_manager.send_to_p2p(move_data)
@@ -386,7 +396,7 @@ class BoardUI:
                     if new_color != self.game_logic.current_turn: return 
                     self.selected_piece_pos = clicked_pos
                     # Lấy nước đi an toàn từ Validator
-                    self.possible_moves = self.game_logic.validator.get_valid_moves_for_piece(self.game_logic, clicked_pos, self.game_logic.current_turn)
+                    self.possible_moves = self._moves_from(clicked_pos)
                 else: 
                     self.selected_piece_pos = None; self.possible_moves = []
         else:
@@ -396,7 +406,29 @@ class BoardUI:
                 if self.game_logic.my_color and color != self.game_logic.my_color: return
                 if color != self.game_logic.current_turn: return
                 self.selected_piece_pos = clicked_pos
-                self.possible_moves = self.game_logic.validator.get_valid_moves_for_piece(self.game_logic, clicked_pos, self.game_logic.current_turn)
+                self.possible_moves = self._moves_from(clicked_pos)
+
+    def _undo_last_move(self):
+        """Hoàn tác bằng Board.pop(). Chơi với máy thì lùi 2 nước để lại tới lượt người chơi."""
+        if self.network_manager or self.is_ai_thinking or self.promotion_window: return
+        self._stop_pondering()  # Nước đoán trước không còn đúng sau khi đi lại
+        board = self.game_logic
+        plies = 1
+        if self.ai_engine and board.current_turn == board.my_color and len(board.move_stack) >= 2:
+            plies = 2
+        if board.undo_move(plies):
+            self.selected_piece_pos = None; self.possible_moves = []
+            self.pending_promotion_move = None
+            print(f"↩️ Đã đi lại {plies} nước. Lượt: {board.current_turn}")
+
+    def _moves_from(self, pos):
+        """Lọc các ô đích của quân tại 'pos' từ danh sách nước đi của cả phe."""
+        board = self.game_logic
+        # Khóa Zobrist đổi sau mỗi nước đi / hoàn tác -> sinh lại danh sách nước đi
+        if self._side_moves_key != board.hash:
+            self._side_moves = board.validator.generate_legal_moves(board, board.current_turn)
+            self._side_moves_key = board.hash
+        return [end for start, end in self._side_moves if start == pos]
 
     def _show_promotion_window(self, player_color):
         rect = pygame.Rect(0, 0, 440, 160) 
@@ -418,6 +450,7 @@ class BoardUI:
                 move_data = {
                     "type": "move", "from": from_pos, "to": to_pos, 
                     "promotion": new_symbol,
+                    "move": move_codec.encode(from_pos, to_pos, new_symbol),
                     "game_type": self.game_logic.game_type
                 }
                 self.network_manager.send_to_p2p(move_data)
@@ -435,6 +468,7 @@ class BoardUI:
             if self.network_manager:
                  move_data = {
                     "type": "move", "from": to_pos, "to": to_pos, "promotion": new_symbol,
+                    "move": move_codec.encode(to_pos, to_pos, new_symbol),
                     "game_type": self.game_logic.game_type
                 }
                  self.network_manager.send_to_p2p(move_data)
@@ -472,8 +506,11 @@ class BoardUI:
             # Nếu đến lượt Đen (máy)
             if self.game_logic.current_turn == 'black':
                 self.is_ai_thinking = True
+                self.is_pondering = False  # get_best_move tự dùng / dừng kết quả ponder
                 # Chạy AI trong luồng riêng để không đơ màn hình
                 threading.Thread(target=self.run_ai_move, daemon=True).start()
+        if self.is_pondering and self.game_logic.game_over:
+            self._stop_pondering()
         # ------------------------------
         if self.network_manager:
             while not self.network_manager.p2p_queue.empty():
@@ -482,7 +519,11 @@ class BoardUI:
                     msg_type = msg.get("type")
                     
                     if msg_type == "move":
-                        from_pos = tuple(msg["from"]); to_pos = tuple(msg["to"])
+                        # Ưu tiên nước đi mã hóa 1 số nguyên; "from"/"to" giữ cho bản cũ
+                        if "move" in msg:
+                            from_pos, to_pos = move_codec.unpack(msg["move"])
+                        else:
+                            from_pos = tuple(msg["from"]); to_pos = tuple(msg["to"])
                         promo_symbol = msg.get("promotion")
                         self.game_logic.move_piece(from_pos, to_pos, promotion=promo_symbol)
                         self._play_move_sound()
@@ -654,18 +695,14 @@ class BoardUI:
         elif hasattr(self.game_logic, 'validator') and hasattr(self.game_logic.validator, 'is_in_check'):
              is_check = self.game_logic.validator.is_in_check(self.game_logic, self.game_logic.current_turn)
         if is_check:
-            king_symbol = 'K' if self.game_logic.current_turn == 'white' else 'k'
-            board_state = self.game_logic.get_board_state()
-            for r in range(self.rows):
-                for c in range(self.cols):
-                    p_symbol, _ = get_piece_info(board_state[r][c])
-                    if p_symbol == king_symbol:
-                        screen_r, screen_c = self.to_screen_pos(r, c)
-                        s = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
-                        if self.game_logic.game_type == 'chess': s.fill((255, 0, 0, 150)) 
-                        else: pygame.draw.circle(s, (255, 0, 0, 100), (cell_size//2, cell_size//2), cell_size//2); pygame.draw.circle(s, (255, 0, 0, 180), (cell_size//2, cell_size//2), cell_size//2.5)
-                        self.screen.blit(s, (start_x + screen_c * cell_size, start_y + screen_r * cell_size))
-                        return
+            # Vị trí Vua / Tướng được Board lưu sẵn (không cần quét bàn cờ)
+            king_pos = self.game_logic.find_king_pos(self.game_logic.current_turn)
+            if king_pos:
+                screen_r, screen_c = self.to_screen_pos(*king_pos)
+                s = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+                if self.game_logic.game_type == 'chess': s.fill((255, 0, 0, 150)) 
+                else: pygame.draw.circle(s, (255, 0, 0, 100), (cell_size//2, cell_size//2), cell_size//2); pygame.draw.circle(s, (255, 0, 0, 180), (cell_size//2, cell_size//2), cell_size//2.5)
+                self.screen.blit(s, (start_x + screen_c * cell_size, start_y + screen_r * cell_size))
 
     def draw_pieces(self, cell_size, start_x, start_y):
         board_state = self.game_logic.get_board_state()
@@ -835,15 +872,20 @@ class BoardUI:
                 # TRƯỜNG HỢP 1: BOT TỰ TRAIN (CỜ TƯỚNG)
                 # =================================================
                 # Bot này cần nhận toàn bộ logic bàn cờ để tự tính toán
-                best_move = self.ai_engine.get_best_move(self.game_logic)
+                # Có đồng hồ (GameSidebar): chia thời gian nghĩ theo số giây còn lại của bot
+                remaining = None
+                if self.sidebar:
+                    remaining = self.sidebar.white_time if self.game_logic.current_turn == 'white' else self.sidebar.black_time
+                best_move = self.ai_engine.get_best_move(self.game_logic, remaining_time=remaining)
                 
                 if best_move:
                     start, end = best_move
                     print(f"🤖 Bot đi: {start} -> {end}")
                     
-                    # Đi trực tiếp (vì đã có tọa độ rồi)
-                    self.game_logic.move_piece(start, end)
+                    # Đi trực tiếp (Move đã chứa sẵn tọa độ)
+                    self.game_logic.move_piece(best_move)
                     self._play_move_sound()
+                    self._start_pondering(self.game_logic)
             
             else:
                 # =================================================
@@ -865,6 +907,7 @@ class BoardUI:
                         # 4. Đi quân
                         self.game_logic.move_piece(start, end, promotion=promo)
                         self._play_move_sound()
+                        self._start_pondering(self.game_logic.to_fen())
 
         except Exception as e:
             print(f"❌ Lỗi AI: {e}")
@@ -873,6 +916,19 @@ class BoardUI:
         
         # Tắt cờ hiệu để cho phép người chơi click chuột lại
         self.is_ai_thinking = False
+
+    # --- [MỚI] PONDER: AI NGHĨ TRƯỚC TRÊN THỜI GIAN CỦA NGƯỜI CHƠI ---
+    def _start_pondering(self, position):
+        """position: Board (bot tự train) hoặc FEN (Stockfish), cùng kiểu get_best_move của engine đó nhận."""
+        if self.game_logic.game_over or not hasattr(self.ai_engine, 'start_ponder'): return
+        self.ai_engine.start_ponder(position)
+        self.is_pondering = True
+
+    def _stop_pondering(self):
+        """Dừng ponder khi đi lại / hết ván / thoát (lượt máy thì get_best_move tự xử lý)."""
+        if self.is_pondering and not self.is_ai_thinking:
+            self.ai_engine.stop_ponder()
+        self.is_pondering = False
     # Thêm vào class BoardUI
     def show_opponent_quit_dialog(self):
         from pygame_gui.windows import UIConfirmationDialog
@@ -0,0 +1,165 @@
+"""
+PERFT: đếm số thế cờ ở độ sâu N để kiểm tra và đo tốc độ bộ sinh nước đi của core.Board.
+
+Cách dùng:
+    python -m utils.perft                              # Chạy bộ thế cờ chuẩn (regression)
+    python -m utils.perft --game chess --depth 3       # Thế cờ ban đầu, đếm tổng
+    python -m utils.perft --fen "<FEN>" --depth 4 --divide
+    python -m utils.perft --game chinese_chess --depth 4 --workers 4
+
+- divide: in số nút con của từng nước ở gốc (so với engine khác để tìm nước sinh sai).
+- workers: chia các nước ở gốc cho process pool.
+FEN cờ tướng dùng ký hiệu WXF/UCCI (K A B N R C P, Đỏ viết hoa).
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.board import Board
+from core import bitboard
+from core import move as mv
+
+START_FEN = {
+    'chess': "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    'chinese_chess': "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 1",
+}
+
+# Bộ thế cờ chuẩn kèm số nút đúng theo từng độ sâu (1, 2, 3, ...)
+REFERENCE_POSITIONS = {
+    'chess': [
+        ("startpos", START_FEN['chess'], [20, 400, 8902, 197281]),
+        ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+         [48, 2039, 97862, 4085603]),
+        ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+        ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+         [6, 264, 9467, 422333]),
+        ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ],
+    'chinese_chess': [
+        ("startpos", START_FEN['chinese_chess'], [44, 1920, 79666, 3290240]),
+        ("position 2", "r1ba1a3/4kn3/2n1b4/pNp1p1p1p/4c4/6P2/P1P2R2P/1CcC5/9/2BAKAB2 w - - 0 1",
+         [38, 1128, 43929]),
+        ("position 3", "1cbak4/9/n2a5/2p1p3p/5cp2/2n2N3/6PCP/3AB4/2C6/3A1K1N1 w - - 0 1",
+         [7, 281, 8620]),
+        ("position 4", "5a3/3k5/3aR4/9/5r3/5n3/9/3A1A3/5K3/2BC2B2 w - - 0 1", [25, 424, 9850]),
+        ("position 5", "CRN1k1b2/3ca4/4ba3/9/2nr5/9/9/4B4/4A4/4KA3 w - - 0 1", [28, 516, 14808]),
+    ],
+}
+
+
+def _expand(board: Board, moves):
+    """Thêm quân phong cấp: mỗi nước Tốt lên hàng cuối thành 4 nước (Q, R, B, N)."""
+    if board.game_type != 'chess':
+        return moves
+    pawns = board.bitboards.pieces[bitboard.COLOR_INDEX[board.current_turn] * 6 + bitboard.PAWN]
+    out = []
+    for m in moves:
+        to_row = (m >> 12) & 0xF
+        if to_row in (0, 7) and pawns >> (((m >> 4) & 0xF) * 8 + (m & 0xF)) & 1:
+            out.extend(mv.with_promotion(m, promo) for promo in 'QRBN')
+        else:
+            out.append(m)
+    return out
+
+
+def _legal_moves(board: Board):
+    return _expand(board, board.validator.generate_legal_moves(board, board.current_turn, packed=True))
+
+
+def perft(board: Board, depth: int) -> int:
+    """Đếm số nút lá ở độ sâu depth (bulk-count: tầng cuối chỉ đếm số nước). Đi / hoàn tác bằng push / pop."""
+    moves = _legal_moves(board)
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for m in moves:
+        board.push(m)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def _divide_worker(args):
+    fen, game_type, move, depth = args
+    board = Board.from_fen(fen, game_type)
+    board.push(move)
+    return move, perft(board, depth - 1)
+
+
+def divide(fen: str, game_type: str, depth: int, workers: int = 1):
+    """Trả về list (nước đi, số nút) cho từng nước ở gốc. workers > 1: chạy song song."""
+    board = Board.from_fen(fen, game_type)
+    moves = _legal_moves(board)
+    if depth <= 1:
+        return [(m, 1) for m in moves]
+    jobs = [(fen, game_type, m, depth) for m in moves]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_divide_worker, jobs))
+    return [_divide_worker(job) for job in jobs]
+
+
+def move_to_str(m: int, game_type: str) -> str:
+    """Đổi nước đi sang dạng 'e2e4' (cờ vua) hoặc 'h2e2' (cờ tướng, hàng 0 ở dưới)."""
+    (r1, c1), (r2, c2) = mv.unpack(m)
+    base = 8 if game_type == 'chess' else 9
+    promo = mv.promotion_of(m)
+    return f"{chr(97 + c1)}{base - r1}{chr(97 + c2)}{base - r2}" + (promo.lower() if promo else "")
+
+
+def run(fen: str, game_type: str, depth: int, show_divide: bool = False, workers: int = 1) -> int:
+    t0 = time.perf_counter()
+    if show_divide or workers > 1:
+        results = divide(fen, game_type, depth, workers)
+        nodes = sum(n for _, n in results)
+        if show_divide:
+            for move, n in sorted(results, key=lambda x: move_to_str(x[0], game_type)):
+                print(f"{move_to_str(move, game_type)}: {n}")
+    else:
+        nodes = perft(Board.from_fen(fen, game_type), depth)
+    elapsed = time.perf_counter() - t0
+    nps = nodes / elapsed if elapsed > 0 else 0
+    print(f"depth {depth}: {nodes} nodes  {elapsed:.2f}s  {nps:,.0f} nodes/s")
+    return nodes
+
+
+def run_suite(game_types, max_depth: int, workers: int = 1) -> bool:
+    """Chạy bộ thế cờ chuẩn, trả về True nếu mọi số nút đều khớp."""
+    ok = True
+    for game_type in game_types:
+        for name, fen, expected in REFERENCE_POSITIONS[game_type]:
+            print(f"[{game_type}] {name}")
+            for depth, want in enumerate(expected[:max_depth], 1):
+                got = run(fen, game_type, depth, workers=workers)
+                if got != want:
+                    print(f"  ❌ SAI: mong đợi {want}, nhận {got}")
+                    ok = False
+    print("✅ Tất cả khớp" if ok else "❌ Có thế cờ sai")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft cho core.Board (chess / chinese_chess)")
+    parser.add_argument('--game', choices=['chess', 'chinese_chess'], default=None)
+    parser.add_argument('--fen', default=None, help="FEN bắt đầu (mặc định: thế cờ ban đầu)")
+    parser.add_argument('--depth', type=int, default=None)
+    parser.add_argument('--divide', action='store_true', help="In số nút của từng nước ở gốc")
+    parser.add_argument('--workers', type=int, default=1, help="Số process chia các nước ở gốc")
+    args = parser.parse_args()
+
+    if args.fen is None and args.depth is None:
+        # Không chỉ định thế cờ -> chạy bộ kiểm tra chuẩn
+        games = [args.game] if args.game else ['chess', 'chinese_chess']
+        sys.exit(0 if run_suite(games, max_depth=3, workers=args.workers) else 1)
+
+    game_type = args.game or 'chess'
+    fen = args.fen or START_FEN[game_type]
+    run(fen, game_type, args.depth or 3, args.divide, args.workers)
+
+
+if __name__ == '__main__':
+    main()